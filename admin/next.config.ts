@@ -43,6 +43,11 @@ const nextConfig: NextConfig = {
           source: "/uploads/:path*",
           destination: `${BACKEND_URL}/uploads/:path*`,
         },
+        // Уменьшенные копии изображений (ресайз на лету)
+        {
+          source: "/img/:path*",
+          destination: `${BACKEND_URL}/img/:path*`,
+        },
       ],
     };
   },
@@ -28,8 +28,12 @@ export default function LeadsPage() {
     const [leads, setLeads] = useState<LeadItem[]>([]);
     const [isLoading, setIsLoading] = useState(true);
     const [total, setTotal] = useState(0);
-    const [page, setPage] = useState(1);
+    const [statusCounts, setStatusCounts] = useState<Record<string, number>>({});
+    // Курсоры открытых страниц: последний — текущая страница (null — первая)
+    const [cursors, setCursors] = useState<(string | null)[]>([null]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [statusFilter, setStatusFilter] = useState<string | undefined>(undefined);
+    const cursor = cursors[cursors.length - 1];
 
     // Проверка авторизации
     useEffect(() => {
@@ -42,16 +46,18 @@ export default function LeadsPage() {
         if (!user) return;
         setIsLoading(true);
         try {
-            const response = await getLeads(page, 20, statusFilter);
+            const response = await getLeads(20, statusFilter, cursor);
             setLeads(response.items);
             setTotal(response.total);
+            setStatusCounts(response.status_counts);
+            setNextCursor(response.next_cursor);
         } catch (error) {
             toast.error("Ошибка загрузки заявок");
             console.error(error);
         } finally {
             setIsLoading(false);
         }
-    }, [user, page, statusFilter]);
+    }, [user, cursor, statusFilter]);
 
     useEffect(() => {
         loadLeads();
@@ -107,16 +113,22 @@ export default function LeadsPage() {
                     </div>
 
                     <div className="flex items-center gap-2">
-                        <Select value={statusFilter || "all"} onValueChange={(v) => setStatusFilter(v === "all" ? undefined : v)}>
+                        <Select
+                            value={statusFilter || "all"}
+                            onValueChange={(v) => {
+                                setStatusFilter(v === "all" ? undefined : v);
+                                setCursors([null]);
+                            }}
+                        >
                             <SelectTrigger className="w-[180px]">
                                 <SelectValue placeholder="Фильтр по статусу" />
                             </SelectTrigger>
                             <SelectContent>
                                 <SelectItem value="all">Все статусы</SelectItem>
-                                <SelectItem value="new">Новые</SelectItem>
-                                <SelectItem value="processing">В работе</SelectItem>
-                                <SelectItem value="completed">Завершенные</SelectItem>
-                                <SelectItem value="rejected">Отклоненные</SelectItem>
+                                <SelectItem value="new">Новые ({statusCounts.new ?? 0})</SelectItem>
+                                <SelectItem value="processing">В работе ({statusCounts.processing ?? 0})</SelectItem>
+                                <SelectItem value="completed">Завершенные ({statusCounts.completed ?? 0})</SelectItem>
+                                <SelectItem value="rejected">Отклоненные ({statusCounts.rejected ?? 0})</SelectItem>
                             </SelectContent>
                         </Select>
                     </div>
@@ -143,6 +155,11 @@ export default function LeadsPage() {
                                                     {lead.name || "Аноним"}
                                                 </div>
                                                 {getStatusBadge(lead.status)}
+                                                {lead.duplicates > 0 && (
+                                                    <Badge variant="outline" title="Заявки с этим же номером">
+                                                        Повторная (+{lead.duplicates})
+                                                    </Badge>
+                                                )}
                                             </div>
 
                                             <div className="grid sm:grid-cols-2 gap-3 text-sm">
@@ -200,20 +217,20 @@ export default function LeadsPage() {
                     )}
                 </div>
 
-                {/* Pagination placeholder */}
-                {total > 20 && (
+                {/* Pagination */}
+                {(cursors.length > 1 || nextCursor) && (
                     <div className="flex justify-center gap-2 pt-4">
                         <Button
                             variant="outline"
-                            disabled={page === 1}
-                            onClick={() => setPage(page - 1)}
+                            disabled={cursors.length === 1}
+                            onClick={() => setCursors(cursors.slice(0, -1))}
                         >
                             Назад
                         </Button>
                         <Button
                             variant="outline"
-                            disabled={leads.length < 20}
-                            onClick={() => setPage(page + 1)}
+                            disabled={!nextCursor}
+                            onClick={() => nextCursor && setCursors([...cursors, nextCursor])}
                         >
                             Вперед
                         </Button>
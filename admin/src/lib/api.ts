@@ -952,6 +952,7 @@ export interface LeadItem {
   ip_address: string | null;
   created_at: string;
   updated_at: string;
+  duplicates: number; // сколько ещё заявок с этим номером
 }
 
 export interface LeadsResponse {
@@ -959,11 +960,14 @@ export interface LeadsResponse {
   total: number;
   page: number;
   size: number;
+  status_counts: Record<string, number>;
+  next_cursor: string | null;
 }
 
-export async function getLeads(page = 1, size = 20, status?: string): Promise<LeadsResponse> {
-  const params = new URLSearchParams({ page: String(page), size: String(size) });
+export async function getLeads(size = 20, status?: string, cursor?: string | null): Promise<LeadsResponse> {
+  const params = new URLSearchParams({ size: String(size) });
   if (status) params.set("status", status);
+  if (cursor) params.set("cursor", cursor);
 
   const response = await fetchWithAuth(`/api/admin/leads/admin?${params.toString()}`);
   if (!response.ok) {
@@ -0,0 +1,40 @@
+"""add_image_variants
+
+Revision ID: 5d2e8a1f7c30
+Revises: 4cc8fec21a0c
+Create Date: 2026-10-19 09:12:41.208114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8a1f7c30'
+down_revision: Union[str, Sequence[str], None] = '4cc8fec21a0c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Создать таблицу image_variants."""
+    op.create_table('image_variants',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('image_id', sa.Integer(), nullable=False),
+        sa.Column('format', sa.String(length=10), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=False),
+        sa.Column('height', sa.Integer(), nullable=False),
+        sa.Column('url', sa.String(length=500), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['image_id'], ['images.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_image_variants_image_id'), 'image_variants', ['image_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Удалить таблицу image_variants."""
+    op.drop_index(op.f('ix_image_variants_image_id'), table_name='image_variants')
+    op.drop_table('image_variants')
@@ -0,0 +1,30 @@
+"""add_content_hash_to_images
+
+Revision ID: 7a4c1e9b2d58
+Revises: 5d2e8a1f7c30
+Create Date: 2026-10-19 11:03:27.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4c1e9b2d58'
+down_revision: Union[str, Sequence[str], None] = '5d2e8a1f7c30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Добавить content_hash в images."""
+    op.add_column('images', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_images_content_hash'), 'images', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Удалить content_hash из images."""
+    op.drop_index(op.f('ix_images_content_hash'), table_name='images')
+    op.drop_column('images', 'content_hash')
@@ -0,0 +1,30 @@
+"""add_placeholders_to_images
+
+Revision ID: 9b3f6d2a4e71
+Revises: 7a4c1e9b2d58
+Create Date: 2026-10-19 14:21:08.316504
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3f6d2a4e71'
+down_revision: Union[str, Sequence[str], None] = '7a4c1e9b2d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Добавить lqip и dominant_color в images."""
+    op.add_column('images', sa.Column('lqip', sa.Text(), nullable=True))
+    op.add_column('images', sa.Column('dominant_color', sa.String(length=7), nullable=True))
+
+
+def downgrade() -> None:
+    """Удалить lqip и dominant_color из images."""
+    op.drop_column('images', 'dominant_color')
+    op.drop_column('images', 'lqip')
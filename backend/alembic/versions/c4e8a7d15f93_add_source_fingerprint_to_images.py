@@ -0,0 +1,28 @@
+"""add_source_fingerprint_to_images
+
+Revision ID: c4e8a7d15f93
+Revises: 9b3f6d2a4e71
+Create Date: 2026-10-19 16:42:51.904127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a7d15f93'
+down_revision: Union[str, Sequence[str], None] = '9b3f6d2a4e71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Добавить source_fingerprint в images."""
+    op.add_column('images', sa.Column('source_fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Удалить source_fingerprint из images."""
+    op.drop_column('images', 'source_fingerprint')
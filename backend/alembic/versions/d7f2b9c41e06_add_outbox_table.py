@@ -0,0 +1,50 @@
+"""add_outbox_table
+
+Revision ID: d7f2b9c41e06
+Revises: c4e8a7d15f93
+Create Date: 2026-10-19 18:05:12.417390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f2b9c41e06'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a7d15f93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Создать таблицу outbox для уведомлений."""
+    op.create_table('outbox',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('lead_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbox_created_at'), 'outbox', ['created_at'], unique=False)
+    op.create_index(
+        'ix_outbox_pending',
+        'outbox',
+        ['kind', 'next_attempt_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    """Удалить таблицу outbox."""
+    op.drop_index('ix_outbox_pending', table_name='outbox')
+    op.drop_index(op.f('ix_outbox_created_at'), table_name='outbox')
+    op.drop_table('outbox')
@@ -0,0 +1,34 @@
+"""add_rate_limit_counters
+
+Revision ID: e3a9c5f0b7d2
+Revises: d7f2b9c41e06
+Create Date: 2026-10-19 19:20:33.581204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9c5f0b7d2'
+down_revision: Union[str, Sequence[str], None] = 'd7f2b9c41e06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Создать UNLOGGED-таблицу счётчиков ограничения частоты."""
+    op.create_table('rate_limit_counters',
+        sa.Column('key', sa.String(length=200), nullable=False),
+        sa.Column('window_start', sa.BigInteger(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('key', 'window_start'),
+        prefixes=['UNLOGGED'],
+    )
+
+
+def downgrade() -> None:
+    """Удалить таблицу счётчиков."""
+    op.drop_table('rate_limit_counters')
@@ -0,0 +1,52 @@
+"""add_lead_inbox_indexes
+
+Revision ID: f5b1d8e2a4c7
+Revises: e3a9c5f0b7d2
+Create Date: 2026-10-19 20:11:47.206318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5b1d8e2a4c7'
+down_revision: Union[str, Sequence[str], None] = 'e3a9c5f0b7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Составные индексы для списка заявок и нормализованный телефон."""
+    op.add_column('leads', sa.Column('phone_normalized', sa.String(length=20), nullable=True))
+
+    # Те же правила, что в app.utils.phone.normalize_phone
+    op.execute(
+        """
+        UPDATE leads SET phone_normalized = CASE
+            WHEN length(d) < 10 THEN NULL
+            WHEN length(d) = 10 THEN '7' || d
+            WHEN length(d) = 11 AND left(d, 1) = '8' THEN '7' || substr(d, 2)
+            ELSE left(d, 20)
+        END
+        FROM (SELECT id AS lead_id, regexp_replace(phone, '\\D', '', 'g') AS d FROM leads) AS digits
+        WHERE leads.id = digits.lead_id
+        """
+    )
+
+    op.create_index(op.f('ix_leads_phone_normalized'), 'leads', ['phone_normalized'], unique=False)
+    op.create_index('ix_leads_status_created_at_id', 'leads', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_leads_created_at_id', 'leads', ['created_at', 'id'], unique=False)
+    # Покрывается ведущей колонкой ix_leads_status_created_at_id
+    op.drop_index(op.f('ix_leads_status'), table_name='leads')
+
+
+def downgrade() -> None:
+    """Вернуть индекс по статусу, удалить новые индексы и колонку."""
+    op.create_index(op.f('ix_leads_status'), 'leads', ['status'], unique=False)
+    op.drop_index('ix_leads_created_at_id', table_name='leads')
+    op.drop_index('ix_leads_status_created_at_id', table_name='leads')
+    op.drop_index(op.f('ix_leads_phone_normalized'), table_name='leads')
+    op.drop_column('leads', 'phone_normalized')
@@ -1,12 +1,23 @@
 """
 Утилиты для работы с паролями и JWT токенами.
+
+Argon2 намеренно медленный (десятки миллисекунд процессора на хеш), поэтому
+в обработчиках запросов пароли хешируются и проверяются через
+hash_password_async / verify_password_async — в отдельных потоках (Argon2
+отпускает GIL), а не в event loop. Очередь ограничена: одновременно не больше
+settings.password_hash_queue_size задач, если места нет дольше
+settings.password_hash_queue_timeout секунд — PasswordHasherBusy (503).
+Синхронные hash_password / verify_password — для скриптов.
 """
 
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any
+from typing import Any, Callable
 
 from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+from argon2.exceptions import InvalidHashError, VerifyMismatchError
 from jose import jwt
 
 from app.config import settings
@@ -16,21 +27,78 @@ from app.utils.time import utcnow
 # Password hashing
 ph = PasswordHasher()
 
+_hash_executor: ThreadPoolExecutor | None = None
+_hash_slots: asyncio.Semaphore | None = None
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь хеширования переполнена — задачу не приняли."""
+
 
 def hash_password(password: str) -> str:
     """Хэширование пароля с Argon2."""
     return ph.hash(password)
 
 
+@functools.cache
+def _dummy_password_hash() -> str:
+    """Хеш произвольного пароля: по нему проверяем, когда пользователя нет."""
+    return ph.hash("dummy-password-for-timing")
+
+
 def verify_password(password: str, password_hash: str) -> bool:
     """Проверка пароля."""
     try:
         ph.verify(password_hash, password)
         return True
-    except VerifyMismatchError:
+    except (VerifyMismatchError, InvalidHashError):
         return False
 
 
+async def _run_hashing(fn: Callable[..., Any], *args: Any) -> Any:
+    global _hash_executor, _hash_slots
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            thread_name_prefix="password-hash",
+        )
+        _hash_slots = asyncio.Semaphore(max(settings.password_hash_queue_size, settings.password_hash_workers))
+    try:
+        await asyncio.wait_for(_hash_slots.acquire(), timeout=settings.password_hash_queue_timeout)
+    except asyncio.TimeoutError:
+        raise PasswordHasherBusy()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password в потоке пула."""
+    return await _run_hashing(hash_password, password)
+
+
+async def verify_password_async(password: str, password_hash: str | None) -> bool:
+    """
+    verify_password в потоке пула. Без хеша (пользователь не найден) всё равно
+    проверяет пароль по постороннему хешу и возвращает False: время ответа не
+    должно выдавать, существует ли логин.
+    """
+    if password_hash is None:
+        await _run_hashing(lambda: verify_password(password, _dummy_password_hash()))
+        return False
+    return await _run_hashing(verify_password, password, password_hash)
+
+
+def shutdown_hashing() -> None:
+    """Остановить потоки хеширования (вызывается при остановке приложения)."""
+    global _hash_executor, _hash_slots
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+        _hash_slots = None
+
+
 # JWT
 SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
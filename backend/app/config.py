@@ -12,6 +12,35 @@ class Settings(BaseSettings):
     def async_database_url(self) -> str:
         """Преобразует sync URL в async URL (postgresql → postgresql+asyncpg)."""
         return self.database_url.replace("postgresql://", "postgresql+asyncpg://")
+
+    # Пул соединений асинхронного движка — у каждого воркера uvicorn свой:
+    # в сумме до workers * (db_pool_size + db_max_overflow) соединений
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # Сколько секунд ждать свободного соединения, прежде чем ответить ошибкой
+    db_pool_timeout: float = 30
+    # Пересоздавать соединения старше N секунд (-1 — не пересоздавать)
+    db_pool_recycle: int = 1800
+    # Проверять соединение при выдаче из пула (переживает перезапуск PostgreSQL)
+    db_pool_pre_ping: bool = True
+    # Кеш подготовленных выражений asyncpg на соединение; 0 — за PgBouncer в режиме transaction
+    db_statement_cache_size: int = 100
+
+    # Реплика для публичного чтения (пусто — всё читается с основной БД).
+    # Пул — с теми же db_pool_* настройками
+    read_database_url: str | None = None
+    # При большем отставании реплики публичное чтение уходит на основную БД
+    read_replica_max_lag_seconds: float = 5
+    # Как часто проверять реплику
+    read_replica_check_seconds: float = 1
+    # Сколько после записи через API читать с основной БД, пока реплика её не догонит
+    read_after_write_seconds: float = 10
+
+    @property
+    def async_read_database_url(self) -> str | None:
+        if not self.read_database_url:
+            return None
+        return self.read_database_url.replace("postgresql://", "postgresql+asyncpg://")
     
     # JWT
     secret_key: str = "your-super-secret-key-change-in-production"
@@ -37,9 +66,94 @@ class Settings(BaseSettings):
     # Приложение
     debug: bool = True
 
+    # Кеш публичных данных (иерархия локаций, популярные объявления, счётчики), секунды
+    public_cache_ttl: int = 60
+
     # Uploads
     upload_dir: str = "uploads"
     max_upload_size: int = 5 * 1024 * 1024  # 5 MB
+    max_batch_upload_files: int = 30
+
+    # Сборка мусора изображений: записи без сущности и файлы без записей
+    image_gc_interval_hours: float = 24  # 0 — не запускать по расписанию
+    image_gc_grace_hours: float = 24  # моложе этого не трогаем
+
+    # Обработка изображений (Pillow) в пуле процессов — на каждый воркер uvicorn
+    image_workers: int = 2
+    image_queue_size: int = 8  # задач в работе и в ожидании, сверх — 503
+    image_queue_timeout: float = 10.0  # сколько ждать места в очереди, секунды
+
+    # Уменьшенные копии загружаемых изображений для srcset
+    image_variant_widths: List[int] = [480, 960, 1600]
+    image_variant_formats: List[str] = ["webp", "avif"]  # недоступные в Pillow пропускаются
+
+    # Ресайз на лету /img/{w}x{h}/{fit}/{path}: дисковый кеш копий
+    img_cache_dir: str = "cache/img"
+    img_cache_max_bytes: int = 2 * 1024 * 1024 * 1024  # 2 GB
+    # Эндпоинт публичный: отдаются только размеры и форматы, которые запрашивает сайт
+    # (миниатюра 300x300 и OG-картинка 1200x630), иначе перебором параметров можно
+    # занять пул обработки и вымывать дисковый кеш
+    img_allowed_sizes: List[str] = ["300x300/cover", "1200x630/cover"]
+    img_allowed_formats: List[str] = ["jpeg", "webp"]  # явный ?format=; без него — как у оригинала
+
+    # Карта участков объявления (OG-картинка): static — рисуется Pillow по кешу тайлов,
+    # browser — скриншот страницы /listing-screenshot/{slug} в Playwright
+    map_renderer: str = "static"
+    map_image_format: str = "png"  # png | webp
+    map_tile_cache_dir: str = "cache/tiles"
+    map_tile_url: str = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"  # пусто — только кеш
+    map_tile_max_age_days: float = 30
+
+    # Перерисовка карт объявлений после изменения участков
+    map_refresh_debounce_seconds: float = 30  # ждать затишья после последнего изменения
+    map_refresh_max_delay_seconds: float = 300  # но не дольше этого с первого изменения
+    map_refresh_sweep_minutes: float = 60  # сверка всех карт (изменения из скриптов); 0 — отключить
+
+    # Скриншоты карты (Playwright): один браузер на воркер uvicorn
+    screenshot_pages: int = 2  # одновременно открытых страниц
+    screenshot_context_max_uses: int = 20  # после стольких страниц контекст пересоздаётся
+    screenshot_page_timeout: float = 45.0  # секунды на одну страницу
+    screenshot_browser_idle_seconds: float = 600  # закрыть браузер после простоя (0 — держать)
+
+    # Ограничение частоты заявок с сайта (скользящее окно)
+    lead_rate_limit_per_ip: int = 5
+    lead_rate_limit_ip_window_seconds: int = 600
+    lead_rate_limit_per_phone: int = 3
+    lead_rate_limit_phone_window_seconds: int = 3600
+    # memory — счётчик в каждом воркере; postgres — плюс общий в таблице rate_limit_counters
+    rate_limit_backend: str = "memory"
+
+    # Прокси, которым доверяем X-Forwarded-For / X-Forwarded-Proto ("*" — любым).
+    # При "*" адресом клиента считается самый левый адрес X-Forwarded-For, а его
+    # подставляет сам клиент — для ограничения по IP укажите адреса/подсети nginx
+    proxy_trusted_hosts: str = "*"
+
+    # Очередь уведомлений (таблица outbox): отправка в фоне с повторами
+    outbox_poll_seconds: float = 5  # как часто проверять очередь без явного сигнала
+    outbox_batch_size: int = 20  # сообщений за один проход (склеиваются в одно при всплеске)
+    outbox_retry_base_seconds: float = 5  # пауза после первой неудачи, дальше удваивается
+    outbox_retry_max_seconds: float = 1800
+    outbox_max_age_hours: float = 72  # старше — больше не пытаемся (status = failed)
+    outbox_retention_days: float = 30  # доставленные сообщения хранятся столько
+
+    # X-Accel-Redirect: файлы отдаёт nginx из internal location с этим префиксом
+    # (пусто — отдаёт сам backend). Например, "/_accel/uploads/" и "/_accel/img/"
+    uploads_accel_prefix: str = ""
+    img_cache_accel_prefix: str = ""
+
+    # Кеш пользователей админки в get_current_user (сбрасывается при изменении пользователя)
+    auth_principal_cache_ttl: float = 5  # секунды; 0 — не кешировать
+    auth_principal_cache_size: int = 1000
+
+    # Хеширование паролей (Argon2) в отдельных потоках, не в event loop
+    password_hash_workers: int = 2
+    password_hash_queue_size: int = 8  # задач в работе и в ожидании, сверх — 503
+    password_hash_queue_timeout: float = 5.0
+
+    # Неудачные входы в админку: сверх лимита вход отклоняется до проверки пароля
+    login_failures_per_username: int = 10
+    login_failures_per_ip: int = 20
+    login_failure_window_seconds: int = 900
 
     # SMTP для восстановления пароля
     smtp_host: str | None = None
@@ -47,6 +161,12 @@ class Settings(BaseSettings):
     smtp_user: str | None = None
     smtp_password: str | None = None
     emails_from: str = "noreply@rkkland.ru"
+    smtp_timeout: float = 15
+    # Письма уходят из фоновой очереди (services/email_queue.py)
+    email_queue_size: int = 100
+    email_max_attempts: int = 5
+    # Через сколько секунд без писем закрывать соединение с SMTP
+    smtp_idle_seconds: float = 30
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, extra="ignore")
 
 
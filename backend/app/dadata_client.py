@@ -11,20 +11,14 @@ class DaDataSuggestion(BaseModel):
     data: dict
 
 
-def _get_dadata_api_key_from_db() -> Optional[str]:
-    """Получить API ключ DaData из базы данных."""
+async def _get_dadata_api_key() -> Optional[str]:
+    """Получить API ключ DaData из кеша настроек."""
+    from app.services.site_settings import site_settings
+
     try:
-        from app.database import SessionLocal
-        from app.models.setting import Setting
-        
-        db = SessionLocal()
-        try:
-            setting = db.query(Setting).filter(Setting.key == "dadata_api_key").first()
-            return setting.value if setting and setting.value else None
-        finally:
-            db.close()
+        return await site_settings.get("dadata_api_key")
     except Exception as e:
-        print(f"Warning: Failed to load dadata_api_key from DB: {e}")
+        print(f"Warning: Failed to load dadata_api_key from settings: {e}")
         return None
 
 
@@ -34,16 +28,16 @@ class DaDataClient:
     def __init__(self):
         pass  # Ключ читается при каждом запросе
     
-    def _get_api_key(self) -> str | None:
-        """Получить актуальный API ключ из БД."""
-        return _get_dadata_api_key_from_db()
+    async def _get_api_key(self) -> str | None:
+        """Получить актуальный API ключ (кеш настроек следит за изменениями)."""
+        return await _get_dadata_api_key()
 
     async def suggest_settlement(self, query: str, count: int = 10) -> List[DaDataSuggestion]:
         """
         Поиск населенных пунктов (исключая улицы).
         Ограничиваем поиск Калининградской областью по умолчанию (kladr_id 39).
         """
-        api_key = self._get_api_key()
+        api_key = await self._get_api_key()
         if not api_key:
             print("Warning: DADATA_API_KEY not found in settings")
             return []
@@ -1,47 +1,75 @@
 """
 Модуль для работы с базой данных.
-Поддерживает как синхронные, так и асинхронные соединения.
+
+Приложение работает только с асинхронным движком (asyncpg). Синхронный
+(psycopg2) нужен скриптам (seed.py, reset_db.py и т.п.) и создаётся при
+первом вызове get_sync_engine(), поэтому воркеры uvicorn его не открывают.
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.orm import sessionmaker, DeclarativeBase, Session
+from functools import cache
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from sqlalchemy.orm import DeclarativeBase, Session
 
 from app.config import settings
 
 
-# === Синхронный движок (для обратной совместимости) ===
-engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# === Асинхронный движок ===
+def _create_async_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=settings.debug,  # логирование SQL в debug-режиме
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={"statement_cache_size": settings.db_statement_cache_size},
+    )
 
 
-# === Асинхронный движок ===
-async_engine = create_async_engine(
-    settings.async_database_url,
-    echo=settings.debug,  # логирование SQL в debug-режиме
-)
+async_engine = _create_async_engine(settings.async_database_url)
 AsyncSessionLocal = async_sessionmaker(
     async_engine,
     class_=AsyncSession,
     expire_on_commit=False,  # предотвращает проблемы с detached objects
 )
 
+# === Реплика для публичного чтения (если задан read_database_url) ===
+# Напрямую не использовать: сессию выбирает app.services.read_replica
+read_engine = _create_async_engine(settings.async_read_database_url) if settings.read_database_url else None
+ReadSessionLocal = (
+    async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+    if read_engine is not None
+    else None
+)
+
 
 class Base(DeclarativeBase):
     """Базовый класс для всех моделей."""
     pass
 
 
-def get_db():
-    """Dependency для получения синхронной сессии БД."""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 async def get_async_db():
-    """Dependency для получения асинхронной сессии БД."""
+    """
+    Dependency для получения асинхронной сессии БД.
+
+    Сессия берёт соединение из пула только при первом запросе к БД: обработчик,
+    ответивший из кеша (например, get_current_user с пользователем из
+    principal_cache), пул не трогает. Соединение возвращается в пул при
+    commit/rollback и при закрытии сессии.
+    """
     async with AsyncSessionLocal() as session:
         yield session
+
+
+# === Синхронный движок — только для скриптов ===
+@cache
+def get_sync_engine() -> Engine:
+    return create_engine(settings.database_url, pool_pre_ping=True)
+
+
+def sync_session() -> Session:
+    """Синхронная сессия для скриптов. В коде приложения — только AsyncSessionLocal."""
+    return Session(bind=get_sync_engine(), autoflush=False)
@@ -1,7 +1,7 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from starlette.responses import Response
 import mimetypes
 import os
 
@@ -11,21 +11,60 @@ mimetypes.add_type("image/webp", ".webp")
 mimetypes.add_type("image/avif", ".avif")
 
 
-class CachedStaticFiles(StaticFiles):
-    """Статика с заголовком кеширования: загруженные картинки не меняются."""
-
-    def file_response(self, *args, **kwargs) -> Response:
-        response = super().file_response(*args, **kwargs)
-        response.headers.setdefault("Cache-Control", "public, max-age=2592000")
-        return response
-
+from app.auth import shutdown_hashing
 from app.config import settings
-from app.routers import news, listings, locations, references, auth, admin_plots, admin_settings, admin_listings, admin_geo, images, admin_references, admin_realtors, public_settings, leads, public_plots, admin_locations, admin_users
+from app.services.browser_pool import browser_pool
+from app.services.email_queue import email_queue
+from app.services.image_gc import image_gc_scheduler
+from app.services.image_pool import image_pool
+from app.services.map_refresh import listing_map_refresher
+from app.services.outbox import outbox_dispatcher
+from app.services.principal_cache import ADMIN_USERS_CHANNEL, principal_cache
+from app.services.read_replica import PRIMARY_WRITES_CHANNEL, PrimaryWritesMiddleware, replica_router
+from app.services.map_tiles import map_tile_cache
+from app.services.site_settings import site_settings
+from app.services.telegram import close_clients as close_telegram_clients
+from app.utils.static_files import CachedStaticFiles
+from app.routers import news, listings, locations, references, auth, admin_plots, admin_settings, admin_listings, admin_geo, images, admin_references, admin_realtors, public_settings, leads, public_plots, admin_locations, admin_users, bootstrap, geo_page, img
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Слушатель изменений настроек: держит кеш настроек согласованным между воркерами.
+    # На том же соединении — сброс кеша пользователей админки
+    site_settings.listen(ADMIN_USERS_CHANNEL, principal_cache.on_notify)
+    # и записи, после которых публичное чтение временно идёт с основной БД
+    if replica_router.enabled:
+        site_settings.listen(PRIMARY_WRITES_CHANNEL, replica_router.on_notify)
+    await site_settings.start()
+    # Проверка реплики для публичного чтения (если задан READ_DATABASE_URL)
+    await replica_router.start()
+    # Уборка брошенных загрузок и файлов без записей
+    await image_gc_scheduler.start()
+    # Перерисовка карт объявлений после изменения участков
+    await listing_map_refresher.start()
+    # Отправка уведомлений из outbox
+    await outbox_dispatcher.start()
+    # Отправка писем (восстановление пароля)
+    await email_queue.start()
+    yield
+    await email_queue.stop()
+    await outbox_dispatcher.stop()
+    await close_telegram_clients()
+    await listing_map_refresher.stop()
+    await image_gc_scheduler.stop()
+    await replica_router.stop()
+    await site_settings.stop()
+    await browser_pool.stop()
+    await map_tile_cache.close()
+    image_pool.shutdown()
+    shutdown_hashing()
+
 
 app = FastAPI(
     title="КалининградЗем API",
     description="API для сайта продажи земельных участков",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Админские роутеры
@@ -52,8 +91,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Доверяем прокси-заголовкам (X-Forwarded-Proto и т.д.)
-app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
+# Доверяем прокси-заголовкам (X-Forwarded-Proto, X-Forwarded-For) от settings.proxy_trusted_hosts
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=settings.proxy_trusted_hosts)
+
+# После записи через API сайт читает с основной БД, пока реплика не догонит
+if replica_router.enabled:
+    app.add_middleware(PrimaryWritesMiddleware)
 
 # Создаем папку загрузок если нет
 if not os.path.exists(settings.upload_dir):
@@ -70,6 +113,9 @@ app.include_router(references.router, prefix="/api/references", tags=["reference
 app.include_router(public_settings.router, prefix="/api/settings", tags=["settings"])
 app.include_router(leads.router, prefix="/api/leads", tags=["leads"])
 app.include_router(public_plots.router, prefix="/api/public-plots", tags=["public-plots"])
+app.include_router(bootstrap.router, prefix="/api/bootstrap", tags=["bootstrap"])
+app.include_router(geo_page.router, prefix="/api/geo-page", tags=["geo-page"])
+app.include_router(img.router, prefix="/img", tags=["img"])
 
 
 @app.get("/")
@@ -1,7 +1,7 @@
 # Models package
 from app.models.news import News
 from app.models.reference import Reference
-from app.models.image import Image
+from app.models.image import Image, ImageVariant
 from app.models.realtor import Realtor
 from app.models.owner import Owner
 from app.models.location import District, Settlement, Location, LocationType
@@ -10,11 +10,14 @@ from app.models.plot import Plot, PlotStatus
 from app.models.admin_user import AdminUser
 from app.models.setting import Setting
 from app.models.lead import Lead
+from app.models.outbox import OutboxMessage
+from app.models.rate_limit import RateLimitCounter
 
 __all__ = [
     "News",
     "Reference",
     "Image",
+    "ImageVariant",
     "Realtor",
     "Owner",
     "District",
@@ -27,4 +30,6 @@ __all__ = [
     "AdminUser",
     "Setting",
     "Lead",
+    "OutboxMessage",
+    "RateLimitCounter",
 ]
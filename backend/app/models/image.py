@@ -1,6 +1,6 @@
 from datetime import datetime
-from sqlalchemy import String, Text, Boolean, Integer, DateTime, Index
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Text, Boolean, Integer, DateTime, Index, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
 from app.utils.time import utcnow
@@ -34,6 +34,13 @@ class Image(Base):
     size: Mapped[int | None] = mapped_column(Integer, nullable=True)  # Bytes
     width: Mapped[int | None] = mapped_column(Integer, nullable=True)
     height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # SHA-256 содержимого оригинала: одинаковые загрузки используют один файл
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    # Плейсхолдер до загрузки картинки: data URI крошечной WebP и цвет фона
+    lqip: Mapped[str | None] = mapped_column(Text, nullable=True)
+    dominant_color: Mapped[str | None] = mapped_column(String(7), nullable=True)  # "#a1b2c3"
+    # Для сгенерированных карт: отпечаток геометрии и статусов участков на момент рендера
+    source_fingerprint: Mapped[str | None] = mapped_column(String(64), nullable=True)
     
     # SEO
     alt: Mapped[str | None] = mapped_column(String(255), nullable=True)
@@ -45,5 +52,36 @@ class Image(Base):
     
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
     
+    # Уменьшенные копии для srcset (480/960/1600 в WebP и AVIF)
+    variants: Mapped[list["ImageVariant"]] = relationship(
+        "ImageVariant",
+        back_populates="image",
+        order_by="(ImageVariant.format, ImageVariant.width)",
+        cascade="all, delete-orphan",
+        lazy="selectin",
+    )
+    
     def __repr__(self) -> str:
         return f"<Image(id={self.id}, entity='{self.entity_type}:{self.entity_id}')>"
+
+
+class ImageVariant(Base):
+    """Уменьшенная копия изображения в одном из современных форматов."""
+    
+    __tablename__ = "image_variants"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    image_id: Mapped[int] = mapped_column(
+        ForeignKey("images.id", ondelete="CASCADE"), index=True
+    )
+    
+    format: Mapped[str] = mapped_column(String(10))  # "webp", "avif"
+    width: Mapped[int] = mapped_column(Integer)
+    height: Mapped[int] = mapped_column(Integer)
+    url: Mapped[str] = mapped_column(String(500))
+    size: Mapped[int | None] = mapped_column(Integer, nullable=True)  # Bytes
+    
+    image: Mapped["Image"] = relationship("Image", back_populates="variants")
+    
+    def __repr__(self) -> str:
+        return f"<ImageVariant(image_id={self.image_id}, {self.format} {self.width}w)>"
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime
+from sqlalchemy import String, Text, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -10,10 +10,17 @@ class Lead(Base):
     """Кастомная заявка на обратный звонок или подбор участка (Лид)."""
     
     __tablename__ = "leads"
+    __table_args__ = (
+        # Список заявок в админке: фильтр по статусу и keyset-пагинация по (created_at, id)
+        Index("ix_leads_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_leads_created_at_id", "created_at", "id"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     phone: Mapped[str] = mapped_column(String(50), index=True)
+    # Телефон одними цифрами с кодом страны (app.utils.phone.normalize_phone) — для поиска повторных заявок
+    phone_normalized: Mapped[str | None] = mapped_column(String(20), nullable=True, index=True)
     comment: Mapped[str | None] = mapped_column(Text, nullable=True)
     
     # Мета-данные для аналитики и защиты
@@ -22,7 +29,7 @@ class Lead(Base):
     user_agent: Mapped[str | None] = mapped_column(String(500), nullable=True)
     
     # Статус обработки
-    status: Mapped[str] = mapped_column(String(20), default="new", index=True)  # new, processing, completed, rejected
+    status: Mapped[str] = mapped_column(String(20), default="new")  # new, processing, completed, rejected
     
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
     updated_at: Mapped[datetime] = mapped_column(
@@ -0,0 +1,42 @@
+from datetime import datetime
+from sqlalchemy import String, Text, Integer, DateTime, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+from app.utils.time import utcnow
+
+
+class OutboxMessage(Base):
+    """Исходящее уведомление, ожидающее доставки (transactional outbox).
+
+    Пишется в той же транзакции, что и событие (например, заявка), и
+    отправляется фоновым диспетчером app.services.outbox.
+    """
+
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # Диспетчер выбирает только ожидающие сообщения, у которых подошёл срок
+        Index(
+            "ix_outbox_pending",
+            "kind",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(20))  # "telegram"
+    body: Mapped[str] = mapped_column(Text)  # готовый текст сообщения
+    lead_id: Mapped[int | None] = mapped_column(Integer, nullable=True)  # источник, для разбора
+
+    # Состояние доставки
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending, sent, failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, index=True)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<OutboxMessage(id={self.id}, kind='{self.kind}', status='{self.status}')>"
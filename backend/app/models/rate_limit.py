@@ -0,0 +1,27 @@
+"""
+Счётчики ограничения частоты запросов, общие для воркеров uvicorn.
+"""
+
+from sqlalchemy import BigInteger, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class RateLimitCounter(Base):
+    """
+    Число запросов по ключу в фиксированном окне (см. app.services.rate_limit).
+
+    Таблица UNLOGGED: не пишется в WAL и не реплицируется, после сбоя
+    PostgreSQL очищается — для счётчиков на минуты это допустимо.
+    """
+
+    __tablename__ = "rate_limit_counters"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = mapped_column(String(200), primary_key=True)  # "lead:ip:1.2.3.4"
+    window_start: Mapped[int] = mapped_column(BigInteger, primary_key=True)  # unix-время начала окна
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+    def __repr__(self) -> str:
+        return f"<RateLimitCounter(key='{self.key}', window_start={self.window_start}, count={self.count})>"
@@ -268,31 +268,22 @@ class NspdClient:
             await self.client.aclose()
 
 
-def _get_settings_from_db() -> tuple[Optional[str], float, Optional[str]]:
-    """Получить настройки NSPD из базы данных.
+async def _get_nspd_settings() -> tuple[Optional[str], float, Optional[str]]:
+    """Получить настройки NSPD из кеша настроек.
     
     Returns:
         (proxy, timeout, user_agent)
     """
+    from app.services.site_settings import site_settings
+
     try:
-        from app.database import SessionLocal
-        from app.models.setting import Setting
-        
-        db = SessionLocal()
-        try:
-            proxy_setting = db.query(Setting).filter(Setting.key == "nspd_proxy").first()
-            timeout_setting = db.query(Setting).filter(Setting.key == "nspd_timeout").first()
-            ua_setting = db.query(Setting).filter(Setting.key == "nspd_user_agent").first()
-            
-            proxy = proxy_setting.value if proxy_setting and proxy_setting.value else None
-            timeout = float(timeout_setting.value) if timeout_setting and timeout_setting.value else 10.0
-            user_agent = ua_setting.value if ua_setting and ua_setting.value else None
-            
-            return proxy, timeout, user_agent
-        finally:
-            db.close()
+        proxy = await site_settings.get("nspd_proxy")
+        timeout_value = await site_settings.get("nspd_timeout")
+        user_agent = await site_settings.get("nspd_user_agent")
+        timeout = float(timeout_value) if timeout_value else 10.0
+        return proxy, timeout, user_agent
     except Exception as e:
-        logger.warning(f"NSPD: Failed to load settings from DB: {e}")
+        logger.warning(f"NSPD: Failed to load settings: {e}")
         return None, 10.0, None
 
 
@@ -304,7 +295,7 @@ async def get_nspd_client() -> AsyncGenerator[NspdClient, None]:
     Создаёт новый экземпляр для каждого запроса (или scope),
     и корректно закрывает соединение после использования.
     """
-    proxy, timeout, user_agent = _get_settings_from_db()
+    proxy, timeout, user_agent = await _get_nspd_settings()
     # logger.info(f"NSPD: Creating client with proxy={proxy}, timeout={timeout}, ua={user_agent}")
     client = NspdClient(timeout=timeout, proxy=proxy, user_agent=user_agent)
     try:
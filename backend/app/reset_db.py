@@ -6,7 +6,7 @@
     python -m app.reset_db
 """
 
-from app.database import engine, SessionLocal, Base
+from app.database import Base, get_sync_engine, sync_session
 from app.models.admin_user import AdminUser
 from app.auth import hash_password
 
@@ -23,13 +23,13 @@ from app.models.plot import Plot
 def reset_database():
     """Удалить все таблицы и создать заново."""
     print("Удаляем все таблицы...")
-    Base.metadata.drop_all(bind=engine)
+    Base.metadata.drop_all(bind=get_sync_engine())
     
     print("Создаём таблицы...")
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_sync_engine())
     
     print("Создаём администратора...")
-    db = SessionLocal()
+    db = sync_session()
     try:
         admin = AdminUser(
             username="admin",
@@ -3,7 +3,7 @@ API для геолокации и населённых пунктов.
 Асинхронная версия.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
@@ -14,6 +14,7 @@ from app.models.location import District, Settlement, Location, LocationType
 from app.models.admin_user import AdminUser
 from app.routers.auth import get_current_user
 from app.dadata_client import get_dadata_client, DaDataSuggestion
+from app.services.settlement_index import get_settlement_index, invalidate_settlement_index
 
 router = APIRouter()
 
@@ -66,13 +67,31 @@ def slugify(text: str) -> str:
 @router.get("/suggest", response_model=SuggestionResponse)
 async def suggest_settlements(
     query: str,
+    remote: bool = Query(False, description="Искать сразу в DaData, минуя локальный индекс"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AdminUser = Depends(get_current_user),
 ):
     """
-    Proxy request to DaData for settlement suggestions.
+    Подсказки населённых пунктов.
+
+    Сначала ищем среди уже известных локаций (локальный индекс в памяти).
+    Если запрос совпал с известным названием, DaData не спрашиваем; иначе
+    добавляем к локальным подсказкам подсказки DaData — похожее название
+    не должно прятать новый населённый пункт.
     """
+    local = []
+    if not remote:
+        index = get_settlement_index()
+        await index.ensure_loaded(db)
+        result = index.search(query)
+        if result.confident:
+            return {"suggestions": result.suggestions}
+        local = result.suggestions
+
     client = get_dadata_client()
-    suggestions = await client.suggest_settlement(query)
+    remote_suggestions = await client.suggest_settlement(query)
+    known_fias = {s.data.get("fias_id") for s in local if s.data.get("fias_id")}
+    suggestions = local + [s for s in remote_suggestions if s.data.get("fias_id") not in known_fias]
     return {"suggestions": suggestions}
 
 @router.post("/resolve", response_model=SettlementResolved)
@@ -178,6 +197,7 @@ async def resolve_settlement(
         db.add(settlement)
         await db.commit()
         await db.refresh(settlement)
+        invalidate_settlement_index()
     
     if not settlement:
         raise HTTPException(status_code=400, detail="Could not resolve settlement")
@@ -335,6 +355,7 @@ async def _find_or_create_location(
         db.add(location)
         await db.commit()
         await db.refresh(location)
+        invalidate_settlement_index()
     
     return location
 
@@ -11,12 +11,13 @@ from sqlalchemy.orm import joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_db
-from app.config import settings
 from app.models.listing import Listing
 from app.models.plot import Plot, PlotStatus
 from app.models.image import Image
 from app.models.admin_user import AdminUser
 from app.routers.auth import get_current_user
+from app.services.map_refresh import listing_map_refresher
+from app.utils.image_files import remove_unshared_image_files
 from app.schemas.admin_listing import (
     ListingAdminListItem,
     ListingAdminDetail,
@@ -335,13 +336,15 @@ async def create_listing(
     # Генерируем slug из title + ID
     listing.slug = generate_slug(data.title, listing.id)
     
-    # Привязываем участки
+    # Привязываем участки (карты прежних объявлений этих участков устаревают)
+    affected_listing_ids: set[int] = set()
     if data.plot_ids:
         result = await db.execute(
             select(Plot).where(Plot.id.in_(data.plot_ids))
         )
         plots = result.scalars().all()
         for plot in plots:
+            affected_listing_ids.add(plot.listing_id)
             plot.listing_id = listing.id
 
     # Привязываем изображения
@@ -360,6 +363,7 @@ async def create_listing(
     
     await db.commit()
     await db.refresh(listing)
+    listing_map_refresher.schedule(affected_listing_ids)
     
     return listing_to_detail(listing)
 
@@ -416,7 +420,9 @@ async def update_listing(
         setattr(listing, key, value)
     
     # Обновляем привязку участков если передано
+    affected_listing_ids: set[int] = set()
     if data.plot_ids is not None:
+        affected_listing_ids.add(listing_id)
         # Отвязываем все текущие участки
         result = await db.execute(
             select(Plot).where(Plot.listing_id == listing_id)
@@ -432,6 +438,7 @@ async def update_listing(
             )
             new_plots = result.scalars().all()
             for plot in new_plots:
+                affected_listing_ids.add(plot.listing_id)
                 plot.listing_id = listing_id
 
     # Обновляем привязку изображений
@@ -464,6 +471,7 @@ async def update_listing(
     
     await db.commit()
     await db.refresh(listing)
+    listing_map_refresher.schedule(affected_listing_ids)
     
     return listing_to_detail(listing)
 
@@ -502,17 +510,7 @@ async def delete_listing(
     
     for img in images:
         try:
-            if img.url:
-                filename = os.path.basename(img.url)
-                filepath = os.path.join(settings.upload_dir, filename)
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-            
-            if img.thumbnail_url:
-                thumb_name = os.path.basename(img.thumbnail_url)
-                thumb_path = os.path.join(settings.upload_dir, thumb_name)
-                if os.path.exists(thumb_path):
-                    os.remove(thumb_path)
+            await remove_unshared_image_files(db, img)
             
             await db.delete(img)
         except Exception as e:
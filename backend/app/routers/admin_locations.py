@@ -14,6 +14,7 @@ from app.database import get_async_db
 from app.models.location import Location, LocationType
 from app.models.admin_user import AdminUser
 from app.routers.auth import get_current_user
+from app.services.settlement_index import invalidate_settlement_index
 
 router = APIRouter()
 
@@ -230,6 +231,7 @@ async def create_location(
     db.add(location)
     await db.commit()
     await db.refresh(location)
+    invalidate_settlement_index()
     
     return LocationItem(
         id=location.id,
@@ -288,6 +290,7 @@ async def update_location(
     
     await db.commit()
     await db.refresh(location)
+    invalidate_settlement_index()
     
     # Подсчёт детей
     children_count_result = await db.execute(
@@ -337,6 +340,7 @@ async def delete_location(
     
     await db.delete(location)
     await db.commit()
+    invalidate_settlement_index()
     
     return {"message": "Location deleted"}
 
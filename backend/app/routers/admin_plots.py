@@ -17,6 +17,7 @@ from app.models.listing import Listing
 from app.models.admin_user import AdminUser
 from app.routers.auth import get_current_user
 from app.nspd_client import NspdClient, get_nspd_client
+from app.services.map_refresh import listing_map_refresher, plot_listing_ids
 
 from app.schemas.admin_plot import (
     PlotAdminListItem,
@@ -271,11 +272,14 @@ async def bulk_assign_plots(
     if not listing:
         raise HTTPException(status_code=404, detail="Объявление не найдено")
     
+    # Карты перерисовываются и у прежних объявлений участков
+    affected = await plot_listing_ids(db, data.plot_ids)
     await db.execute(
         update(Plot).where(Plot.id.in_(data.plot_ids)).values(listing_id=data.listing_id)
     )
     updated = len(data.plot_ids)
     await db.commit()
+    listing_map_refresher.schedule(affected | {data.listing_id})
     
     return BulkAssignResponse(updated_count=updated)
 
@@ -405,6 +409,7 @@ async def create_plot(
     db.add(plot)
     await db.commit()
     await db.refresh(plot)
+    listing_map_refresher.schedule([plot.listing_id])
     
     return {
         **plot_to_list_item(plot),
@@ -431,12 +436,14 @@ async def update_plot(
     if not plot:
         raise HTTPException(status_code=404, detail="Участок не найден")
     
+    previous_listing_id = plot.listing_id
     update_data = data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(plot, key, value)
     
     await db.commit()
     await db.refresh(plot)
+    listing_map_refresher.schedule([previous_listing_id, plot.listing_id])
     
     return {
         **plot_to_list_item(plot),
@@ -465,6 +472,7 @@ async def delete_plot(
     listing_id = plot.listing_id
     await db.delete(plot)
     await db.commit()
+    listing_map_refresher.schedule([listing_id])
     
     return None
 
@@ -476,11 +484,13 @@ async def bulk_delete_plots(
     current_user: AdminUser = Depends(get_current_user),
 ):
     """Массовое удаление участков."""
+    affected = await plot_listing_ids(db, data.ids)
     result = await db.execute(
         delete(Plot).where(Plot.id.in_(data.ids))
     )
     deleted = result.rowcount
     await db.commit()
+    listing_map_refresher.schedule(affected)
     
     return BulkDeleteResponse(deleted_count=deleted)
 
@@ -530,6 +540,7 @@ async def fetch_geometry_from_nspd(
     
     await db.commit()
     await db.refresh(plot)
+    listing_map_refresher.schedule([plot.listing_id])
     
     return {
         **plot_to_list_item(plot),
@@ -555,6 +566,8 @@ async def bulk_import_plots(
     created_count = 0
     updated_count = 0
     error_count = 0
+    # Объявления обновлённых участков: геометрия могла измениться
+    affected_listing_ids: set[int] = set()
     
     for item in data.items:
         try:
@@ -571,6 +584,7 @@ async def bulk_import_plots(
                 plot = existing
                 status = "updated"
                 updated_count += 1
+                affected_listing_ids.add(existing.listing_id)
             else:
                 plot = Plot(
                     cadastral_number=item.cadastral_number,
@@ -623,6 +637,7 @@ async def bulk_import_plots(
             ))
     
     await db.commit()
+    listing_map_refresher.schedule(affected_listing_ids)
     
     return BulkImportResponse(
         total=len(data.items),
@@ -651,6 +666,8 @@ async def bulk_import_stream(
         created_count = 0
         updated_count = 0
         error_count = 0
+        # Объявления обновлённых участков: геометрия могла измениться
+        affected_listing_ids: set[int] = set()
         
         for index, item in enumerate(data.items):
             try:
@@ -667,6 +684,7 @@ async def bulk_import_stream(
                     plot = existing
                     status = "updated"
                     updated_count += 1
+                    affected_listing_ids.add(existing.listing_id)
                 else:
                     plot = Plot(
                         cadastral_number=item.cadastral_number,
@@ -744,6 +762,8 @@ async def bulk_import_stream(
                     "item": error_item.model_dump()
                 }) + "\n"
         
+        listing_map_refresher.schedule(affected_listing_ids)
+
         summary = BulkImportResponse(
             total=len(data.items),
             created=created_count,
@@ -13,6 +13,8 @@ from app.database import get_async_db
 from app.models.setting import Setting
 from app.models.admin_user import AdminUser
 from app.routers.auth import get_current_user
+from app.services.outbox import outbox_dispatcher
+from app.services.site_settings import notify_settings_changed, site_settings
 from app.services.telegram import (
     build_proxy_url,
     load_telegram_settings,
@@ -101,23 +103,11 @@ async def update_setting(
         setting.value = data.value
         setting.updated_at = utcnow()
     
+    # Остальные воркеры перечитают настройку из кеша после commit
+    await notify_settings_changed(db, key)
     await db.commit()
     await db.refresh(setting)
-    
-    
-    # Cache invalidation for NSPD is not needed because it's instantiated per-request
-    # checking DB settings every time.
-    # if key.startswith("nspd_"):
-    #     _invalidate_nspd_client()
-
-    
-    # Сбрасываем кеш DaData клиента при изменении его настроек
-    if key.startswith("dadata_"):
-        try:
-             _invalidate_dadata_client()
-        except ImportError:
-             pass # Fail silently if not implemented
-
+    site_settings.apply_local(key, setting.value)
     
     return setting
 
@@ -199,7 +189,6 @@ class CheckTelegramResponse(BaseModel):
 
 @router.post("/check-telegram", response_model=CheckTelegramResponse)
 async def check_telegram(
-    db: AsyncSession = Depends(get_async_db),
     current_user: AdminUser = Depends(get_current_user),
 ):
     """
@@ -209,13 +198,16 @@ async def check_telegram(
     """
     import time
 
-    settings = await load_telegram_settings(db)
+    settings = await load_telegram_settings()
     start_time = time.time()
 
     success, error = await send_message(
         "\u2705 Проверка связи: уведомления о заявках с сайта настроены.",
         settings,
     )
+    if success:
+        # Связь есть — отложенные уведомления о заявках отправляем, не дожидаясь паузы
+        outbox_dispatcher.wake(retry_now=True)
 
     return CheckTelegramResponse(
         success=success,
@@ -223,15 +215,3 @@ async def check_telegram(
         proxy=mask_proxy_url(build_proxy_url(settings)),
         elapsed_ms=(time.time() - start_time) * 1000,
     )
-
-
-# def _invalidate_nspd_client():
-#     """Сброс NSPD клиента для применения новых настроек."""
-#     # Not used anymore
-#     pass
-
-
-def _invalidate_dadata_client():
-    """Сброс DaData клиента для применения новых настроек."""
-    from app.dadata_client import reset_dadata_client
-    reset_dadata_client()
@@ -10,8 +10,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_db
 from app.models.admin_user import AdminUser
-from app.auth import hash_password
-from app.routers.auth import get_current_user
+from app.auth import PasswordHasherBusy, hash_password_async
+from app.services.principal_cache import notify_admin_user_changed
+from app.routers.auth import get_current_user, hashing_busy_exception
 
 
 router = APIRouter()
@@ -133,9 +134,13 @@ async def create_user(
             )
     
     # Создаём пользователя
+    try:
+        password_hash = await hash_password_async(data.password)
+    except PasswordHasherBusy:
+        raise hashing_busy_exception()
     user = AdminUser(
         username=data.username,
-        password_hash=hash_password(data.password),
+        password_hash=password_hash,
         email=data.email,
         display_name=data.display_name,
         telegram_id=data.telegram_id,
@@ -168,6 +173,8 @@ async def update_user(
             detail="Пользователь не найден"
         )
     
+    previous_username = user.username
+    
     # Проверяем уникальность username
     if data.username and data.username != user.username:
         existing = await db.execute(
@@ -201,6 +208,7 @@ async def update_user(
     if data.is_active is not None:
         user.is_active = data.is_active
     
+    await notify_admin_user_changed(db, previous_username, user.username)
     await db.commit()
     await db.refresh(user)
     
@@ -226,7 +234,11 @@ async def change_user_password(
             detail="Пользователь не найден"
         )
     
-    user.password_hash = hash_password(data.new_password)
+    try:
+        user.password_hash = await hash_password_async(data.new_password)
+    except PasswordHasherBusy:
+        raise hashing_busy_exception()
+    await notify_admin_user_changed(db, user.username)
     await db.commit()
     
     return {"detail": "Пароль успешно изменён"}
@@ -258,6 +270,7 @@ async def delete_user(
         )
     
     await db.delete(user)
+    await notify_admin_user_changed(db, user.username)
     await db.commit()
     
     return {"detail": "Пользователь удалён"}
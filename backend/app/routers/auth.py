@@ -4,7 +4,7 @@ API роутер для аутентификации.
 """
 
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from sqlalchemy import select
@@ -12,11 +12,19 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_db
 from app.models.admin_user import AdminUser
-from app.models.setting import Setting
-from app.auth import verify_password, hash_password, create_access_token, decode_access_token
-from app.utils.email import send_email
+from app.auth import (
+    PasswordHasherBusy,
+    create_access_token,
+    decode_access_token,
+    hash_password_async,
+    verify_password_async,
+)
+from app.services.email_queue import email_queue
 from app.config import settings
 from app.utils.time import utcnow
+from app.services.principal_cache import notify_admin_user_changed, principal_cache
+from app.services.rate_limit import login_rate_limiter
+from app.services.site_settings import site_settings
 
 
 router = APIRouter()
@@ -49,13 +57,27 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 
+def hashing_busy_exception() -> HTTPException:
+    """Очередь хеширования паролей переполнена."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервер перегружен, попробуйте через несколько секунд",
+        headers={"Retry-After": "5"},
+    )
+
+
 # === Зависимости ===
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_async_db),
 ) -> AdminUser:
-    """Получить текущего пользователя из JWT токена."""
+    """
+    Получить текущего пользователя из JWT токена.
+
+    Пользователь берётся из короткоживущего кеша (app.services.principal_cache):
+    при попадании запрос к admin_users не делается и сессия БД не открывается.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учётные данные",
@@ -70,13 +92,18 @@ async def get_current_user(
     if username is None:
         raise credentials_exception
     
-    result = await db.execute(
-        select(AdminUser).where(AdminUser.username == username)
-    )
-    user = result.scalar_one_or_none()
-    
-    if user is None:
-        raise credentials_exception
+    principal = principal_cache.get(username)
+    if principal is not None:
+        user = principal.to_user()
+    else:
+        result = await db.execute(
+            select(AdminUser).where(AdminUser.username == username)
+        )
+        user = result.scalar_one_or_none()
+        
+        if user is None:
+            raise credentials_exception
+        principal_cache.put(user)
     
     if not user.is_active:
         raise HTTPException(
@@ -91,16 +118,42 @@ async def get_current_user(
 
 @router.post("/login", response_model=Token)
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_async_db),
 ):
-    """Авторизация и получение JWT токена."""
+    """
+    Авторизация и получение JWT токена.
+
+    Неудачные попытки считаются по логину и по IP: после
+    settings.login_failures_per_username / login_failures_per_ip неудач за
+    settings.login_failure_window_seconds вход отклоняется с 429 ещё до
+    проверки пароля.
+    """
+    throttle_keys = {
+        "username": form_data.username.strip().lower(),
+        "ip": request.client.host if request.client else None,
+    }
+    retry_after = await login_rate_limiter.peek(db, **throttle_keys)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много неудачных попыток входа, попробуйте позже",
+            headers={"Retry-After": str(retry_after)},
+        )
+
     result = await db.execute(
         select(AdminUser).where(AdminUser.username == form_data.username)
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.password_hash):
+    try:
+        password_ok = await verify_password_async(form_data.password, user.password_hash if user else None)
+    except PasswordHasherBusy:
+        raise hashing_busy_exception()
+
+    if not password_ok:
+        await login_rate_limiter.check(db, **throttle_keys)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный логин или пароль",
@@ -154,22 +207,20 @@ async def forgot_password(
     site_url = settings.cors_origins[0] if settings.cors_origins else "http://localhost:3000"
     reset_link = f"{site_url}/reset-password?token={reset_token}"
 
-    # Отправляем письмо
-    try:
-        subject = "Восстановление пароля — РКК Лэнд"
-        text = f"Здравствуйте! Чтобы сбросить пароль, перейдите по ссылке: {reset_link}\nСсылка действует 15 минут."
-        html = f"""
-        <p>Здравствуйте!</p>
-        <p>Чтобы сбросить пароль для доступа к админ-панели <b>РКК Лэнд</b>, нажмите на кнопку ниже:</p>
-        <p><a href="{reset_link}" style="background: #0070f3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Сбросить пароль</a></p>
-        <p>Или скопируйте ссылку в браузер: {reset_link}</p>
-        <p><i>Ссылка действует 15 минут.</i></p>
-        """
-        send_email(subject, [user.email], text, html)
-    except Exception:
-        raise HTTPException(status_code=500, detail="Ошибка при отправке письма")
-
-    return {"detail": "Письмо отправлено."}
+    # Письмо уходит из фоновой очереди: ответ не ждёт SMTP и одинаков
+    # для известного и неизвестного email
+    subject = "Восстановление пароля — РКК Лэнд"
+    text = f"Здравствуйте! Чтобы сбросить пароль, перейдите по ссылке: {reset_link}\nСсылка действует 15 минут."
+    html = f"""
+    <p>Здравствуйте!</p>
+    <p>Чтобы сбросить пароль для доступа к админ-панели <b>РКК Лэнд</b>, нажмите на кнопку ниже:</p>
+    <p><a href="{reset_link}" style="background: #0070f3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Сбросить пароль</a></p>
+    <p>Или скопируйте ссылку в браузер: {reset_link}</p>
+    <p><i>Ссылка действует 15 минут.</i></p>
+    """
+    email_queue.enqueue(subject, [user.email], text, html)
+
+    return {"detail": "Если этот email зарегистрирован, вы получите письмо."}
 
 
 @router.post("/reset-password")
@@ -192,7 +243,11 @@ async def reset_password(
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
     # Меняем пароль
-    user.password_hash = hash_password(request.new_password)
+    try:
+        user.password_hash = await hash_password_async(request.new_password)
+    except PasswordHasherBusy:
+        raise hashing_busy_exception()
+    await notify_admin_user_changed(db, user.username)
     await db.commit()
 
     return {"detail": "Пароль успешно изменен."}
@@ -246,12 +301,8 @@ async def telegram_login(
     """Авторизация через Telegram Login Widget."""
     import time
     
-    # Получаем токен бота из БД (настройки сайта)
-    result = await db.execute(
-        select(Setting).where(Setting.key == "tg_bot_token")
-    )
-    setting = result.scalar_one_or_none()
-    bot_token = setting.value if setting else None
+    # Получаем токен бота из настроек сайта
+    bot_token = await site_settings.get("tg_bot_token")
     
     if not bot_token:
         raise HTTPException(
@@ -0,0 +1,77 @@
+"""
+Единый стартовый ответ для SSR публичного сайта.
+
+Вместо отдельных запросов /api/settings/public, /api/locations/hierarchy,
+/api/listings/popular и /api/public-plots/count фронтенд делает один запрос.
+Все части берутся из кешей в памяти, поэтому обычно ответ собирается без
+обращения к БД, а при совпадении If-None-Match отдаётся пустой 304.
+"""
+
+import hashlib
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from app.routers.listings import get_cached_popular
+from app.routers.locations import LocationPublicItem, get_cached_hierarchy
+from app.routers.public_plots import get_cached_plots_count
+from app.routers.public_settings import PublicSettingsResponse, load_public_settings
+from app.schemas.listing import ListingListItem
+from app.services.site_settings import site_settings
+from app.utils.cache import etag_matches
+
+router = APIRouter()
+
+# Клиент каждый раз переспрашивает, но почти всегда получает 304
+CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+class BootstrapResponse(BaseModel):
+    """Всё, что нужно для рендера любой публичной страницы."""
+    version: str
+    settings: PublicSettingsResponse
+    locations: list[LocationPublicItem]
+    popular_listings: list[ListingListItem]
+    plots_count: int
+
+
+@router.get("", response_model=BootstrapResponse)
+async def get_bootstrap(
+    request: Request,
+    popular_limit: int = Query(4, ge=1, le=20, description="Сколько популярных объявлений вернуть"),
+):
+    """
+    Настройки сайта, дерево локаций, популярные объявления и счётчик участков.
+
+    Версия (ETag) складывается из версий всех частей и одинакова во всех воркерах.
+    """
+    public_settings = await load_public_settings()
+    hierarchy = await get_cached_hierarchy()
+    popular = await get_cached_popular(popular_limit)
+    plots_count = await get_cached_plots_count()
+
+    version = hashlib.sha1(
+        "|".join((
+            site_settings.etag,
+            hierarchy.etag,
+            popular.etag,
+            plots_count.etag,
+        )).encode()
+    ).hexdigest()[:20]
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(
+        content={
+            "version": version,
+            "settings": public_settings.model_dump(mode="json"),
+            "locations": hierarchy.value,
+            "popular_listings": popular.value,
+            "plots_count": plots_count.value,
+        },
+        headers=headers,
+    )
@@ -0,0 +1,361 @@
+"""
+Данные гео-страницы (/zelenogradskij-r-n/svetlogorsk) одним запросом.
+
+Раньше страница отдельно резолвила слаги, запрашивала объявления, точки для
+карты и счётчики — и каждый из этих запросов заново искал потомков локации.
+Здесь потомки вычисляются один раз рекурсивным CTE, а остальные запросы
+фильтруются по уже полученному списку ID. Готовый ответ кешируется по пути
+на settings.public_cache_ttl секунд.
+"""
+
+import hashlib
+import math
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+from geoalchemy2.functions import ST_X, ST_Y
+from pydantic import BaseModel
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, selectinload
+
+from app.config import settings
+from app.services.read_replica import read_session
+from app.models.listing import Listing
+from app.models.location import Location, LocationType, Settlement
+from app.models.plot import Plot, PlotStatus
+from app.schemas.listing import ListingListResponse
+from app.schemas.public_plot import PlotPoint
+from app.services.site_settings import site_settings
+from app.utils.cache import AsyncTTLCache, etag_matches
+
+router = APIRouter()
+
+# Ключ — (слаги пути, размер первой страницы)
+_page_cache = AsyncTTLCache(ttl=settings.public_cache_ttl, maxsize=512)
+# Ненайденные пути — отдельно и понемногу: перебор случайных путей не должен
+# вытеснять настоящие страницы из _page_cache
+_missing_cache = AsyncTTLCache(ttl=settings.public_cache_ttl, maxsize=256)
+
+
+class _PageNotFound(Exception):
+    """Путь не найден — loader бросает, чтобы в _page_cache ничего не попало."""
+
+CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+MAX_PATH_DEPTH = 5
+
+SEO_TEMPLATE_KEYS = [
+    "seo_geo_title_template",
+    "seo_geo_description_template",
+    "seo_geo_h1_template",
+]
+
+
+class GeoBreadcrumb(BaseModel):
+    """Звено пути гео-страницы."""
+    id: int
+    name: str
+    slug: str
+    type: LocationType
+    settlement_type: str | None = None
+    name_locative: str | None = None
+    path: str  # "/zelenogradskij-r-n/svetlogorsk"
+
+
+class GeoLocation(BaseModel):
+    """Локация страницы с количеством объявлений и участков (с учётом потомков)."""
+    id: int
+    name: str
+    slug: str
+    type: LocationType
+    settlement_type: str | None = None
+    name_locative: str | None = None  # SEO: "в Калининграде"
+    description: str | None = None  # SEO: описание локации
+    parent_slug: str | None = None
+    listings_count: int = 0
+    plots_count: int = 0
+
+
+class GeoChildItem(BaseModel):
+    """Дочерняя локация со счётчиками по всему её поддереву."""
+    id: int
+    name: str
+    slug: str
+    type: LocationType
+    settlement_type: str | None = None
+    name_locative: str | None = None
+    path: str
+    listings_count: int = 0
+    plots_count: int = 0
+
+
+class GeoSeoTemplates(BaseModel):
+    """Шаблоны SEO гео-страниц из настроек сайта."""
+    seo_geo_title_template: str | None = None
+    seo_geo_description_template: str | None = None
+    seo_geo_h1_template: str | None = None
+
+
+class GeoPageResponse(BaseModel):
+    """Всё, что нужно для рендера гео-страницы."""
+    version: str
+    location: GeoLocation
+    breadcrumbs: list[GeoBreadcrumb]
+    children: list[GeoChildItem]
+    listings: ListingListResponse
+    map_points: list[PlotPoint]
+    seo: GeoSeoTemplates
+
+
+async def _resolve_path(db: AsyncSession, slugs: list[str]) -> list[Location] | None:
+    """
+    Цепочка локаций по слагам одним запросом.
+
+    Первый слаг может быть на любом уровне (регион в URL не пишется),
+    каждый следующий обязан быть прямым потомком предыдущего.
+    """
+    result = await db.execute(select(Location).where(Location.slug.in_(slugs)))
+    by_slug = {loc.slug: loc for loc in result.scalars().all()}
+
+    chain: list[Location] = []
+    for slug in slugs:
+        location = by_slug.get(slug)
+        if location is None:
+            return None
+        if chain and location.parent_id != chain[-1].id:
+            return None
+        chain.append(location)
+    return chain
+
+
+async def build_geo_page(db: AsyncSession, slugs: list[str], size: int) -> dict | None:
+    """Данные гео-страницы (JSON-совместимый словарь) или None, если путь не найден."""
+    chain = await _resolve_path(db, slugs)
+    if not chain:
+        return None
+    leaf = chain[-1]
+
+    # Поддерево локации (включая её саму) — единственный рекурсивный запрос
+    tree = select(Location.id, Location.parent_id).where(Location.id == leaf.id).cte(
+        "location_tree", recursive=True
+    )
+    tree = tree.union_all(
+        select(Location.id, Location.parent_id).join(tree, Location.parent_id == tree.c.id)
+    )
+    tree_result = await db.execute(
+        select(Location)
+        .join(tree, Location.id == tree.c.id)
+        .order_by(Location.sort_order.desc(), Location.name)
+    )
+    subtree = tree_result.scalars().all()
+    location_ids = [loc.id for loc in subtree]
+
+    # Собственные счётчики каждой локации поддерева
+    counts_result = await db.execute(
+        select(
+            Listing.location_id,
+            func.count(func.distinct(Listing.id)).label("listings"),
+            func.count(Plot.id).label("plots"),
+        )
+        .join(Plot, Listing.id == Plot.listing_id)
+        .where(
+            Listing.is_published == True,
+            Plot.status == PlotStatus.active,
+            Listing.location_id.in_(location_ids),
+        )
+        .group_by(Listing.location_id)
+    )
+    own_counts = {row.location_id: (row.listings, row.plots) for row in counts_result.all()}
+
+    children_of: dict[int, list[Location]] = {}
+    for loc in subtree:
+        children_of.setdefault(loc.parent_id, []).append(loc)
+
+    def subtree_counts(loc_id: int) -> tuple[int, int]:
+        listings, plots = own_counts.get(loc_id, (0, 0))
+        for child in children_of.get(loc_id, []):
+            child_listings, child_plots = subtree_counts(child.id)
+            listings += child_listings
+            plots += child_plots
+        return listings, plots
+
+    base_path = "/" + "/".join(slugs)
+
+    breadcrumbs = [
+        GeoBreadcrumb(
+            id=loc.id,
+            name=loc.name,
+            slug=loc.slug,
+            type=loc.type,
+            settlement_type=loc.settlement_type,
+            name_locative=loc.name_locative,
+            path="/" + "/".join(slugs[: index + 1]),
+        )
+        for index, loc in enumerate(chain)
+    ]
+
+    children = []
+    for child in children_of.get(leaf.id, []):
+        child_listings, child_plots = subtree_counts(child.id)
+        children.append(GeoChildItem(
+            id=child.id,
+            name=child.name,
+            slug=child.slug,
+            type=child.type,
+            settlement_type=child.settlement_type,
+            name_locative=child.name_locative,
+            path=f"{base_path}/{child.slug}",
+            listings_count=child_listings,
+            plots_count=child_plots,
+        ))
+
+    listings_total, plots_total = subtree_counts(leaf.id)
+
+    parent_slug = chain[-2].slug if len(chain) > 1 else None
+    if parent_slug is None and leaf.parent_id is not None:
+        parent_result = await db.execute(
+            select(Location.slug).where(Location.id == leaf.parent_id)
+        )
+        parent_slug = parent_result.scalar_one_or_none()
+
+    location = GeoLocation(
+        id=leaf.id,
+        name=leaf.name,
+        slug=leaf.slug,
+        type=leaf.type,
+        settlement_type=leaf.settlement_type,
+        name_locative=leaf.name_locative,
+        description=leaf.description,
+        parent_slug=parent_slug,
+        listings_count=listings_total,
+        plots_count=plots_total,
+    )
+
+    # Первая страница объявлений (как /api/listings?location_id=...&sort=newest)
+    active_listing_ids = (
+        select(Plot.listing_id)
+        .where(Plot.status == PlotStatus.active)
+        .distinct()
+        .subquery()
+    )
+    listings_result = await db.execute(
+        select(Listing)
+        .options(
+            selectinload(Listing.settlement).selectinload(Settlement.district),
+            selectinload(Listing.location).selectinload(Location.parent)
+        )
+        .where(Listing.is_published == True)
+        .where(Listing.id.in_(select(active_listing_ids.c.listing_id)))
+        .where(Listing.location_id.in_(location_ids))
+        .order_by(desc(Listing.created_at))
+        .limit(size)
+    )
+    listings = ListingListResponse(
+        items=listings_result.scalars().all(),
+        total=listings_total,
+        page=1,
+        size=size,
+        pages=math.ceil(listings_total / size) if listings_total > 0 else 1,
+    )
+
+    # Точки для карты (как /api/public-plots/all?location_id=...)
+    PointLocation = aliased(Location)
+    ParentLocation = aliased(Location)
+    points_result = await db.execute(
+        select(
+            Plot.id,
+            ST_Y(Plot.centroid).label("lat"),
+            ST_X(Plot.centroid).label("lon"),
+            Plot.price_public.label("price"),
+            Listing.slug.label("listing_slug"),
+            Listing.title.label("title"),
+            PointLocation.slug.label("location_slug"),
+            ParentLocation.slug.label("location_parent_slug"),
+            PointLocation.type.label("location_type"),
+        )
+        .join(Listing, Plot.listing_id == Listing.id)
+        .outerjoin(PointLocation, Listing.location_id == PointLocation.id)
+        .outerjoin(ParentLocation, PointLocation.parent_id == ParentLocation.id)
+        .where(
+            Plot.status == PlotStatus.active,
+            Plot.centroid.isnot(None),
+            Listing.is_published == True,
+            Listing.location_id.in_(location_ids),
+        )
+    )
+    map_points = [
+        PlotPoint(
+            id=p.id,
+            lat=p.lat,
+            lon=p.lon,
+            price=p.price,
+            listing_slug=p.listing_slug,
+            title=p.title,
+            location_slug=p.location_slug,
+            location_parent_slug=p.location_parent_slug,
+            location_type=p.location_type,
+        )
+        for p in points_result.all()
+    ]
+
+    return {
+        "location": location.model_dump(mode="json"),
+        "breadcrumbs": [item.model_dump(mode="json") for item in breadcrumbs],
+        "children": [item.model_dump(mode="json") for item in children],
+        "listings": listings.model_dump(mode="json"),
+        "map_points": [point.model_dump(mode="json") for point in map_points],
+    }
+
+
+@router.get("/{path:path}", response_model=GeoPageResponse)
+async def get_geo_page(
+    path: str,
+    request: Request,
+    size: int = Query(12, ge=1, le=100, description="Размер первой страницы объявлений"),
+):
+    """
+    Локация, хлебные крошки, счётчики, первая страница объявлений,
+    точки для карты и SEO-шаблоны гео-страницы.
+
+    Пример: /api/geo-page/zelenogradskij-r-n/svetlogorsk
+    """
+    slugs = tuple(s for s in path.strip("/").split("/") if s)
+    if not slugs or len(slugs) > MAX_PATH_DEPTH:
+        raise HTTPException(status_code=404, detail="Локация не найдена")
+
+    if _missing_cache.peek(slugs) is not None:
+        raise HTTPException(status_code=404, detail="Локация не найдена")
+
+    async def load():
+        async with read_session() as db:
+            page = await build_geo_page(db, list(slugs), size)
+        if page is None:
+            raise _PageNotFound()
+        return page
+
+    try:
+        cached = await _page_cache.get_or_load((slugs, size), load)
+    except _PageNotFound:
+        _missing_cache.set(slugs, True)
+        raise HTTPException(status_code=404, detail="Локация не найдена")
+
+    seo = GeoSeoTemplates(**await site_settings.get_many(SEO_TEMPLATE_KEYS))
+
+    version = hashlib.sha1(
+        f"{cached.etag}|{site_settings.etag}".encode()
+    ).hexdigest()[:20]
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(
+        content={
+            "version": version,
+            **cached.value,
+            "seo": seo.model_dump(mode="json"),
+        },
+        headers=headers,
+    )
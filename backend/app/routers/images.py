@@ -3,19 +3,33 @@ API для управления изображениями.
 Асинхронная версия.
 """
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+import asyncio
+import json
+import logging
+
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_async_db
+from app.config import settings
+from app.database import AsyncSessionLocal, get_async_db
 from app.models.image import Image
 from app.models.admin_user import AdminUser
 from app.routers.auth import get_current_user
-from app.config import settings
 from app.schemas.image import ImageItem
-import uuid
-import os
-import shutil
-from PIL import Image as PILImage, ImageOps
+from app.services.image_gc import ImageGCReport, collect_image_garbage
+from app.services.image_pool import ImagePoolBusy, image_pool
+from app.services.image_upload import (
+    StoredUpload,
+    UploadRejected,
+    build_image,
+    find_processed,
+    make_image,
+    store_upload,
+)
+from app.utils.image_files import remove_unshared_image_files
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -27,63 +41,23 @@ async def upload_image(
 ):
     """
     Загрузка изображения (админ).
-    Валидирует тип, генерирует UUID имя, создает миниатюру 300x300.
+    Проверяет размер и формат по содержимому, сохраняет под именем из хеша
+    (повторная загрузка того же файла его не дублирует), создает уменьшенные
+    копии WebP/AVIF для srcset. Миниатюра 300x300 отдаётся через /img.
     """
-    # Validation
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(400, "Invalid file type")
-    
-    # Save original
-    ext = os.path.splitext(file.filename)[1]
-    if not ext:
-        ext = ".jpg"
-        
-    filename = f"{uuid.uuid4()}{ext}"
-    filepath = os.path.join(settings.upload_dir, filename)
-    
-    # Write file
-    try:
-        with open(filepath, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-         raise HTTPException(500, f"File write failed: {str(e)}")
-        
-    # Process with Pillow
-    width = 0
-    height = 0
-    thumb_filename = None
-    
     try:
-        with PILImage.open(filepath) as img:
-            # Fix orientation (EXIF)
-            img = ImageOps.exif_transpose(img)
-            width, height = img.size
-            
-            # Create thumbnail
-            thumb_filename = f"thumb_{filename}"
-            thumb_path = os.path.join(settings.upload_dir, thumb_filename)
-            
-            # Smart crop to 300x300
-            thumb = ImageOps.fit(img, (300, 300), PILImage.Resampling.LANCZOS)
-            thumb.save(thumb_path)
-            
+        db_image = await build_image(db, file)
+    except UploadRejected as e:
+        raise HTTPException(e.status_code, e.detail)
+    except ImagePoolBusy:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Image processing is busy, retry later",
+            headers={"Retry-After": "5"},
+        )
     except Exception as e:
-        # Cleanup if failed
-        if os.path.exists(filepath): os.remove(filepath)
         raise HTTPException(500, f"Image processing failed: {str(e)}")
-        
-    # Create DB record
-    db_image = Image(
-        url=f"/uploads/{filename}",
-        thumbnail_url=f"/uploads/{thumb_filename}" if thumb_filename else None,
-        original_filename=file.filename,
-        mime_type=file.content_type,
-        size=os.path.getsize(filepath),
-        width=width,
-        height=height,
-        entity_type=None,
-        entity_id=None
-    )
+
     db.add(db_image)
     await db.commit()
     await db.refresh(db_image)
@@ -91,6 +65,139 @@ async def upload_image(
     return db_image
 
 
+def _ndjson(item: dict) -> bytes:
+    return (json.dumps(item, ensure_ascii=False, default=str) + "\n").encode()
+
+
+def _error_result(index: int, filename: str | None, e: Exception) -> dict:
+    if isinstance(e, UploadRejected):
+        code, detail = e.status_code, e.detail
+    elif isinstance(e, ImagePoolBusy):
+        code, detail = 503, "Image processing is busy, retry later"
+    else:
+        code, detail = 500, f"Image processing failed: {str(e)}"
+    return {"index": index, "filename": filename, "status": "error", "code": code, "detail": detail}
+
+
+@router.post("/upload-batch")
+async def upload_images_batch(
+    files: list[UploadFile] = File(...),
+    current_user: AdminUser = Depends(get_current_user)
+):
+    """
+    Пакетная загрузка изображений (админ).
+
+    Файлы обрабатываются параллельно в пуле изображений, все записи Image
+    сохраняются одной транзакцией. Ответ — NDJSON (по строке на событие):
+    {"index", "filename", "status": "processed"} по мере обработки,
+    {"index", "status": "error", "code", "detail"} для отклонённых файлов,
+    {"index", "status": "saved", "image": {...}} после commit и итоговая
+    строка {"status": "done", "saved", "failed"}.
+    """
+    if len(files) > settings.max_batch_upload_files:
+        raise HTTPException(400, f"Too many files (max {settings.max_batch_upload_files})")
+
+    # Читаем все файлы до начала ответа: после него тело запроса уже недоступно
+    stored: dict[int, StoredUpload] = {}
+    errors: list[dict] = []
+    for index, file in enumerate(files):
+        try:
+            stored[index] = await store_upload(file)
+        except UploadRejected as e:
+            errors.append(_error_result(index, file.filename, e))
+    filenames = [file.filename for file in files]
+
+    async def results():
+        for error in errors:
+            yield _ndjson(error)
+
+        async with AsyncSessionLocal() as db:
+            existing = await find_processed(db, list(stored.values()))
+
+            # Одновременно не больше задач, чем процессов в пуле: остальные ждут
+            # здесь, а не в очереди пула, и не получают ImagePoolBusy
+            slots = asyncio.Semaphore(image_pool.workers)
+            # Одинаковые файлы в одном пакете обрабатываются один раз
+            first_by_url: dict[str, asyncio.Task] = {}
+
+            async def process(
+                index: int,
+                first: asyncio.Task | None,
+            ) -> tuple[int, Image | Exception]:
+                upload = stored[index]
+                try:
+                    if first is not None:
+                        _, source = await first
+                        if isinstance(source, Exception):
+                            raise source
+                        return index, await make_image(upload, filenames[index], source)
+                    async with slots:
+                        return index, await make_image(
+                            upload, filenames[index], existing.get(upload.url)
+                        )
+                except Exception as e:
+                    return index, e
+
+            tasks = []
+            for index in sorted(stored):
+                first = first_by_url.get(stored[index].url)
+                task = asyncio.create_task(process(index, first))
+                if first is None:
+                    first_by_url[stored[index].url] = task
+                tasks.append(task)
+
+            images: dict[int, Image] = {}
+            failed = len(errors)
+            for next_done in asyncio.as_completed(tasks):
+                index, outcome = await next_done
+                if isinstance(outcome, Exception):
+                    failed += 1
+                    yield _ndjson(_error_result(index, filenames[index], outcome))
+                else:
+                    images[index] = outcome
+                    yield _ndjson({"index": index, "filename": filenames[index], "status": "processed"})
+
+            if images:
+                db.add_all(images.values())
+                try:
+                    await db.commit()
+                except Exception as e:
+                    logger.error("Пакетная загрузка: ошибка сохранения: %s", e)
+                    await db.rollback()
+                    for index in sorted(images):
+                        yield _ndjson(_error_result(index, filenames[index], e))
+                    yield _ndjson({"status": "done", "saved": 0, "failed": len(files)})
+                    return
+
+            for index in sorted(images):
+                item = ImageItem.model_validate(images[index]).model_dump(mode="json")
+                yield _ndjson({"index": index, "status": "saved", "image": item})
+
+            yield _ndjson({"status": "done", "saved": len(images), "failed": failed})
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.get("/gc", response_model=ImageGCReport)
+async def preview_image_gc(
+    grace_hours: float | None = Query(None, ge=0, description="Grace-период, часы (по умолчанию из настроек)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AdminUser = Depends(get_current_user)
+):
+    """Отчёт сборщика мусора без удаления (dry run)."""
+    return await collect_image_garbage(db, dry_run=True, grace_hours=grace_hours)
+
+
+@router.post("/gc", response_model=ImageGCReport)
+async def run_image_gc(
+    grace_hours: float | None = Query(None, ge=0, description="Grace-период, часы (по умолчанию из настроек)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AdminUser = Depends(get_current_user)
+):
+    """Запустить сборщик мусора изображений сейчас."""
+    return await collect_image_garbage(db, dry_run=False, grace_hours=grace_hours)
+
+
 @router.delete("/{image_id}", status_code=204)
 async def delete_image(
     image_id: int,
@@ -106,21 +213,8 @@ async def delete_image(
     if not image:
         raise HTTPException(404, "Image not found")
         
-    # Delete files
-    try:
-        if image.url:
-            filename = os.path.basename(image.url)
-            filepath = os.path.join(settings.upload_dir, filename)
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            
-        if image.thumbnail_url:
-            thumb_name = os.path.basename(image.thumbnail_url)
-            thumb_path = os.path.join(settings.upload_dir, thumb_name)
-            if os.path.exists(thumb_path):
-                os.remove(thumb_path)
-    except Exception as e:
-        print(f"Error deleting files: {e}")
+    # Delete files (если их не использует другая запись — см. дедупликацию)
+    await remove_unshared_image_files(db, image)
         
     await db.delete(image)
     await db.commit()
@@ -0,0 +1,92 @@
+"""
+Ресайз изображений на лету: /img/{w}x{h}/{fit}/{путь в uploads}.
+
+Пример: /img/300x300/cover/3f2a....jpg, /img/1200x630/cover/generated/map_1_ab12cd34.png?format=jpeg
+Размер 0 означает «по пропорциям». Принимаются только размеры и форматы из
+settings.img_allowed_sizes и settings.img_allowed_formats, остальное — 400.
+Копия создаётся при первом запросе и кешируется на диске
+(app.services.image_cache); оригиналы в uploads не меняются (новые файлы
+получают новые имена), поэтому ответ кешируется навсегда.
+"""
+
+import os
+import re
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+
+from app.config import settings
+from app.services.image_cache import resized_image_cache
+from app.services.image_pool import ImagePoolBusy
+from app.utils.image_files import UPLOADS_URL_PREFIX, upload_path
+from app.utils.image_ops import RESIZE_FITS
+from app.utils.static_files import IMMUTABLE_CACHE_CONTROL, serve_file
+
+router = APIRouter()
+
+SIZE_RE = re.compile(r"^(\d{1,5})x(\d{1,5})$")
+
+MEDIA_TYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+# Формат по умолчанию — как у оригинала
+SOURCE_FORMATS = {
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".png": "png",
+    ".webp": "webp",
+    ".avif": "avif",
+}
+
+
+@router.get("/{size}/{fit}/{path:path}")
+async def get_resized_image(
+    size: str,
+    fit: str,
+    path: str,
+    request: Request,
+    format: str | None = Query(None, description="jpeg | png | webp | avif (по умолчанию — как у оригинала)"),
+):
+    """Уменьшенная копия изображения из uploads."""
+    match = SIZE_RE.match(size)
+    if f"{size}/{fit}" not in settings.img_allowed_sizes or not match or fit not in RESIZE_FITS:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Unsupported size")
+    width, height = int(match.group(1)), int(match.group(2))
+    if format is not None and format not in settings.img_allowed_formats:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Unsupported format")
+
+    src_path = upload_path(f"{UPLOADS_URL_PREFIX}{path}")
+    if src_path is None or not os.path.isfile(src_path):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Image not found")
+
+    fmt = format or SOURCE_FORMATS.get(os.path.splitext(src_path)[1].lower(), "jpeg")
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Unsupported format")
+
+    try:
+        cached_path = await resized_image_cache.get_or_create(src_path, width, height, fit, fmt)
+    except ImagePoolBusy:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Image processing is busy, retry later",
+            headers={"Retry-After": "5"},
+        )
+
+    try:
+        stat_result = os.stat(cached_path)
+    except FileNotFoundError:
+        # Копию только что вытеснили из кеша — клиент просто повторит запрос
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "Retry later", headers={"Retry-After": "1"})
+
+    return serve_file(
+        request,
+        cached_path,
+        stat_result,
+        root=settings.img_cache_dir,
+        accel_prefix=settings.img_cache_accel_prefix,
+        cache_control=IMMUTABLE_CACHE_CONTROL,
+        media_type=MEDIA_TYPES[fmt],
+    )
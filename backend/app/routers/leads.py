@@ -3,19 +3,24 @@ API для работы с заявками (лидами).
 Асинхронная версия.
 """
 
+import base64
 import logging
+from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Query
-from sqlalchemy import select, desc, func
+from sqlalchemy import JSON, select, desc, func, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-import asyncio
+from sqlalchemy.orm import aliased
 
 from app.database import get_async_db
 from app.models.lead import Lead
 from app.schemas.lead import LeadCreate, LeadAdmin, LeadListResponse, LeadUpdate
 from app.models.admin_user import AdminUser
 from app.routers.auth import get_current_user
-from app.services.telegram import format_lead_message, load_telegram_settings, send_message
+from app.services.outbox import enqueue_telegram, outbox_dispatcher
+from app.services.rate_limit import lead_rate_limiter
+from app.services.telegram import format_lead_message
+from app.utils.phone import normalize_phone
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +29,6 @@ router = APIRouter()
 # Меньше этого времени форму заполняет только робот
 MIN_FORM_TIME_MS = 1500
 
-# Ссылки на фоновые отправки уведомлений: без них сборщик мусора может уничтожить
-# задачу до завершения запроса (asyncio держит на задачи только слабые ссылки)
-_notification_tasks: set[asyncio.Task] = set()
-
 
 @router.post("/public", status_code=201)
 async def create_public_lead(
@@ -37,7 +38,7 @@ async def create_public_lead(
 ):
     """
     Создание заявки с публичной части сайта.
-    Включена защита Honeypot.
+    Включена защита Honeypot и ограничение частоты по IP и телефону.
     """
     # 1. Отсев ботов: скрытый чекбокс и мгновенная отправка.
     # Ответ в обоих случаях как при успехе, чтобы бот не понял, что его отсеяли.
@@ -60,73 +61,141 @@ async def create_public_lead(
         return {"status": "success", "message": "Lead received (bot)"}
 
     # 2. Очистка телефона (убираем лишние символы)
-    clean_phone = "".join(filter(str.isdigit, data.phone))
-    if len(clean_phone) < 10:
+    clean_phone = normalize_phone(data.phone)
+    if clean_phone is None:
         raise HTTPException(status_code=400, detail="Неверный формат телефона")
 
-    # 3. Сохранение в БД
+    # 3. Ограничение частоты: по IP (за nginx — из X-Forwarded-For, см. ProxyHeadersMiddleware)
+    # и по телефону. Отказ — до записи в БД и до уведомления
+    client_ip = request.client.host if request.client else None
+    retry_after = await lead_rate_limiter.check(db, ip=client_ip, phone=clean_phone)
+    if retry_after is not None:
+        logger.warning("Заявка отклонена ограничением частоты. IP: %s, телефон: %s", client_ip, clean_phone)
+        raise HTTPException(
+            status_code=429,
+            detail="Слишком много заявок. Попробуйте позже или позвоните нам.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    # 4. Сохранение в БД вместе с уведомлением в Telegram: отправит фоновый
+    # диспетчер outbox, запрос в сеть не ходит, а уведомление не потеряется
     new_lead = Lead(
         name=data.name,
         phone=data.phone,
+        phone_normalized=clean_phone,
         comment=data.comment,
         source_url=str(request.headers.get("referer", "")),
-        ip_address=request.client.host if request.client else None,
+        ip_address=client_ip,
         user_agent=request.headers.get("user-agent"),
         status="new"
     )
     
     db.add(new_lead)
+    await db.flush()
+
+    lead_dict = {
+        "name": new_lead.name,
+        "phone": new_lead.phone,
+        "comment": new_lead.comment,
+        "source_url": new_lead.source_url
+    }
+    enqueue_telegram(db, format_lead_message(lead_dict), lead_id=new_lead.id)
     await db.commit()
-    await db.refresh(new_lead)
-
-    # 4. Уведомление в Telegram (асинхронно, ошибки только логируются)
-    tg_settings = await load_telegram_settings(db)
-
-    if tg_settings.get("tg_bot_token") and tg_settings.get("tg_chat_id"):
-        lead_dict = {
-            "name": new_lead.name,
-            "phone": new_lead.phone,
-            "comment": new_lead.comment,
-            "source_url": new_lead.source_url
-        }
-        task = asyncio.create_task(send_message(format_lead_message(lead_dict), tg_settings))
-        _notification_tasks.add(task)
-        task.add_done_callback(_notification_tasks.discard)
+    outbox_dispatcher.wake()
 
     return {"status": "success", "id": new_lead.id}
 
 
+@router.get("/admin/rate-limit")
+async def get_lead_rate_limit_stats(
+    current_user: AdminUser = Depends(get_current_user)
+):
+    """Счётчики ограничения частоты заявок (этого воркера, с момента запуска)."""
+    return lead_rate_limiter.stats()
+
+
+def encode_cursor(lead: Lead) -> str:
+    """Непрозрачный курсор keyset-пагинации: позиция последней заявки страницы."""
+    raw = f"{lead.created_at.isoformat()}|{lead.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, _, lead_id = raw.partition("|")
+        return datetime.fromisoformat(created_at), int(lead_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Неверный курсор")
+
+
+def status_histogram():
+    """Подзапрос: {"статус": число заявок} по всей таблице (index-only scan по ix_leads_status_created_at_id)."""
+    counts = select(Lead.status, func.count().label("n")).group_by(Lead.status).subquery()
+    return select(
+        func.coalesce(func.json_object_agg(counts.c.status, counts.c.n), text("'{}'::json"), type_=JSON)
+    ).scalar_subquery()
+
+
 @router.get("/admin", response_model=LeadListResponse)
 async def get_admin_leads(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
     status: str | None = Query(None),
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы; вместо page"),
     db: AsyncSession = Depends(get_async_db),
     current_user: AdminUser = Depends(get_current_user)
 ):
-    """Получение списка заявок для админки."""
-    # Базовый запрос
-    query = select(Lead)
-    count_query = select(func.count(Lead.id))
-    
+    """
+    Получение списка заявок для админки.
+
+    Страница, число повторных заявок по каждому номеру и счётчики по статусам
+    приходят одним запросом к БД. С cursor страница выбирается по индексу
+    (created_at, id) без OFFSET — листание не замедляется к концу списка.
+    """
+    same_phone = aliased(Lead)
+    phone_leads = (
+        select(func.count())
+        .where(same_phone.phone_normalized == Lead.phone_normalized)
+        .correlate(Lead)
+        .scalar_subquery()
+    )
+    histogram = status_histogram()
+
+    query = select(Lead, phone_leads.label("phone_leads"), histogram.label("status_counts"))
     if status:
         query = query.where(Lead.status == status)
-        count_query = count_query.where(Lead.status == status)
-    
-    # Подсчёт
-    count_result = await db.execute(count_query)
-    total = count_result.scalar() or 0
-    
-    # Получение данных
-    query = query.order_by(desc(Lead.created_at)).offset((page - 1) * size).limit(size)
-    result = await db.execute(query)
-    items = result.scalars().all()
-    
+    if cursor:
+        created_at, lead_id = decode_cursor(cursor)
+        query = query.where(tuple_(Lead.created_at, Lead.id) < tuple_(created_at, lead_id))
+    else:
+        query = query.offset((page - 1) * size)
+
+    # Лишняя строка — признак того, что есть следующая страница
+    query = query.order_by(desc(Lead.created_at), desc(Lead.id)).limit(size + 1)
+    rows = (await db.execute(query)).all()
+
+    if rows:
+        status_counts = rows[0].status_counts
+    else:
+        # Пустая страница: счётчики отдельным запросом
+        status_counts = await db.scalar(select(histogram))
+
+    items = []
+    for lead, same_phone_count, _ in rows[:size]:
+        item = LeadAdmin.model_validate(lead)
+        item.duplicates = max(same_phone_count - 1, 0)
+        items.append(item)
+
+    total = status_counts.get(status, 0) if status else sum(status_counts.values())
+
     return {
         "items": items,
         "total": total,
         "page": page,
-        "size": size
+        "size": size,
+        "status_counts": status_counts,
+        "next_cursor": encode_cursor(rows[size - 1].Lead) if len(rows) > size else None,
     }
 
 
@@ -9,7 +9,8 @@ from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 import math
 
-from app.database import get_async_db
+from app.config import settings
+from app.services.read_replica import get_read_db, read_session
 from app.models.listing import Listing
 from app.models.plot import Plot, PlotStatus
 from app.models.location import Settlement, District, Location
@@ -19,9 +20,13 @@ from app.schemas.listing import (
     ListingListResponse,
     ListingSitemapItem,
 )
+from app.utils.cache import AsyncTTLCache, CachedValue
 
 router = APIRouter()
 
+# Популярные объявления на главной: ключ кеша — limit
+_popular_cache = AsyncTTLCache(ttl=settings.public_cache_ttl, maxsize=20)
+
 
 @router.get("/", response_model=ListingListResponse)
 async def get_listings(
@@ -41,7 +46,7 @@ async def get_listings(
     area_max: float | None = Query(None, description="Максимальная площадь (м²)"),
     # Сортировка
     sort: str = Query("newest", description="newest | price_asc | price_desc"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Получить список опубликованных объявлений с фильтрацией."""
     
@@ -136,12 +141,8 @@ async def get_listings(
     )
 
 
-@router.get("/popular", response_model=list[ListingListItem])
-async def get_popular_listings(
-    limit: int = Query(4, ge=1, le=20),
-    db: AsyncSession = Depends(get_async_db),
-):
-    """Получить популярные объявления (специальные предложения)."""
+async def query_popular_listings(db: AsyncSession, limit: int) -> list[Listing]:
+    """Популярные объявления: сначала featured, затем по дате создания."""
     # Подзапрос для активных участков
     active_listings_ids = (
         select(Plot.listing_id)
@@ -150,7 +151,6 @@ async def get_popular_listings(
         .subquery()
     )
     
-    # Сначала featured, затем по дате создания
     query = (
         select(Listing)
         .options(selectinload(Listing.location).selectinload(Location.parent))
@@ -161,15 +161,35 @@ async def get_popular_listings(
     )
     
     result = await db.execute(query)
-    listings = result.scalars().all()
-    
-    return listings
+    return result.scalars().all()
+
+
+async def get_cached_popular(limit: int) -> CachedValue:
+    """Популярные объявления из кеша (JSON-совместимые словари)."""
+    async def load():
+        async with read_session() as db:
+            listings = await query_popular_listings(db, limit)
+            return [
+                ListingListItem.model_validate(listing).model_dump(mode="json")
+                for listing in listings
+            ]
+
+    return await _popular_cache.get_or_load(limit, load)
+
+
+@router.get("/popular", response_model=list[ListingListItem])
+async def get_popular_listings(
+    limit: int = Query(4, ge=1, le=20),
+):
+    """Получить популярные объявления (специальные предложения)."""
+    cached = await get_cached_popular(limit)
+    return cached.value
 
 
 @router.get("/{slug}", response_model=ListingDetail)
 async def get_listing_by_slug(
     slug: str,
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Получить объявление по slug."""
     result = await db.execute(
@@ -190,7 +210,7 @@ async def get_listing_by_slug(
 
 @router.get("/slugs/all", response_model=list[ListingSitemapItem])
 async def get_all_slugs(
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Получить список всех слагов опубликованных объявлений (для sitemap)."""
     
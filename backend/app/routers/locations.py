@@ -8,13 +8,18 @@ from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from app.database import get_async_db
+from app.config import settings
+from app.services.read_replica import get_read_db, read_session
 from app.models.location import District, Settlement, Location, LocationType
 from app.models.listing import Listing
 from app.models.plot import Plot, PlotStatus
+from app.utils.cache import AsyncTTLCache, CachedValue
 
 router = APIRouter()
 
+# Иерархия нужна почти каждой публичной странице, а меняется редко
+_hierarchy_cache = AsyncTTLCache(ttl=settings.public_cache_ttl, maxsize=1)
+
 
 class DistrictItem(BaseModel):
     """Район с количеством объявлений."""
@@ -39,7 +44,7 @@ class SettlementItem(BaseModel):
 
 
 @router.get("/districts", response_model=list[DistrictItem])
-async def get_districts(db: AsyncSession = Depends(get_async_db)):
+async def get_districts(db: AsyncSession = Depends(get_read_db)):
     """Получить список районов с количеством активных объявлений."""
     # Подзапрос: объявления с активными участками
     active_listing_ids = (
@@ -96,7 +101,7 @@ async def get_districts(db: AsyncSession = Depends(get_async_db)):
 async def get_settlements(
     district_id: int | None = Query(None, description="ID района для фильтрации"),
     all: bool = Query(False, description="Если True, возвращать все населённые пункты (для админки)"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Получить список населённых пунктов с количеством объявлений."""
     
@@ -180,7 +185,7 @@ class ResolvedLocation(BaseModel):
 async def resolve_location(
     district_slug: str | None = Query(None, description="Slug района"),
     settlement_slug: str | None = Query(None, description="Slug населённого пункта"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Резолв slug → id для гео-URL.
@@ -248,7 +253,7 @@ class DistrictGroup(BaseModel):
 
 
 @router.get("/settlements-grouped", response_model=list[DistrictGroup])
-async def get_settlements_grouped(db: AsyncSession = Depends(get_async_db)):
+async def get_settlements_grouped(db: AsyncSession = Depends(get_read_db)):
     """
     Получить населённые пункты, сгруппированные по районам.
     
@@ -341,16 +346,8 @@ class LocationPublicItem(BaseModel):
         from_attributes = True
 
 
-@router.get("/hierarchy", response_model=list[LocationPublicItem])
-async def get_locations_hierarchy(
-    db: AsyncSession = Depends(get_async_db),
-):
-    """
-    Получить иерархию локаций с количеством объявлений.
-    
-    Используется для нового LocationFilter с поддержкой
-    Region -> District/City -> Settlement.
-    """
+async def build_locations_hierarchy(db: AsyncSession) -> list[LocationPublicItem]:
+    """Дерево локаций с количеством объявлений (сумма по всем потомкам)."""
     # Получаем все локации (сортировка DESC - больше значение = выше)
     result = await db.execute(
         select(Location).order_by(Location.sort_order.desc(), Location.name)
@@ -397,10 +394,33 @@ async def get_locations_hierarchy(
     return build_tree(None)
 
 
+async def get_cached_hierarchy() -> CachedValue:
+    """Иерархия локаций из кеша (JSON-совместимые словари)."""
+    async def load():
+        async with read_session() as db:
+            tree = await build_locations_hierarchy(db)
+        return [item.model_dump(mode="json") for item in tree]
+
+    return await _hierarchy_cache.get_or_load("hierarchy", load)
+
+
+@router.get("/hierarchy", response_model=list[LocationPublicItem])
+async def get_locations_hierarchy():
+    """
+    Получить иерархию локаций с количеством объявлений.
+    
+    Используется для нового LocationFilter с поддержкой
+    Region -> District/City -> Settlement.
+    Ответ кешируется на settings.public_cache_ttl секунд.
+    """
+    cached = await get_cached_hierarchy()
+    return cached.value
+
+
 @router.get("/resolve-new", response_model=dict)
 async def resolve_location_new(
     slugs: str = Query(..., description="Слаги через запятую (region/district/settlement)"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Резолв цепочки слагов в иерархию локаций.
@@ -451,7 +471,7 @@ async def resolve_location_new(
 @router.get("/resolve-v2", response_model=dict)
 async def resolve_location_v2(
     slugs: str = Query(..., description="Слаги через запятую (district/settlement)"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Резолв цепочки слагов в объект локации для SmartLocationFilter.
@@ -532,7 +552,7 @@ async def search_locations(
     q: str = Query(..., min_length=1, description="Поисковый запрос"),
     limit: int = Query(15, ge=1, le=50, description="Максимум результатов"),
     min_listings: int = Query(0, ge=0, description="Минимум объявлений для показа (0 = все)"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Поиск локаций по названию.
@@ -673,7 +693,7 @@ async def search_locations(
 @router.get("/{location_id}", response_model=dict)
 async def get_location_by_id(
     location_id: int,
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Получить локацию по ID.
@@ -703,7 +723,7 @@ async def get_location_by_id(
 
 @router.get("/slugs/all", response_model=list[dict])
 async def get_all_location_slugs(
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Получить список всех путей локаций для sitemap geo-страниц.
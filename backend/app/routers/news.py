@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import math
 
 from app.database import get_async_db
+from app.services.read_replica import get_read_db
 from app.models.news import News
 from app.schemas.news import (
     NewsCreate,
@@ -27,7 +28,7 @@ router = APIRouter()
 async def get_news_list(
     page: int = Query(1, ge=1, description="Номер страницы"),
     size: int = Query(10, ge=1, le=100, description="Размер страницы"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Получить список опубликованных новостей с пагинацией."""
     # Считаем общее количество
@@ -60,7 +61,7 @@ async def get_news_list(
 @router.get("/latest", response_model=list[NewsListItem])
 async def get_latest_news(
     limit: int = Query(6, ge=1, le=20, description="Количество новостей"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Получить последние N новостей (для главной страницы)."""
     result = await db.execute(
@@ -96,7 +97,7 @@ async def get_news_by_slug(
 
 @router.get("/slugs/all", response_model=list[str])
 async def get_all_news_slugs(
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Получить список всех слагов опубликованных новостей (для sitemap)."""
     result = await db.execute(
@@ -11,15 +11,37 @@ from geoalchemy2.functions import ST_X, ST_Y
 
 from sqlalchemy.orm import aliased
 
-from app.database import get_async_db
+from app.config import settings
+from app.services.read_replica import get_read_db, read_session
 from app.models.plot import Plot, PlotStatus
 from app.models.listing import Listing
 from app.models.location import Settlement
 from app.schemas.public_plot import PlotAllResponse, PlotPoint
+from app.utils.cache import AsyncTTLCache, CachedValue
 
 
 router = APIRouter()
 
+# Общее количество активных участков (без фильтров) — показывается на каждой странице
+_count_cache = AsyncTTLCache(ttl=settings.public_cache_ttl, maxsize=1)
+
+
+async def get_cached_plots_count() -> CachedValue:
+    """Количество активных участков опубликованных объявлений из кеша."""
+    async def load():
+        async with read_session() as db:
+            result = await db.execute(
+                select(func.count(Plot.id))
+                .join(Listing, Plot.listing_id == Listing.id)
+                .where(
+                    Plot.status == PlotStatus.active,
+                    Listing.is_published == True
+                )
+            )
+            return result.scalar() or 0
+
+    return await _count_cache.get_or_load("all", load)
+
 
 @router.get("/all", response_model=PlotAllResponse)
 async def get_all_plots(
@@ -32,7 +54,7 @@ async def get_all_plots(
     price_max: int | None = Query(None, description="Максимальная цена"),
     area_min: float | None = Query(None, description="Минимальная площадь (м²)"),
     area_max: float | None = Query(None, description="Максимальная площадь (м²)"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Получить все активные участки для отображения на карте.
@@ -131,7 +153,7 @@ async def get_active_plots_count(
     price_max: int | None = Query(None, description="Максимальная цена"),
     area_min: float | None = Query(None, description="Минимальная площадь (м²)"),
     area_max: float | None = Query(None, description="Максимальная площадь (м²)"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Получить количество активных участков с учётом фильтров.
@@ -141,6 +163,11 @@ async def get_active_plots_count(
     """
     from app.models.location import Location
     
+    # Без фильтров — общий счётчик из кеша
+    if not any((location_id, settlements, land_use, price_min, price_max, area_min, area_max)):
+        cached = await get_cached_plots_count()
+        return {"count": cached.value}
+    
     # Вспомогательная функция для получения всех дочерних ID локации
     async def get_descendant_ids(parent_id: int) -> list[int]:
         """Получает все ID потомков (включая саму локацию)."""
@@ -1,16 +1,13 @@
 """
 Публичный API для получения настроек сайта.
 Без авторизации — для использования на публичном фронтенде.
-Асинхронная версия.
+Значения берутся из кеша настроек, в БД запрос не ходит.
 """
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter
 from pydantic import BaseModel
 
-from app.database import get_async_db
-from app.models.setting import Setting
+from app.services.site_settings import site_settings
 
 router = APIRouter()
 
@@ -127,26 +124,25 @@ class SingleSettingResponse(BaseModel):
     value: str | None = None
 
 
+async def load_public_settings() -> PublicSettingsResponse:
+    """Публичные настройки из кеша (пустые значения превращаются в None)."""
+    values = await site_settings.get_many(PUBLIC_SETTING_KEYS)
+    return PublicSettingsResponse(
+        **{key: value if value else None for key, value in values.items()}
+    )
+
+
 @router.get("/public", response_model=PublicSettingsResponse)
-async def get_public_settings(db: AsyncSession = Depends(get_async_db)):
+async def get_public_settings():
     """
     Получить публичные настройки сайта.
     Эндпоинт не требует авторизации.
     """
-    result = await db.execute(
-        select(Setting).where(Setting.key.in_(PUBLIC_SETTING_KEYS))
-    )
-    settings_list = result.scalars().all()
-    
-    result_dict = {}
-    for setting in settings_list:
-        result_dict[setting.key] = setting.value if setting.value else None
-    
-    return PublicSettingsResponse(**result_dict)
+    return await load_public_settings()
 
 
 @router.get("/{key}", response_model=SingleSettingResponse)
-async def get_single_setting(key: str, db: AsyncSession = Depends(get_async_db)):
+async def get_single_setting(key: str):
     """
     Получить одну публичную настройку по ключу.
     Только для ключей из PUBLIC_SETTING_KEYS.
@@ -154,12 +150,5 @@ async def get_single_setting(key: str, db: AsyncSession = Depends(get_async_db))
     if key not in PUBLIC_SETTING_KEYS:
         return SingleSettingResponse(key=key, value=None)
     
-    result = await db.execute(
-        select(Setting).where(Setting.key == key)
-    )
-    setting = result.scalar_one_or_none()
-    
-    return SingleSettingResponse(
-        key=key,
-        value=setting.value if setting else None
-    )
+    values = await site_settings.get_many([key])
+    return SingleSettingResponse(key=key, value=values.get(key))
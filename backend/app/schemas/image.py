@@ -1,6 +1,19 @@
 from pydantic import BaseModel
 from datetime import datetime
 
+
+class ImageVariantItem(BaseModel):
+    """Уменьшенная копия: элемент srcset (url + ширина) для своего формата."""
+    url: str
+    format: str
+    width: int
+    height: int
+    size: int | None = None
+
+    class Config:
+        from_attributes = True
+
+
 class ImageItem(BaseModel):
     id: int
     url: str
@@ -10,8 +23,13 @@ class ImageItem(BaseModel):
     size: int | None
     width: int | None
     height: int | None
+    # Показать до загрузки: <img style="background: {dominant_color} url({lqip})">
+    lqip: str | None = None
+    dominant_color: str | None = None
     sort_order: int
     created_at: datetime
+    # Для <picture>: <source type="image/avif" srcset="url 480w, ...">
+    variants: list[ImageVariantItem] = []
 
     class Config:
         from_attributes = True
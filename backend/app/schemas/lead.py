@@ -40,6 +40,8 @@ class LeadAdmin(LeadBase):
     ip_address: str | None = None
     created_at: datetime
     updated_at: datetime
+    # Сколько ещё заявок с этим же номером (по phone_normalized)
+    duplicates: int = 0
 
     class Config:
         from_attributes = True
@@ -50,3 +52,7 @@ class LeadListResponse(BaseModel):
     total: int
     page: int
     size: int
+    # Число заявок по статусам без учёта фильтра: {"new": 12, "processing": 3, ...}
+    status_counts: dict[str, int] = {}
+    # Курсор следующей страницы (keyset по created_at, id); None — страниц больше нет
+    next_cursor: str | None = None
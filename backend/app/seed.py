@@ -7,7 +7,7 @@
 
 from sqlalchemy.orm import Session
 
-from app.database import engine, SessionLocal, Base
+from app.database import Base, get_sync_engine, sync_session
 # Импортируем все модели, чтобы Base.metadata знал о них при создании таблиц
 import app.models  # noqa
 from app.models.reference import Reference
@@ -449,9 +449,9 @@ def seed_settings(db: Session):
 def main():
     """Главная функция."""
     print("Создаём таблицы...")
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_sync_engine())
     
-    db = SessionLocal()
+    db = sync_session()
     try:
         seed_references(db)
         seed_admin(db)
@@ -0,0 +1,241 @@
+"""
+Долгоживущий браузер Playwright для скриншотов карты.
+
+Раньше на каждый скриншот запускался новый Chromium: 1–2 секунды холодного
+старта и сотни мегабайт памяти, а массовая генерация шла строго по одному.
+Теперь в каждом воркере uvicorn один браузер, запускаемый при первой задаче:
+- одновременно открыто не больше settings.screenshot_pages страниц;
+- страницы открываются в переиспользуемых контекстах, контекст пересоздаётся
+  после settings.screenshot_context_max_uses страниц (кеш, storage и утечки
+  памяти страницы не копятся);
+- каждая задача ограничена settings.screenshot_page_timeout секундами;
+- сторож перезапускает упавший браузер и закрывает простаивающий дольше
+  settings.screenshot_browser_idle_seconds.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+WATCHDOG_INTERVAL_SECONDS = 15
+
+# Сколько ждать сигнала готовности карты, прежде чем снимать как есть
+MAP_READY_TIMEOUT_MS = 15000
+MAP_READY_FALLBACK_SECONDS = 3
+
+
+class BrowserUnavailable(Exception):
+    """Браузер не удалось запустить."""
+
+
+@dataclass
+class _PooledContext:
+    context: Any
+    viewport: tuple[int, int]
+    uses: int = 0
+
+
+class BrowserPool:
+    """Один Chromium на процесс с ограниченным числом одновременных страниц."""
+
+    def __init__(self, pages: int, context_max_uses: int, page_timeout: float, idle_seconds: float):
+        self.pages = max(pages, 1)
+        self.context_max_uses = max(context_max_uses, 1)
+        self.page_timeout = page_timeout
+        self.idle_seconds = idle_seconds
+        self._playwright = None
+        self._browser = None
+        self._idle_contexts: list[_PooledContext] = []
+        self._launch_lock: asyncio.Lock | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._watchdog_task: asyncio.Task | None = None
+        self._active = 0
+        self._last_used = time.monotonic()
+
+    # === Браузер ===
+
+    def _browser_alive(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    def _init_primitives(self) -> None:
+        if self._launch_lock is None:
+            self._launch_lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.pages)
+
+    async def _ensure_browser(self):
+        if self._browser_alive():
+            return self._browser
+        async with self._launch_lock:
+            if self._browser_alive():
+                return self._browser
+            await self._close_browser()
+            try:
+                # Импортируем playwright только при использовании
+                from playwright.async_api import async_playwright
+
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+            except Exception as e:
+                await self._close_browser()
+                raise BrowserUnavailable(str(e)) from e
+            logger.info("Браузер для скриншотов запущен: до %s страниц одновременно", self.pages)
+        if self._watchdog_task is None:
+            self._watchdog_task = asyncio.create_task(self._watchdog())
+        return self._browser
+
+    async def _close_browser(self) -> None:
+        # Сначала забываем ссылки: пока идёт закрытие, новые задачи запустят новый браузер
+        browser, self._browser = self._browser, None
+        playwright, self._playwright = self._playwright, None
+        self._idle_contexts.clear()  # закрываются вместе с браузером
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.debug("Браузер закрыт с ошибкой: %s", e)
+        if playwright is not None:
+            try:
+                await playwright.stop()
+            except Exception as e:
+                logger.debug("Playwright остановлен с ошибкой: %s", e)
+
+    # === Контексты ===
+
+    async def _acquire_context(self, browser, viewport: dict) -> _PooledContext:
+        size = (viewport["width"], viewport["height"])
+        # Контексты закрытого браузера больше не нужны
+        self._idle_contexts = [pooled for pooled in self._idle_contexts if pooled.context.browser is browser]
+        # Размер окна задаётся при создании контекста — берём только контекст того же размера
+        for index in range(len(self._idle_contexts) - 1, -1, -1):
+            if self._idle_contexts[index].viewport == size:
+                return self._idle_contexts.pop(index)
+        # Простаивающих контекстов других размеров не больше, чем страниц
+        if len(self._idle_contexts) >= self.pages:
+            await self._close_context(self._idle_contexts.pop(0))
+        context = await browser.new_context(viewport=viewport)
+        context.set_default_timeout(self.page_timeout * 1000)
+        return _PooledContext(context=context, viewport=size)
+
+    async def _release_context(self, pooled: _PooledContext, healthy: bool) -> None:
+        pooled.uses += 1
+        reusable = (
+            healthy
+            and pooled.uses < self.context_max_uses
+            and pooled.context.browser is self._browser
+            and self._browser_alive()
+        )
+        if reusable:
+            self._idle_contexts.append(pooled)
+            return
+        await self._close_context(pooled)
+
+    async def _close_context(self, pooled: _PooledContext) -> None:
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.debug("Контекст закрыт с ошибкой: %s", e)
+
+    # === Задачи ===
+
+    async def screenshot(
+        self,
+        url: str,
+        path: str,
+        width: int = 1200,
+        height: int = 630,
+        selector: str = "#screenshot-container",
+    ) -> None:
+        """
+        Открыть url, дождаться window.__MAP_READY__ и сохранить скриншот selector в path.
+
+        Бросает BrowserUnavailable, asyncio.TimeoutError или ошибку Playwright.
+        """
+        self._init_primitives()
+        viewport = {"width": width, "height": height}
+
+        async with self._slots:
+            # Пока задача активна, сторож не закроет браузер по простою
+            self._active += 1
+            self._last_used = time.monotonic()
+            try:
+                browser = await self._ensure_browser()
+                pooled = await self._acquire_context(browser, viewport)
+                healthy = False
+                try:
+                    await asyncio.wait_for(
+                        self._render(pooled.context, url, path, selector),
+                        timeout=self.page_timeout,
+                    )
+                    healthy = True
+                finally:
+                    await self._release_context(pooled, healthy)
+            finally:
+                self._active -= 1
+                self._last_used = time.monotonic()
+
+    async def _render(self, context, url: str, path: str, selector: str) -> None:
+        page = await context.new_page()
+        try:
+            await page.goto(url, wait_until="networkidle")
+            # Ждём сигнала готовности карты
+            try:
+                await page.wait_for_function(
+                    "window.__MAP_READY__ === true",
+                    timeout=MAP_READY_TIMEOUT_MS,
+                )
+            except Exception:
+                # Если сигнал не пришёл, ждём дополнительно
+                await asyncio.sleep(MAP_READY_FALLBACK_SECONDS)
+            await page.locator(selector).screenshot(path=path)
+        finally:
+            await page.close()
+
+    # === Сторож ===
+
+    async def _watchdog(self) -> None:
+        while True:
+            await asyncio.sleep(WATCHDOG_INTERVAL_SECONDS)
+            try:
+                if self._browser is None:
+                    continue
+                if not self._browser.is_connected():
+                    logger.warning("Браузер для скриншотов упал, перезапуск")
+                    await self._ensure_browser()
+                elif (
+                    self._active == 0
+                    and self.idle_seconds > 0
+                    and time.monotonic() - self._last_used > self.idle_seconds
+                ):
+                    async with self._launch_lock:
+                        if self._active == 0:
+                            logger.info("Браузер для скриншотов простаивает, закрываем")
+                            await self._close_browser()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Сторож браузера: %s", e)
+
+    async def stop(self) -> None:
+        """Закрыть браузер (вызывается при остановке приложения)."""
+        if self._watchdog_task is not None:
+            self._watchdog_task.cancel()
+            try:
+                await self._watchdog_task
+            except asyncio.CancelledError:
+                pass
+            self._watchdog_task = None
+        await self._close_browser()
+
+
+browser_pool = BrowserPool(
+    pages=settings.screenshot_pages,
+    context_max_uses=settings.screenshot_context_max_uses,
+    page_timeout=settings.screenshot_page_timeout,
+    idle_seconds=settings.screenshot_browser_idle_seconds,
+)
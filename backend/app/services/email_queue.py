@@ -0,0 +1,189 @@
+"""
+Фоновая отправка писем (восстановление пароля).
+
+smtplib блокирующий: подключение, STARTTLS, вход и отправка к медленному
+серверу занимали секунды, и всё это время воркер uvicorn не обслуживал
+никого. Теперь обработчик только кладёт письмо в очередь (enqueue) и сразу
+отвечает, а отправляет фоновая задача:
+- все вызовы smtplib выполняются в одном выделенном потоке (объект SMTP не
+  потокобезопасен), event loop не ждёт сеть;
+- соединение с сервером держится открытым между письмами и закрывается после
+  settings.smtp_idle_seconds простоя; разорванное сервером соединение
+  открывается заново;
+- временные ошибки (сеть, ответы 4xx) повторяются до settings.email_max_attempts
+  раз с удваивающейся паузой, постоянные (5xx — адрес не существует) — нет.
+
+Очередь в памяти и ограничена settings.email_queue_size: письмо со ссылкой
+сброса пароля живёт 15 минут, и после перезапуска его проще запросить заново,
+чем хранить ссылку в БД. Для проверки без почтового сервера достаточно
+локальной заглушки (например, aiosmtpd) и SMTP_HOST/SMTP_PORT на неё.
+"""
+
+import asyncio
+import logging
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+from app.config import settings
+from app.utils.email import build_message, open_smtp
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 2
+# Сколько при остановке ждать, пока уйдут письма из очереди
+SHUTDOWN_DRAIN_SECONDS = 10
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Ошибка, которую повтор не исправит: сервер ответил 5xx."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class EmailQueue:
+    """Очередь писем с одной фоновой задачей отправки (запускается в lifespan приложения)."""
+
+    def __init__(self, queue_size: int, max_attempts: int, idle_seconds: float):
+        self.queue_size = queue_size
+        self.max_attempts = max(max_attempts, 1)
+        self.idle_seconds = idle_seconds
+        self._queue: asyncio.Queue[EmailMessage] | None = None
+        self._task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        # Живёт в потоке executor, из event loop не трогаем
+        self._smtp: smtplib.SMTP | None = None
+        self.counters = {"sent": 0, "failed": 0, "dropped": 0, "retries": 0}
+
+    def enqueue(self, subject: str, recipients: list[str], text_content: str, html_content: str | None = None) -> bool:
+        """
+        Поставить письмо в очередь, не дожидаясь отправки.
+
+        False — письмо не принято: очередь не запущена или переполнена. Если
+        SMTP не настроен, письмо только пишется в лог (для разработки).
+        """
+        if not settings.smtp_host:
+            logger.warning("SMTP не настроен, письмо не будет отправлено. Тема: %s\nТекст: %s", subject, text_content)
+            return True
+        if self._queue is None:
+            logger.error("Очередь писем не запущена, письмо «%s» не отправлено", subject)
+            return False
+        try:
+            self._queue.put_nowait(build_message(subject, recipients, text_content, html_content))
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            logger.error("Очередь писем переполнена, письмо «%s» не отправлено", subject)
+            return False
+        return True
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        # Даём дослать то, что уже в очереди
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=SHUTDOWN_DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("Очередь писем: при остановке не отправлено %s писем", self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._in_thread(self._close_blocking)
+        self._executor.shutdown(wait=False)
+        self._executor = None
+        self._queue = None
+
+    async def _in_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    self._queue.get(),
+                    timeout=self.idle_seconds if self._smtp is not None else None,
+                )
+            except asyncio.TimeoutError:
+                # Писем давно не было — не держим соединение, сервер всё равно его закроет
+                await self._in_thread(self._close_blocking)
+                continue
+            try:
+                await self._deliver(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Очередь писем: непредвиденная ошибка: %s", e)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message: EmailMessage) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._in_thread(self._send_blocking, message)
+            except Exception as e:
+                if _is_permanent(e) or attempt == self.max_attempts:
+                    self.counters["failed"] += 1
+                    logger.error(
+                        "Письмо «%s» для %s не отправлено (попыток: %s): %s",
+                        message["Subject"],
+                        message["To"],
+                        attempt,
+                        e,
+                    )
+                    return
+                self.counters["retries"] += 1
+                delay = RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                logger.warning("Письмо «%s»: попытка %s не удалась (%s), повтор через %s с", message["Subject"], attempt, e, delay)
+                await asyncio.sleep(delay)
+            else:
+                self.counters["sent"] += 1
+                logger.info("Письмо «%s» отправлено: %s", message["Subject"], message["To"])
+                return
+
+    # === Выполняется в потоке executor ===
+
+    def _send_blocking(self, message: EmailMessage) -> None:
+        started = time.monotonic()
+        if self._smtp is None:
+            self._smtp = open_smtp()
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Сервер закрыл простаивавшее соединение — одна попытка с новым
+            self._smtp = None
+            self._smtp = open_smtp()
+            self._smtp.send_message(message)
+        except (OSError, smtplib.SMTPException) as e:
+            # После сетевой ошибки или отказа соединение в неизвестном состоянии
+            if not _is_permanent(e):
+                self._close_blocking()
+            raise
+        logger.debug("SMTP: письмо отправлено за %.0f мс", (time.monotonic() - started) * 1000)
+
+    def _close_blocking(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+
+email_queue = EmailQueue(
+    queue_size=settings.email_queue_size,
+    max_attempts=settings.email_max_attempts,
+    idle_seconds=settings.smtp_idle_seconds,
+)
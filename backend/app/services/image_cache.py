@@ -0,0 +1,222 @@
+"""
+Дисковый кеш уменьшенных копий для /img/{w}x{h}/{fit}/{path}.
+
+Копия создаётся при первом запросе (в пуле image_pool) и дальше отдаётся как
+обычный файл. Файлы раскладываются по шардам ab/cd/<hash>.<ext>, чтобы в одном
+каталоге не копились сотни тысяч записей. Ключ включает mtime и размер
+оригинала: заменённый оригинал получит новую копию, а старая уйдёт по LRU.
+
+Объём кеша ограничен settings.img_cache_max_bytes. При превышении удаляются
+давно не запрошенные файлы (время последнего обращения — mtime файла, его
+обновляет отдача, не чаще раза в TOUCH_INTERVAL_SECONDS), пока кеш не
+уменьшится до EVICT_TARGET_RATIO от бюджета.
+
+Объём кеша общий для воркеров uvicorn и хранится в файле SIZE_FILE в корне
+кеша: каждая новая копия прибавляет к нему свой размер, вытеснение записывает
+точный итог после обхода диска. Поэтому после перезапуска воркеры не обходят
+кеш, чтобы узнать объём, а обход при вытеснении выполняет один из них
+(EVICT_LOCK_FILE). Без файла (первый запуск) объём считается одним обходом.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: без блокировок, счётчик приблизительный
+    fcntl = None
+
+from app.config import settings
+from app.services.image_pool import image_pool
+from app.utils.image_ops import resize_to_file
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {
+    "jpeg": "jpg",
+    "png": "png",
+    "webp": "webp",
+    "avif": "avif",
+}
+
+TOUCH_INTERVAL_SECONDS = 3600
+EVICT_TARGET_RATIO = 0.9
+# Только что созданные файлы не трогаем: их как раз отдают клиенту
+EVICT_MIN_AGE_SECONDS = 60
+
+# Служебные файлы в корне кеша (вытеснение их не трогает)
+SIZE_FILE = ".size"
+EVICT_LOCK_FILE = ".evict.lock"
+
+
+class ResizedImageCache:
+    """Кеш уменьшенных копий на диске с бюджетом по байтам и LRU-вытеснением."""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._total_bytes: int | None = None  # None — ещё не считали по диску
+        self._evicting = False
+        self._evict_task: asyncio.Task | None = None
+
+    def cache_path(self, src_path: str, width: int, height: int, fit: str, fmt: str) -> str:
+        """Путь копии в кеше (зависит от параметров и версии оригинала)."""
+        stat = os.stat(src_path)
+        raw = f"{src_path}|{stat.st_mtime_ns}|{stat.st_size}|{width}x{height}|{fit}|{fmt}"
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        return os.path.join(
+            self.root, digest[:2], digest[2:4], f"{digest}.{FORMAT_EXTENSIONS[fmt]}"
+        )
+
+    async def get_or_create(
+        self,
+        src_path: str,
+        width: int,
+        height: int,
+        fit: str,
+        fmt: str,
+    ) -> str:
+        """
+        Путь к готовой копии; при промахе копия создаётся в пуле процессов.
+
+        Может выбросить ImagePoolBusy, если пул перегружен.
+        """
+        path = self.cache_path(src_path, width, height, fit, fmt)
+        if self._touch(path):
+            return path
+
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            try:
+                if self._touch(path):
+                    return path
+                size = await image_pool.run(
+                    resize_to_file, src_path, path, width, height, fit, fmt
+                )
+            finally:
+                self._locks.pop(path, None)
+
+        self._total_bytes = await asyncio.to_thread(self._add_bytes, size)
+        self._schedule_eviction()
+        return path
+
+    def _add_bytes(self, size: int) -> int | None:
+        """Прибавить размер новой копии к общему счётчику; None — счётчика ещё нет."""
+        path = os.path.join(self.root, SIZE_FILE)
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        with os.fdopen(fd, "r+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                total = int(f.read().strip() or 0) + size
+            except ValueError:
+                return None
+            f.seek(0)
+            f.write(str(total))
+            f.truncate()
+        return total
+
+    def _write_total(self, total: int) -> None:
+        fd = os.open(os.path.join(self.root, SIZE_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(str(total))
+            f.truncate()
+
+    def _touch(self, path: str) -> bool:
+        """Есть ли файл в кеше; заодно отмечает обращение для LRU."""
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        now = time.time()
+        if now - mtime > TOUCH_INTERVAL_SECONDS:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        return True
+
+    def _schedule_eviction(self) -> None:
+        if self._evicting:
+            return
+        if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+            return
+        self._evicting = True
+        self._evict_task = asyncio.get_running_loop().create_task(self._evict_async())
+
+    async def _evict_async(self) -> None:
+        try:
+            total = await asyncio.to_thread(self.evict)
+            if total is not None:
+                self._total_bytes = total
+        except Exception as e:
+            logger.warning("Кеш /img: ошибка вытеснения: %s", e)
+        finally:
+            self._evicting = False
+
+    def evict(self) -> int | None:
+        """
+        Удалить самые старые файлы сверх бюджета; вернуть итоговый объём.
+
+        None — вытеснение уже выполняет другой воркер.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, EVICT_LOCK_FILE), "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+            total = self._evict_locked()
+            self._write_total(total)
+            return total
+
+    def _evict_locked(self) -> int:
+        entries = []
+        total = 0
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return total
+
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        removed = 0
+        min_mtime = time.time() - EVICT_MIN_AGE_SECONDS
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= target or mtime > min_mtime:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+
+        logger.info("Кеш /img: удалено %s файлов, объём %s байт", removed, total)
+        return total
+
+
+resized_image_cache = ResizedImageCache(
+    root=settings.img_cache_dir,
+    max_bytes=settings.img_cache_max_bytes,
+)
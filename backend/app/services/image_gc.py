@@ -0,0 +1,284 @@
+"""
+Сборка мусора изображений.
+
+Мусор появляется так:
+- фото загружены в форму объявления, а форма не сохранена — записи Image
+  остаются с entity_type = NULL;
+- update_listing при смене набора фото только отвязывает старые записи;
+- bulk-delete объявлений не трогает их изображения;
+- каждая перегенерация скриншота карты добавляет файл в uploads/generated.
+
+Но запись без сущности — не всегда мусор: картинки из настроек (заглушка,
+OG-изображение) и картинки, вставленные в HTML описаний объявлений, новостей и
+страниц, хранятся так же, а ссылка на них есть только в тексте. Поэтому перед
+удалением собираются все URL /uploads/... (и /img/.../путь) из settings.value,
+listings.description, news.content / excerpt и locations.description.
+
+Проход состоит из двух шагов:
+1. Удаление одним запросом записей без сущности (или со ссылкой на удалённое
+   объявление), созданных раньше grace-периода и не упомянутых в текстах.
+   Уменьшенные копии удаляются каскадом по внешнему ключу.
+2. Сверка каталога загрузок с таблицами images / image_variants и текстами:
+   файлы, на которые никто не ссылается и которые не менялись дольше
+   grace-периода, удаляются. Grace защищает файлы загрузок, ещё не дошедших
+   до commit. Другое имя (жёсткая ссылка) файла, на который ссылается БД, —
+   например, старый плоский путь после переноса загрузок по подкаталогам —
+   тоже считается используемым; имена файла без ссылок удаляются все.
+
+В режиме dry_run ничего не удаляется, возвращается только отчёт.
+Фоновый запуск — ImageGCScheduler: раз в settings.image_gc_interval_hours;
+из воркеров uvicorn проход выполняет тот, кто взял advisory lock.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from datetime import timedelta
+
+from pydantic import BaseModel
+from sqlalchemy import and_, delete, exists, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.image import Image, ImageVariant
+from app.models.listing import Listing
+from app.models.location import Location
+from app.models.news import News
+from app.models.setting import Setting
+from app.utils.image_files import UPLOADS_URL_PREFIX
+from app.utils.time import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_lock для сборщика (произвольная константа)
+GC_LOCK_KEY = 0x1A6E_0C01
+
+# Сколько примеров путей включать в отчёт
+REPORT_SAMPLE_SIZE = 50
+
+# Текстовые колонки, в которых могут быть ссылки на загрузки (HTML редактора, URL в настройках)
+CONTENT_COLUMNS = (Setting.value, Listing.description, News.content, News.excerpt, Location.description)
+
+# Путь файла в uploads из URL в тексте: абсолютного или относительного,
+# на оригинал (/uploads/путь) или на копию (/img/WxH/fit/путь)
+CONTENT_URL_RE = re.compile(r"/(?:uploads|img/\d+x\d+/\w+)/([^\s\"'<>()?#]+)")
+
+
+class ImageGCReport(BaseModel):
+    """Отчёт о проходе сборщика мусора."""
+    dry_run: bool
+    orphan_rows: int = 0
+    orphan_row_ids: list[int] = []
+    unreferenced_files: int = 0
+    unreferenced_bytes: int = 0
+    unreferenced_sample: list[str] = []
+    skipped: bool = False  # проход уже выполняет другой воркер
+
+
+def _orphan_condition(cutoff, content_paths: set[str]):
+    """Записи Image, которые никому не принадлежат и не упомянуты в текстах."""
+    listing_missing = and_(
+        Image.entity_type == "listing",
+        ~exists().where(Listing.id == Image.entity_id),
+    )
+    condition = and_(
+        Image.created_at < cutoff,
+        or_(Image.entity_type.is_(None), Image.entity_id.is_(None), listing_missing),
+    )
+    if content_paths:
+        condition = and_(
+            condition,
+            Image.url.not_in([f"{UPLOADS_URL_PREFIX}{path}" for path in sorted(content_paths)]),
+        )
+    return condition
+
+
+async def _content_paths(db: AsyncSession) -> set[str]:
+    """Относительные пути файлов, на которые ссылаются тексты (настройки, HTML описаний)."""
+    paths: set[str] = set()
+    for column in CONTENT_COLUMNS:
+        result = await db.stream(
+            select(column).where(or_(column.contains("/uploads/"), column.contains("/img/")))
+        )
+        async for (value,) in result:
+            for match in CONTENT_URL_RE.finditer(value):
+                paths.add(os.path.normpath(match.group(1)))
+    return paths
+
+
+async def _collect_orphan_rows(db: AsyncSession, dry_run: bool, cutoff, content_paths: set[str]) -> list[int]:
+    condition = _orphan_condition(cutoff, content_paths)
+    if dry_run:
+        result = await db.execute(select(Image.id).where(condition))
+        return list(result.scalars().all())
+    result = await db.execute(
+        delete(Image).where(condition).returning(Image.id).execution_options(synchronize_session=False)
+    )
+    return list(result.scalars().all())
+
+
+async def _referenced_paths(db: AsyncSession, excluded_ids: list[int]) -> set[str]:
+    """Относительные пути (от upload_dir) файлов, на которые ссылается БД."""
+    images_query = select(Image.url, Image.thumbnail_url)
+    variants_query = select(ImageVariant.url)
+    if excluded_ids:
+        images_query = images_query.where(Image.id.not_in(excluded_ids))
+        variants_query = variants_query.where(ImageVariant.image_id.not_in(excluded_ids))
+
+    urls: set[str] = set()
+    result = await db.stream(images_query)
+    async for url, thumb in result:
+        urls.add(url)
+        if thumb:
+            urls.add(thumb)
+    result = await db.stream(variants_query)
+    async for (url,) in result:
+        urls.add(url)
+
+    prefix_len = len(UPLOADS_URL_PREFIX)
+    return {
+        os.path.normpath(url[prefix_len:])
+        for url in urls
+        if url and url.startswith(UPLOADS_URL_PREFIX)
+    }
+
+
+def _unreferenced_files(referenced: set[str], max_mtime: float) -> list[tuple[str, int]]:
+    """Файлы каталога загрузок без ссылок из БД и старше max_mtime."""
+    root = settings.upload_dir
+    # Жёсткие ссылки на используемые файлы (старые пути для страниц из кеша) тоже используются
+    referenced_inodes = set()
+    for relative in referenced:
+        try:
+            stat = os.stat(os.path.join(root, relative))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        referenced_inodes.add((stat.st_dev, stat.st_ino))
+
+    found = []
+    counted_inodes = set()
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            # Служебные файлы (.gitkeep и т.п.) не трогаем, кроме брошенных временных загрузок
+            if name.startswith(".") and not name.startswith(".upload-"):
+                continue
+            path = os.path.join(dirpath, name)
+            relative = os.path.normpath(os.path.relpath(path, root))
+            if relative in referenced:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > max_mtime:
+                continue
+            inode = (stat.st_dev, stat.st_ino)
+            if inode in referenced_inodes:
+                continue
+            # Несколько имён одного файла занимают место один раз
+            found.append((path, 0 if inode in counted_inodes else stat.st_size))
+            counted_inodes.add(inode)
+    return found
+
+
+def _remove_files(files: list[tuple[str, int]]) -> None:
+    for path, _size in files:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("GC изображений: не удалось удалить %s: %s", path, e)
+
+
+async def collect_image_garbage(
+    db: AsyncSession,
+    dry_run: bool = True,
+    grace_hours: float | None = None,
+) -> ImageGCReport:
+    """
+    Один проход сборщика. Выполняется под advisory lock: если его держит
+    другой процесс, возвращается отчёт со skipped=True.
+    """
+    grace = timedelta(hours=grace_hours if grace_hours is not None else settings.image_gc_grace_hours)
+    report = ImageGCReport(dry_run=dry_run)
+
+    locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": GC_LOCK_KEY})
+    if not locked:
+        report.skipped = True
+        return report
+
+    # Ссылки из текстов собираются до удаления записей: такие записи не сироты
+    content_paths = await _content_paths(db)
+    orphan_ids = await _collect_orphan_rows(db, dry_run, utcnow() - grace, content_paths)
+    report.orphan_rows = len(orphan_ids)
+    report.orphan_row_ids = orphan_ids[:REPORT_SAMPLE_SIZE]
+
+    # В dry_run записи-сироты ещё в БД: считаем без них, как будто уже удалены
+    referenced = await _referenced_paths(db, orphan_ids if dry_run else [])
+    referenced |= content_paths
+
+    max_mtime = time.time() - grace.total_seconds()
+    files = await asyncio.to_thread(_unreferenced_files, referenced, max_mtime)
+    report.unreferenced_files = len(files)
+    report.unreferenced_bytes = sum(size for _path, size in files)
+    report.unreferenced_sample = [
+        os.path.relpath(path, settings.upload_dir) for path, _size in files[:REPORT_SAMPLE_SIZE]
+    ]
+
+    if not dry_run:
+        await db.commit()
+        await asyncio.to_thread(_remove_files, files)
+        logger.info(
+            "GC изображений: удалено записей %s, файлов %s (%s байт)",
+            report.orphan_rows,
+            report.unreferenced_files,
+            report.unreferenced_bytes,
+        )
+    else:
+        await db.rollback()
+
+    return report
+
+
+class ImageGCScheduler:
+    """Периодический запуск сборщика в фоне (запускается в lifespan приложения)."""
+
+    # Первый проход — не сразу после старта, чтобы не мешать прогреву
+    INITIAL_DELAY_SECONDS = 600
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is None and settings.image_gc_interval_hours > 0:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self) -> None:
+        await asyncio.sleep(self.INITIAL_DELAY_SECONDS)
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    report = await collect_image_garbage(db, dry_run=False)
+                if report.skipped:
+                    logger.info("GC изображений: проход выполняет другой процесс")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("GC изображений: ошибка прохода: %s", e)
+            await asyncio.sleep(settings.image_gc_interval_hours * 3600)
+
+
+image_gc_scheduler = ImageGCScheduler()
@@ -0,0 +1,103 @@
+"""
+Пул процессов для обработки изображений (Pillow).
+
+Декодирование, ресайз и кодирование большой фотографии с телефона занимают
+сотни миллисекунд процессорного времени. В обработчике запроса это блокировало
+event loop — и все публичные запросы этого воркера uvicorn. Теперь такие
+операции выполняются в отдельных процессах.
+
+Очередь ограничена: одновременно в пуле (выполняются + ждут) не больше
+settings.image_queue_size задач. Если места нет дольше
+settings.image_queue_timeout секунд, вызывающий получает ImagePoolBusy
+(роутеры отвечают 503 с Retry-After), а не копит запросы в памяти.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Перезапускать процесс после N задач: Pillow неохотно отдаёт память
+MAX_TASKS_PER_CHILD = 200
+
+
+class ImagePoolBusy(Exception):
+    """Пул перегружен — задачу не приняли."""
+
+
+class ImagePool:
+    """Ограниченный пул процессов, создаётся при первой задаче."""
+
+    def __init__(self, workers: int, queue_size: int, queue_timeout: float):
+        self.workers = workers
+        self.queue_size = max(queue_size, workers)
+        self.queue_timeout = queue_timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Сколько задач сейчас выполняется или ждёт в пуле."""
+        return self._in_flight
+
+    def _ensure_started(self) -> None:
+        if self._executor is None:
+            # spawn, а не fork: форк процесса с event loop и потоками небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=MAX_TASKS_PER_CHILD,
+            )
+            logger.info("Пул изображений: %s процессов, очередь %s", self.workers, self.queue_size)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.queue_size)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполнить fn(*args) в процессе пула.
+
+        fn и аргументы должны сериализоваться pickle (функции уровня модуля).
+        """
+        self._ensure_started()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Пул изображений перегружен: %s задач в работе", self._in_flight)
+            raise ImagePoolBusy()
+
+        self._in_flight += 1
+        try:
+            # Пока ждали слот, пул могли закрыть после аварии
+            self._ensure_started()
+            executor = self._executor
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # Процесс пула умер (например, OOM на огромной картинке) — следующая задача поднимет новый пул.
+            # Закрываем только тот пул, в котором выполнялась задача: новый уже может работать
+            if self._executor is executor:
+                logger.error("Пул изображений: процесс аварийно завершился, пул будет пересоздан")
+                self.shutdown()
+            raise
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_pool = ImagePool(
+    workers=settings.image_workers,
+    queue_size=settings.image_queue_size,
+    queue_timeout=settings.image_queue_timeout,
+)
@@ -0,0 +1,235 @@
+"""
+Приём загружаемых изображений.
+
+Файл читается из запроса кусками и сразу пишется во временный файл в
+settings.upload_dir; за тот же проход считается SHA-256 и проверяется лимит
+settings.max_upload_size (превышение — прерывание и 413). Формат определяется
+по первым байтам, а не по имени файла и Content-Type от клиента.
+
+Имя сохранённого файла — начало хеша содержимого (в подкаталоге ab/cd по
+тому же хешу), поэтому повторная загрузка
+той же фотографии не создаёт второй файл и не гоняет Pillow заново: новая
+запись Image ссылается на уже существующие оригинал и уменьшенные копии.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+
+from fastapi import UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.models.image import Image, ImageVariant
+from app.services.image_pool import image_pool
+from app.utils.image_files import shard_dir, thumbnail_url
+from app.utils.image_ops import process_upload
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+# Сигнатуры поддерживаемых форматов: (mime, расширение)
+IMAGE_SIGNATURES = {
+    "jpeg": ("image/jpeg", ".jpg"),
+    "png": ("image/png", ".png"),
+    "gif": ("image/gif", ".gif"),
+    "webp": ("image/webp", ".webp"),
+    "avif": ("image/avif", ".avif"),
+}
+
+AVIF_BRANDS = {b"avif", b"avis"}
+
+
+class UploadRejected(Exception):
+    """Файл не принят; status_code и detail уходят клиенту как есть."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_image_format(head: bytes) -> str | None:
+    """Формат изображения по первым байтам файла (None — не поддерживается)."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in AVIF_BRANDS:
+        return "avif"
+    return None
+
+
+@dataclass
+class StoredUpload:
+    """Оригинал, сохранённый в upload_dir под именем из хеша."""
+    url: str
+    path: str
+    content_hash: str
+    size: int
+    mime_type: str
+    is_new: bool  # False — такой файл уже был на диске
+
+
+async def store_upload(file: UploadFile) -> StoredUpload:
+    """Потоково сохранить загрузку с проверкой размера и формата."""
+    os.makedirs(settings.upload_dir, exist_ok=True)
+    tmp_path = os.path.join(settings.upload_dir, f".upload-{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    size = 0
+    image_format = None
+
+    try:
+        with open(tmp_path, "wb") as buffer:
+            while chunk := await file.read(CHUNK_SIZE):
+                if image_format is None:
+                    image_format = sniff_image_format(chunk[:32])
+                    if image_format is None:
+                        raise UploadRejected(
+                            415, "Unsupported image format"
+                        )
+                size += len(chunk)
+                if size > settings.max_upload_size:
+                    raise UploadRejected(
+                        413,
+                        f"File is larger than {settings.max_upload_size} bytes",
+                    )
+                digest.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+
+        if image_format is None:
+            raise UploadRejected(400, "Empty file")
+
+        content_hash = digest.hexdigest()
+        mime_type, ext = IMAGE_SIGNATURES[image_format]
+        filename = f"{shard_dir(content_hash)}/{content_hash[:32]}{ext}"
+        path = os.path.join(settings.upload_dir, filename)
+
+        is_new = not os.path.exists(path)
+        if is_new:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        else:
+            # Файл снова используется — сборщик мусора не должен счесть его старым
+            os.utime(path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return StoredUpload(
+        url=f"/uploads/{filename}",
+        path=path,
+        content_hash=content_hash,
+        size=size,
+        mime_type=mime_type,
+        is_new=is_new,
+    )
+
+
+async def find_processed(
+    db: AsyncSession,
+    stored_uploads: list[StoredUpload],
+) -> dict[str, Image]:
+    """Уже обработанные записи для файлов, которые были на диске (по url)."""
+    urls = {stored.url for stored in stored_uploads if not stored.is_new}
+    if not urls:
+        return {}
+    result = await db.execute(
+        select(Image)
+        .options(selectinload(Image.variants))
+        .where(Image.url.in_(urls), Image.content_hash.isnot(None))
+        .order_by(Image.id)
+    )
+    found: dict[str, Image] = {}
+    for image in result.scalars().all():
+        found.setdefault(image.url, image)
+    return found
+
+
+async def build_image(db: AsyncSession, file: UploadFile) -> Image:
+    """
+    Принять файл и подготовить запись Image (без add/commit).
+
+    Может выбросить UploadRejected или ImagePoolBusy.
+    """
+    stored = await store_upload(file)
+    existing = (await find_processed(db, [stored])).get(stored.url)
+    return await make_image(stored, file.filename, existing)
+
+
+async def make_image(
+    stored: StoredUpload,
+    original_filename: str | None,
+    existing: Image | None = None,
+) -> Image:
+    """
+    Запись Image для сохранённого файла: копия данных existing или обработка в пуле.
+
+    БД не использует, поэтому безопасна для параллельного вызова.
+    """
+    if existing is not None:
+        logger.info("Повторная загрузка %s: используем файлы image %s", stored.url, existing.id)
+        width, height = existing.width, existing.height
+        placeholder = {"lqip": existing.lqip, "dominant_color": existing.dominant_color}
+        variants = [
+            ImageVariant(
+                format=variant.format,
+                width=variant.width,
+                height=variant.height,
+                url=variant.url,
+                size=variant.size,
+            )
+            for variant in existing.variants
+        ]
+    else:
+        try:
+            processed = await image_pool.run(
+                process_upload,
+                stored.path,
+                settings.image_variant_widths,
+                settings.image_variant_formats,
+            )
+        except Exception:
+            # Битый файл не оставляем: иначе повторная загрузка сочтёт его обработанным
+            if stored.is_new and os.path.exists(stored.path):
+                os.remove(stored.path)
+            raise
+        width, height = processed["width"], processed["height"]
+        placeholder = {"lqip": processed["lqip"], "dominant_color": processed["dominant_color"]}
+        # Копии лежат рядом с оригиналом
+        url_dir = stored.url.rsplit("/", 1)[0]
+        variants = [
+            ImageVariant(
+                format=variant["format"],
+                width=variant["width"],
+                height=variant["height"],
+                url=f"{url_dir}/{variant['name']}",
+                size=variant["size"],
+            )
+            for variant in processed["variants"]
+        ]
+
+    return Image(
+        url=stored.url,
+        thumbnail_url=thumbnail_url(stored.url),
+        original_filename=original_filename,
+        mime_type=stored.mime_type,
+        size=stored.size,
+        width=width,
+        height=height,
+        content_hash=stored.content_hash,
+        **placeholder,
+        entity_type=None,
+        entity_id=None,
+        variants=variants,
+    )
@@ -0,0 +1,152 @@
+"""
+Перерисовка сгенерированных карт объявлений после изменения участков.
+
+Роутеры после commit сообщают, какие объявления затронуты
+(listing_map_refresher.schedule). Запросы копятся в множестве и
+обрабатываются пачкой, когда изменения затихли на
+settings.map_refresh_debounce_seconds (но не позже
+settings.map_refresh_max_delay_seconds с первого изменения): массовый импорт
+участков даёт одну перерисовку на объявление, а не по одной на участок.
+
+Изменения в обход роутеров (скрипты, импорт) ловит периодическая сверка
+отпечатков раз в settings.map_refresh_sweep_minutes. Перерисовка
+идемпотентна (ScreenshotService.refresh_map сравнивает отпечатки под advisory
+lock), поэтому одинаковые запросы из разных воркеров не дублируют работу.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.plot import Plot
+from app.services.screenshot_service import ScreenshotService
+
+logger = logging.getLogger(__name__)
+
+# Первая сверка — не сразу после старта, чтобы не мешать прогреву
+INITIAL_SWEEP_DELAY_SECONDS = 900
+
+
+def frontend_url() -> str:
+    return os.getenv("FRONTEND_URL", "http://localhost:3000")
+
+
+async def plot_listing_ids(db: AsyncSession, plot_ids: list[int]) -> set[int]:
+    """Объявления, к которым сейчас привязаны участки (вызывать до изменения)."""
+    if not plot_ids:
+        return set()
+    result = await db.execute(
+        select(Plot.listing_id).where(Plot.id.in_(plot_ids), Plot.listing_id.isnot(None)).distinct()
+    )
+    return set(result.scalars().all())
+
+
+class ListingMapRefresher:
+    """Отложенная перерисовка карт (запускается в lifespan приложения)."""
+
+    def __init__(self):
+        self._pending: set[int] = set()
+        self._first_request_at: float | None = None
+        self._last_request_at: float | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._run_lock: asyncio.Lock | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def schedule(self, listing_ids) -> None:
+        """Запросить перерисовку карт объявлений (None в списке игнорируются)."""
+        ids = {listing_id for listing_id in listing_ids if listing_id is not None}
+        if not ids:
+            return
+        now = time.monotonic()
+        if not self._pending:
+            self._first_request_at = now
+        self._last_request_at = now
+        self._pending.update(ids)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._run_lock = asyncio.Lock()
+        if self._pending:
+            self._wakeup.set()
+        self._tasks.append(asyncio.create_task(self._debounce_forever()))
+        if settings.map_refresh_sweep_minutes > 0:
+            self._tasks.append(asyncio.create_task(self._sweep_forever()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _debounce_forever(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # Ждём затишья, но не дольше max_delay с первого запроса
+            while self._pending:
+                now = time.monotonic()
+                quiet_at = self._last_request_at + settings.map_refresh_debounce_seconds
+                deadline = self._first_request_at + settings.map_refresh_max_delay_seconds
+                delay = min(quiet_at, deadline) - now
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+
+            listing_ids = sorted(self._pending)
+            self._pending.clear()
+            if listing_ids:
+                await self._refresh(listing_ids)
+
+    async def _sweep_forever(self) -> None:
+        await asyncio.sleep(INITIAL_SWEEP_DELAY_SECONDS)
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    stale = await ScreenshotService(db).stale_maps()
+                if stale:
+                    logger.info("Карты: %s устаревших после сверки", len(stale))
+                    await self._refresh(stale)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Карты: ошибка сверки: %s", e)
+            await asyncio.sleep(settings.map_refresh_sweep_minutes * 60)
+
+    async def _refresh(self, listing_ids: list[int]) -> dict[str, int]:
+        """Перерисовать по одному объявлению: в пуле не копится очередь рендеров."""
+        stats: dict[str, int] = {}
+        async with self._run_lock:
+            for listing_id in listing_ids:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        outcome = await ScreenshotService(db).refresh_map(listing_id, frontend_url())
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("Карта объявления %s: ошибка перерисовки: %s", listing_id, e)
+                    outcome = "failed"
+                if outcome == "locked":
+                    # Карту сейчас перерисовывает другой воркер — возможно, по старым данным
+                    self.schedule([listing_id])
+                stats[outcome] = stats.get(outcome, 0) + 1
+        if stats.get("regenerated") or stats.get("failed"):
+            logger.info("Карты: перерисовка %s", stats)
+        return stats
+
+
+listing_map_refresher = ListingMapRefresher()
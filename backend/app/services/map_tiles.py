@@ -0,0 +1,107 @@
+"""
+Локальный кеш тайлов подложки для статических карт (app.utils.static_map).
+
+Рендер в пуле процессов читает тайлы только с диска; здесь недостающие или
+устаревшие тайлы заранее скачиваются с settings.map_tile_url. Число
+одновременных загрузок ограничено (правила tile.openstreetmap.org запрещают
+массовую выгрузку), повторно тайл запрашивается не чаще, чем раз в
+settings.map_tile_max_age_days. Если URL не задан, карта рисуется по тому,
+что уже есть в кеше.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+
+from app.config import settings
+from app.utils.static_map import tile_path
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_DOWNLOADS = 2
+REQUEST_TIMEOUT = 10.0
+USER_AGENT = "landpapa-static-map/1.0 (+https://rkkland.ru)"
+
+
+class MapTileCache:
+    """Скачивание тайлов в settings.map_tile_cache_dir."""
+
+    def __init__(self, tile_dir: str, url_template: str, max_age_days: float):
+        self.tile_dir = tile_dir
+        self.url_template = url_template
+        self.max_age_seconds = max_age_days * 86400
+        self._client: httpx.AsyncClient | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._pending: dict[tuple[int, int, int], asyncio.Task] = {}
+
+    def _is_fresh(self, path: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(path) < self.max_age_seconds
+        except OSError:
+            return False
+
+    async def ensure(self, tiles: list[tuple[int, int, int]]) -> int:
+        """
+        Докачать недостающие тайлы; вернуть, сколько так и осталось без тайла.
+
+        Один и тот же тайл параллельные рендеры скачивают один раз.
+        """
+        stale = [tile for tile in tiles if not self._is_fresh(tile_path(self.tile_dir, *tile))]
+        if not stale or not self.url_template:
+            return sum(1 for tile in stale if not os.path.exists(tile_path(self.tile_dir, *tile)))
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT,
+                headers={"User-Agent": USER_AGENT},
+                follow_redirects=True,
+            )
+            self._slots = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+        tasks = []
+        for tile in stale:
+            task = self._pending.get(tile)
+            if task is None:
+                task = asyncio.create_task(self._download(tile))
+                self._pending[tile] = task
+                task.add_done_callback(lambda _, tile=tile: self._pending.pop(tile, None))
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+
+        return sum(1 for tile in stale if not os.path.exists(tile_path(self.tile_dir, *tile)))
+
+    async def _download(self, tile: tuple[int, int, int]) -> None:
+        z, x, y = tile
+        url = self.url_template.format(z=z, x=x, y=y)
+        path = tile_path(self.tile_dir, z, x, y)
+        try:
+            async with self._slots:
+                response = await self._client.get(url)
+            response.raise_for_status()
+            if not response.headers.get("content-type", "").startswith("image/"):
+                raise ValueError(f"не картинка: {response.headers.get('content-type')}")
+        except Exception as e:
+            # Старый тайл лучше, чем никакого
+            logger.warning("Тайл %s/%s/%s не скачан: %s", z, x, y, e)
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_path, path)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+map_tile_cache = MapTileCache(
+    tile_dir=settings.map_tile_cache_dir,
+    url_template=settings.map_tile_url,
+    max_age_days=settings.map_tile_max_age_days,
+)
@@ -0,0 +1,266 @@
+"""
+Доставка уведомлений из таблицы outbox.
+
+Заявка и уведомление о ней пишутся в одной транзакции (enqueue_telegram), а
+отправляет их фоновый диспетчер, который работает в каждом воркере uvicorn:
+- запрос посетителя не ходит в сеть;
+- уведомление не теряется при перезапуске воркера или долгой недоступности
+  прокси: запись остаётся в статусе pending и повторяется с нарастающей паузой
+  (settings.outbox_retry_base_seconds, удваивается до
+  settings.outbox_retry_max_seconds), пока не станет старше
+  settings.outbox_max_age_hours;
+- воркеры не отправляют одно сообщение одновременно: сообщения забираются через
+  FOR UPDATE SKIP LOCKED и на время отправки откладываются на CLAIM_SECONDS.
+  Если воркер упал посреди отправки, сообщение повторит другой (доставка
+  «хотя бы раз»);
+- при всплеске заявок несколько сообщений склеиваются в одно (до лимита длины
+  Telegram), чтобы не упираться в ограничение частоты отправки в чат.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.outbox import OutboxMessage
+from app.services.telegram import MAX_MESSAGE_LENGTH, REQUEST_TIMEOUT, load_telegram_settings, post_message
+from app.utils.time import utcnow
+
+logger = logging.getLogger(__name__)
+
+KIND_TELEGRAM = "telegram"
+
+# На сколько откладывается забранное сообщение: с запасом на две попытки (с разметкой и без)
+CLAIM_SECONDS = REQUEST_TIMEOUT * 4
+
+# Разделитель склеенных уведомлений
+BATCH_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+# Как часто помечать просроченные и удалять старые записи
+CLEANUP_INTERVAL_SECONDS = 3600
+
+
+def enqueue_telegram(db: AsyncSession, text: str, lead_id: int | None = None) -> OutboxMessage:
+    """Поставить сообщение в очередь. Уйдёт после commit текущей транзакции."""
+    message = OutboxMessage(
+        kind=KIND_TELEGRAM,
+        body=text,
+        lead_id=lead_id,
+        status="pending",
+        attempts=0,
+        next_attempt_at=utcnow(),
+    )
+    db.add(message)
+    return message
+
+
+def retry_delay(attempts: int) -> float:
+    """Пауза перед следующей попыткой: удваивается, с разбросом ±10%."""
+    delay = settings.outbox_retry_base_seconds * (2 ** max(attempts - 1, 0))
+    delay = min(delay, settings.outbox_retry_max_seconds)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def pack_messages(messages: list[OutboxMessage]) -> list[list[OutboxMessage]]:
+    """Разложить сообщения по группам, каждая из которых влезает в одно сообщение Telegram."""
+    groups: list[list[OutboxMessage]] = []
+    length = 0
+    for message in messages:
+        extra = len(message.body) + (len(BATCH_SEPARATOR) if groups and groups[-1] else 0)
+        if not groups or length + extra > MAX_MESSAGE_LENGTH:
+            groups.append([message])
+            length = len(message.body)
+        else:
+            groups[-1].append(message)
+            length += extra
+    return groups
+
+
+def group_text(group: list[OutboxMessage]) -> str:
+    text = BATCH_SEPARATOR.join(message.body for message in group)
+    if len(text) > MAX_MESSAGE_LENGTH:
+        # Одно сообщение длиннее лимита (огромный комментарий) — иначе Telegram не примет его никогда
+        text = text[:MAX_MESSAGE_LENGTH - 1] + "…"
+    return text
+
+
+class OutboxDispatcher:
+    """Фоновая отправка сообщений из outbox (запускается в lifespan приложения)."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._retry_now = False
+        self._last_cleanup = 0.0
+        self._warned_not_configured = False
+
+    def wake(self, retry_now: bool = False) -> None:
+        """
+        Проверить очередь, не дожидаясь опроса (вызывать после commit).
+
+        retry_now — повторить и отложенные сообщения, не дожидаясь паузы
+        (например, после того как в админке поправили настройки Telegram).
+        """
+        if retry_now:
+            self._retry_now = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            more = False
+            try:
+                more = await self._dispatch_once()
+                if time.monotonic() - self._last_cleanup > CLEANUP_INTERVAL_SECONDS:
+                    await self._cleanup()
+                    self._last_cleanup = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Outbox: ошибка прохода: %s", e)
+            if more:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.outbox_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _dispatch_once(self) -> bool:
+        """Один проход по очереди. True — забрана полная пачка, в очереди может быть ещё."""
+        tg_settings = await load_telegram_settings()
+        if not tg_settings.get("tg_bot_token") or not tg_settings.get("tg_chat_id"):
+            if not self._warned_not_configured:
+                logger.warning("Outbox: не заданы токен бота или chat_id, уведомления ждут в очереди")
+                self._warned_not_configured = True
+            return False
+        self._warned_not_configured = False
+
+        async with AsyncSessionLocal() as db:
+            if self._retry_now:
+                self._retry_now = False
+                await db.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.status == "pending", OutboxMessage.kind == KIND_TELEGRAM)
+                    .values(next_attempt_at=utcnow())
+                )
+
+            result = await db.execute(
+                select(OutboxMessage)
+                .where(
+                    OutboxMessage.status == "pending",
+                    OutboxMessage.kind == KIND_TELEGRAM,
+                    OutboxMessage.next_attempt_at <= utcnow(),
+                )
+                .order_by(OutboxMessage.id)
+                .limit(settings.outbox_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            messages = list(result.scalars().all())
+            if not messages:
+                await db.commit()
+                return False
+
+            claimed_until = utcnow() + timedelta(seconds=CLAIM_SECONDS)
+            for message in messages:
+                message.attempts += 1
+                message.next_attempt_at = claimed_until
+            await db.commit()
+
+            await self._send(messages, tg_settings)
+            await db.commit()
+
+        return len(messages) >= settings.outbox_batch_size
+
+    async def _send(self, messages: list[OutboxMessage], tg_settings: dict[str, str]) -> None:
+        """Отправить забранные сообщения и записать итог в объекты (commit — у вызывающего)."""
+        sent = 0
+        failure = None
+        groups = pack_messages(messages)
+        for group in groups:
+            # Одна неудача — скорее всего, недоступен прокси или Telegram: остальные не мучаем
+            result = failure or await post_message(group_text(group), tg_settings)
+            now = utcnow()
+            if result.ok:
+                for message in group:
+                    message.status = "sent"
+                    message.sent_at = now
+                    message.last_error = None
+                sent += len(group)
+                continue
+
+            failure = result
+            expires_before = now - timedelta(hours=settings.outbox_max_age_hours)
+            for message in group:
+                message.last_error = result.error
+                if message.created_at < expires_before:
+                    message.status = "failed"
+                    logger.error(
+                        "Outbox: уведомление %s (заявка %s) не доставлено за %s попыток: %s",
+                        message.id,
+                        message.lead_id,
+                        message.attempts,
+                        result.error,
+                    )
+                else:
+                    delay = max(retry_delay(message.attempts), result.retry_after or 0)
+                    message.next_attempt_at = now + timedelta(seconds=delay)
+
+        if sent:
+            logger.info("Outbox: доставлено уведомлений %s (сообщений Telegram %s)", sent, len(groups))
+        if failure is not None:
+            logger.warning(
+                "Outbox: не доставлено уведомлений %s, будет повтор: %s",
+                len(messages) - sent,
+                failure.error,
+            )
+
+    async def _cleanup(self) -> None:
+        """Пометить просроченные сообщения и удалить старые доставленные."""
+        now = utcnow()
+        async with AsyncSessionLocal() as db:
+            expired = await db.execute(
+                update(OutboxMessage)
+                .where(
+                    OutboxMessage.status == "pending",
+                    OutboxMessage.created_at < now - timedelta(hours=settings.outbox_max_age_hours),
+                    # Забранные сейчас другим воркером не трогаем
+                    OutboxMessage.next_attempt_at <= now,
+                )
+                .values(
+                    status="failed",
+                    last_error=func.concat_ws(" ", OutboxMessage.last_error, "(истёк срок доставки)"),
+                )
+            )
+            await db.execute(
+                delete(OutboxMessage).where(
+                    OutboxMessage.status != "pending",
+                    OutboxMessage.created_at < now - timedelta(days=settings.outbox_retention_days),
+                )
+            )
+            await db.commit()
+        if expired.rowcount:
+            logger.error("Outbox: %s уведомлений не доставлено до истечения срока", expired.rowcount)
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,117 @@
+"""
+Кеш пользователей админки для get_current_user.
+
+Экраны админки (карта, списки) делают десятки запросов на одно действие, и
+каждый раньше читал admin_users по имени из токена. Теперь снимок
+пользователя живёт в памяти воркера settings.auth_principal_cache_ttl секунд.
+
+Изменение статуса, пароля, имени или удаление пользователя в роутерах
+сопровождается notify_admin_user_changed: запись сбрасывается сразу в своём
+воркере и по NOTIFY admin_users_changed — в остальных (канал слушает
+соединение site_settings). Если слушатель отвалился, устаревшая запись
+проживёт не дольше TTL.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.admin_user import AdminUser
+
+ADMIN_USERS_CHANNEL = "admin_users_changed"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Неизменяемый снимок пользователя: общий для запросов, поэтому не ORM-объект."""
+    id: int
+    username: str
+    email: str | None
+    display_name: str | None
+    is_active: bool
+    telegram_id: int | None
+
+    @classmethod
+    def from_user(cls, user: AdminUser) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            display_name=user.display_name,
+            is_active=user.is_active,
+            telegram_id=user.telegram_id,
+        )
+
+    def to_user(self) -> AdminUser:
+        """Новый объект AdminUser вне сессии — у каждого запроса свой."""
+        return AdminUser(
+            id=self.id,
+            username=self.username,
+            email=self.email,
+            display_name=self.display_name,
+            is_active=self.is_active,
+            telegram_id=self.telegram_id,
+        )
+
+
+class PrincipalCache:
+    """Ограниченный по размеру кеш «имя из токена → снимок пользователя» с коротким TTL."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+
+    def get(self, username: str) -> Principal | None:
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[username]
+            return None
+        return principal
+
+    def put(self, user: AdminUser) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries.pop(user.username, None)
+        self._entries[user.username] = (time.monotonic() + self.ttl, Principal.from_user(user))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: str | None = None) -> None:
+        """Сбросить запись пользователя; None — сбросить всё."""
+        if username is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(username, None)
+
+    def on_notify(self, payload: str | None) -> None:
+        # Пустой payload или переподключение слушателя — сбрасываем всё
+        self.invalidate(payload or None)
+
+
+async def notify_admin_user_changed(db: AsyncSession, *usernames: str | None) -> None:
+    """
+    Сбросить кеш пользователей во всех воркерах.
+
+    Вызывать до commit: NOTIFY уходит вместе с транзакцией. В своём воркере
+    запись сбрасывается сразу.
+    """
+    for username in {name for name in usernames if name}:
+        principal_cache.invalidate(username)
+        await db.execute(
+            text("SELECT pg_notify(:channel, :username)"),
+            {"channel": ADMIN_USERS_CHANNEL, "username": username},
+        )
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.auth_principal_cache_ttl,
+    max_entries=settings.auth_principal_cache_size,
+)
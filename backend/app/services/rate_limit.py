@@ -0,0 +1,227 @@
+"""
+Ограничение частоты запросов (скользящее окно).
+
+Окно считается приближённо, по двум соседним фиксированным окнам: запросы
+прошлого окна учитываются с весом, убывающим по мере хода текущего. Так
+хранится по два числа на ключ, а не список отметок времени, и нет всплеска
+на границе окон, как у простого фиксированного окна.
+
+Сначала проверяется счётчик в памяти воркера: поток запросов отсекается
+без обращения к БД. Но у каждого из воркеров uvicorn свой счётчик, и в сумме
+они пропускают в несколько раз больше лимита. Поэтому при
+settings.rate_limit_backend = "postgres" прошедший локальную проверку запрос
+сверяется и с общим счётчиком в UNLOGGED-таблице rate_limit_counters (один
+INSERT ... ON CONFLICT). Если общий счётчик недоступен, решение принимается
+по локальному: лучше пропустить лишнее, чем отказать живому человеку.
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.rate_limit import RateLimitCounter
+
+logger = logging.getLogger(__name__)
+
+# Сколько ключей держать в памяти воркера (самые давние вытесняются)
+MAX_LOCAL_KEYS = 50_000
+
+# Как часто удалять старые окна из rate_limit_counters
+SHARED_CLEANUP_SECONDS = 600
+
+SHARED_HIT_SQL = text(
+    """
+    INSERT INTO rate_limit_counters (key, window_start, count)
+    VALUES (:key, :window_start, 1)
+    ON CONFLICT (key, window_start) DO UPDATE SET count = rate_limit_counters.count + 1
+    RETURNING count, (
+        SELECT count FROM rate_limit_counters
+        WHERE key = :key AND window_start = :previous_start
+    ) AS previous
+    """
+)
+
+SHARED_READ_SQL = text(
+    """
+    SELECT
+        (SELECT count FROM rate_limit_counters WHERE key = :key AND window_start = :window_start) AS count,
+        (SELECT count FROM rate_limit_counters WHERE key = :key AND window_start = :previous_start) AS previous
+    """
+)
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """Не больше limit запросов за window секунд на ключ."""
+    limit: int
+    window: float
+
+
+def window_estimate(current: int, previous: int, elapsed: float, window: float) -> float:
+    """Оценка числа запросов за последние window секунд."""
+    return previous * (1 - elapsed / window) + current
+
+
+def retry_after(rule: RateLimitRule, current: int, previous: int, elapsed: float) -> int:
+    """Через сколько секунд оценка опустится до лимита."""
+    if current > rule.limit or previous <= 0:
+        # Текущее окно уже переполнено само по себе — ждать его конца
+        wait = rule.window - elapsed
+    else:
+        excess = window_estimate(current, previous, elapsed, rule.window) - rule.limit
+        wait = min(excess / previous * rule.window, rule.window - elapsed)
+    return max(math.ceil(wait), 1)
+
+
+class RateLimiter:
+    """
+    Набор правил для одного вида запросов, например заявок: по IP и по телефону.
+
+    check() учитывает запрос по всем переданным ключам и возвращает None, если
+    запрос пропущен, или число секунд для заголовка Retry-After.
+    """
+
+    def __init__(self, scope: str, rules: dict[str, RateLimitRule]):
+        self.scope = scope
+        self.rules = rules
+        # "{scope}:{rule}:{value}" -> (начало текущего окна, текущее, прошлое)
+        self._local: OrderedDict[str, tuple[int, int, int]] = OrderedDict()
+        self._last_shared_cleanup = 0.0
+        self.counters: dict[str, int] = {"allowed": 0, "shared_errors": 0}
+        for name in rules:
+            self.counters[f"rejected_{name}"] = 0
+
+    def _hit_local(
+        self, key: str, rule: RateLimitRule, now: float, increment: bool = True
+    ) -> tuple[int, int, float]:
+        window = int(rule.window)
+        start = int(now // window) * window
+        entry = self._local.get(key)
+        if entry is None:
+            current, previous = 0, 0
+        else:
+            entry_start, current, previous = entry
+            if entry_start == start - window:
+                current, previous = 0, current
+            elif entry_start != start:
+                current, previous = 0, 0
+        if increment:
+            current += 1
+            self._local.pop(key, None)
+            self._local[key] = (start, current, previous)
+            if len(self._local) > MAX_LOCAL_KEYS:
+                self._local.popitem(last=False)
+        return current, previous, now - start
+
+    async def _hit_shared(
+        self, db: AsyncSession, key: str, rule: RateLimitRule, now: float, increment: bool = True
+    ) -> tuple[int, int, float]:
+        window = int(rule.window)
+        start = int(now // window) * window
+        params = {"key": key, "window_start": start, "previous_start": start - window}
+        if increment:
+            current, previous = (await db.execute(SHARED_HIT_SQL, params)).one()
+        else:
+            current, previous = (await db.execute(SHARED_READ_SQL, params)).one()
+        return current or 0, previous or 0, now - start
+
+    async def _cleanup_shared(self, db: AsyncSession, now: float) -> None:
+        longest = max(int(rule.window) for rule in self.rules.values())
+        await db.execute(
+            delete(RateLimitCounter).where(RateLimitCounter.window_start < int(now) - 2 * longest)
+        )
+
+    async def check(self, db: AsyncSession | None = None, **keys: str | None) -> int | None:
+        """
+        Учесть запрос. Ключи — значения правил (ip=..., phone=...); None пропускается.
+
+        db нужен только для общего счётчика; свою транзакцию он коммитит сам,
+        поэтому вызывать до начала основной работы с сессией.
+        """
+        return await self._evaluate(db, keys, increment=True)
+
+    async def peek(self, db: AsyncSession | None = None, **keys: str | None) -> int | None:
+        """
+        Проверить, не превышен ли уже лимит, не учитывая запрос.
+
+        Для счётчиков неудач (вход): peek перед проверкой пароля, check — после неудачной.
+        """
+        return await self._evaluate(db, keys, increment=False)
+
+    async def _evaluate(self, db: AsyncSession | None, keys: dict[str, str | None], increment: bool) -> int | None:
+        now = time.time()
+        keys = {name: value for name, value in keys.items() if value and name in self.rules}
+        # Без учёта запроса отказываем, когда лимит уже выбран, а не превышен
+        limit_offset = 0 if increment else 1
+
+        for name, value in keys.items():
+            rule = self.rules[name]
+            current, previous, elapsed = self._hit_local(f"{self.scope}:{name}:{value}", rule, now, increment)
+            if window_estimate(current + limit_offset, previous, elapsed, rule.window) > rule.limit:
+                self.counters[f"rejected_{name}"] += 1
+                return retry_after(rule, current + limit_offset, previous, elapsed)
+
+        if db is not None and settings.rate_limit_backend == "postgres":
+            try:
+                rejected = None
+                for name, value in keys.items():
+                    rule = self.rules[name]
+                    current, previous, elapsed = await self._hit_shared(
+                        db, f"{self.scope}:{name}:{value}", rule, now, increment
+                    )
+                    if window_estimate(current + limit_offset, previous, elapsed, rule.window) > rule.limit:
+                        rejected = name, retry_after(rule, current + limit_offset, previous, elapsed)
+                        break
+                if increment and now - self._last_shared_cleanup > SHARED_CLEANUP_SECONDS:
+                    self._last_shared_cleanup = now
+                    await self._cleanup_shared(db, now)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                self.counters["shared_errors"] += 1
+                logger.warning("Ограничение частоты %s: общий счётчик недоступен: %s", self.scope, e)
+                rejected = None
+            if rejected is not None:
+                name, wait = rejected
+                self.counters[f"rejected_{name}"] += 1
+                return wait
+
+        self.counters["allowed"] += 1
+        return None
+
+    def stats(self) -> dict:
+        """Счётчики этого воркера с момента запуска — для мониторинга."""
+        return {
+            "scope": self.scope,
+            "backend": settings.rate_limit_backend,
+            "rules": {
+                name: {"limit": rule.limit, "window_seconds": rule.window}
+                for name, rule in self.rules.items()
+            },
+            "tracked_keys": len(self._local),
+            **self.counters,
+        }
+
+
+# Неудачные попытки входа в админку: считаются только неудачи (см. routers/auth.login)
+login_rate_limiter = RateLimiter(
+    "login",
+    {
+        "username": RateLimitRule(settings.login_failures_per_username, settings.login_failure_window_seconds),
+        "ip": RateLimitRule(settings.login_failures_per_ip, settings.login_failure_window_seconds),
+    },
+)
+
+lead_rate_limiter = RateLimiter(
+    "lead",
+    {
+        "ip": RateLimitRule(settings.lead_rate_limit_per_ip, settings.lead_rate_limit_ip_window_seconds),
+        "phone": RateLimitRule(settings.lead_rate_limit_per_phone, settings.lead_rate_limit_phone_window_seconds),
+    },
+)
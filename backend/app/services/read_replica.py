@@ -0,0 +1,261 @@
+"""
+Публичное чтение с реплики PostgreSQL.
+
+Если задан settings.read_database_url, публичные GET (объявления, участки на
+карте, локации, новости, гео-страницы) читают через get_read_db / read_session
+с реплики, а админка, заявки и всё, что пишет, работают с основной БД.
+
+Сессия уходит на основную БД, когда реплике нельзя доверять:
+- проверка реплики (раз в settings.read_replica_check_seconds) не проходит;
+- реплика отстаёт больше settings.read_replica_max_lag_seconds. Отставание
+  оценивается по позиции WAL: воркер запоминает, где была основная БД при
+  каждой проверке, и смотрит, какую из этих позиций реплика ещё не применила.
+  Простой основной БД отставанием не считается;
+- недавно была запись через API (PrimaryWritesMiddleware). После неё воркер
+  рассылает NOTIFY primary_writes с позицией WAL, и все воркеры читают с
+  основной БД, пока реплика её не применит (не дольше
+  settings.read_after_write_seconds). Так опубликованное в админке сразу
+  видно на сайте.
+
+Реплика, которая не является потоковой (например, второй независимый
+экземпляр PostgreSQL для проверки), позицию WAL не сообщает: для неё после
+записи чтение просто уходит на основную БД на settings.read_after_write_seconds.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal, ReadSessionLocal, async_engine, read_engine
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_WRITES_CHANNEL = "primary_writes"
+
+# Сколько замеров позиции WAL основной БД хранить (с запасом на max_lag)
+LSN_SAMPLES = 300
+# Позиция неизвестна (слушатель переподключился) — ждать всё окно
+UNKNOWN_LSN = 2**64
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Запись, после которой не нужно сразу видеть изменения на сайте: заявки и вход
+NON_PUBLISHING_PREFIXES = ("/api/leads/", "/api/auth/")
+
+
+def parse_lsn(value: str | None) -> int | None:
+    """Позиция WAL из текстового вида PostgreSQL ("16/B374D848")."""
+    if not value:
+        return None
+    high, low = value.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def replica_lag(samples: deque[tuple[float, int]], replay_lsn: int, now: float) -> float:
+    """
+    Отставание реплики в секундах по замерам (время, позиция WAL основной БД).
+
+    Первый замер, до которого реплика ещё не дошла, показывает, с какого момента
+    у неё нет данных.
+    """
+    for checked_at, lsn in samples:
+        if lsn > replay_lsn:
+            return now - checked_at
+    return 0.0
+
+
+def is_publishing_write(method: str, path: str, status_code: int) -> bool:
+    """Успешный запрос, после которого сайт должен сразу показать изменения."""
+    return (
+        method not in SAFE_METHODS
+        and status_code < 400
+        and not path.startswith(NON_PUBLISHING_PREFIXES)
+    )
+
+
+class ReplicaRouter:
+    """Выбор БД для публичного чтения и фоновая проверка реплики (запускается в lifespan)."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._samples: deque[tuple[float, int]] = deque(maxlen=LSN_SAMPLES)
+        self._checked_at = 0.0
+        self._lag: float | None = None
+        self._replay_lsn: int | None = None
+        self._wait_lsn = 0
+        self._wait_until = 0.0
+        self._available = False
+        self._lagging = False
+
+    @property
+    def enabled(self) -> bool:
+        return ReadSessionLocal is not None
+
+    def use_replica(self) -> bool:
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        # Проверка давно не проходила — реплика недоступна или монитор не работает
+        if now - self._checked_at > 3 * settings.read_replica_check_seconds:
+            return False
+        if self._lag is not None and self._lag > settings.read_replica_max_lag_seconds:
+            return False
+        if now < self._wait_until and (self._replay_lsn is None or self._replay_lsn < self._wait_lsn):
+            return False
+        return True
+
+    def session(self) -> AsyncSession:
+        """Новая сессия для чтения: с реплики, если ей можно доверять, иначе с основной БД."""
+        if self.use_replica():
+            return ReadSessionLocal()
+        return AsyncSessionLocal()
+
+    def on_notify(self, payload: str | None) -> None:
+        """Запись на основной БД в каком-то воркере; payload — позиция WAL после неё."""
+        try:
+            lsn = parse_lsn(payload)
+        except ValueError:
+            lsn = None
+        now = time.monotonic()
+        if now >= self._wait_until:
+            self._wait_lsn = 0
+        self._wait_lsn = max(self._wait_lsn, lsn if lsn is not None else UNKNOWN_LSN)
+        self._wait_until = now + settings.read_after_write_seconds
+        # Проверить реплику сразу: возможно, она уже догнала
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def note_write(self) -> None:
+        """Разослать позицию WAL после записи (вызывается middleware после отправки ответа)."""
+        if not self.enabled:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                lsn = (await db.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar()
+                await db.execute(
+                    text("SELECT pg_notify(:channel, :lsn)"),
+                    {"channel": PRIMARY_WRITES_CHANNEL, "lsn": lsn},
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning("Реплика: не удалось разослать позицию записи: %s", e)
+            lsn = None
+        # В своём воркере — не дожидаясь уведомления
+        self.on_notify(lsn)
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if read_engine is not None:
+            await read_engine.dispose()
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self._check()
+                if not self._available:
+                    logger.info("Реплика: доступна, публичное чтение идёт с неё")
+                    self._available = True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._available:
+                    logger.warning("Реплика: недоступна, чтение переключено на основную БД: %s", e)
+                    self._available = False
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.read_replica_check_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _check(self) -> None:
+        # Сначала основная БД: реплика, догнавшая этот замер, не отстаёт
+        async with async_engine.connect() as conn:
+            primary_lsn = parse_lsn((await conn.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar())
+        async with read_engine.connect() as conn:
+            in_recovery, replay = (
+                await conn.execute(text("SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text"))
+            ).one()
+
+        now = time.monotonic()
+        self._samples.append((now, primary_lsn))
+        if in_recovery and replay:
+            self._replay_lsn = parse_lsn(replay)
+            self._lag = replica_lag(self._samples, self._replay_lsn, now)
+        else:
+            # Не потоковая реплика — отставание не измерить
+            self._replay_lsn = None
+            self._lag = None
+        self._checked_at = now
+
+        lagging = self._lag is not None and self._lag > settings.read_replica_max_lag_seconds
+        if lagging != self._lagging:
+            if lagging:
+                logger.warning("Реплика: отставание %.1f с, чтение переключено на основную БД", self._lag)
+            else:
+                logger.info("Реплика: догнала основную БД")
+            self._lagging = lagging
+
+
+replica_router = ReplicaRouter()
+
+
+class PrimaryWritesMiddleware:
+    """
+    ASGI middleware: после записи через API разослать позицию WAL.
+
+    Уведомление уходит после последней части тела ответа: потоковые ответы
+    (пакетная загрузка изображений NDJSON) коммитят по ходу отдачи, и позиция,
+    взятая до конца потока, была бы раньше их записей. Ответ не буферизуется.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            await send(message)
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                if is_publishing_write(scope["method"], scope["path"], status_code):
+                    await replica_router.note_write()
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def read_session() -> AsyncSession:
+    """Сессия для публичного чтения (async with read_session() as db: ...)."""
+    return replica_router.session()
+
+
+async def get_read_db():
+    """
+    Dependency: сессия для публичного чтения — с реплики, если ей можно доверять.
+
+    Только для обработчиков, которые ничего не пишут.
+    """
+    async with replica_router.session() as session:
+        yield session
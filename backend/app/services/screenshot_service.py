@@ -1,31 +1,214 @@
 """
 Сервис для генерации скриншотов карты объявлений.
-Использует Playwright для рендеринга страницы и создания скриншота.
+
+По умолчанию (settings.map_renderer = "static") карта рисуется Pillow в пуле
+процессов по локальному кешу тайлов (app.utils.static_map) — без браузера и
+фронтенда. Режим "browser" снимает страницу /listing-screenshot/{slug}
+через Playwright (общий браузер app.services.browser_pool).
+
+Вместе с картой сохраняется отпечаток геометрии и статусов участков
+(Image.source_fingerprint): refresh_map перерисовывает карту, только если
+участки с тех пор изменились (см. app.services.map_refresh).
 """
 
 import asyncio
+import hashlib
+import json
+import logging
 import os
 import uuid
 from pathlib import Path
-from datetime import datetime
 
+from geoalchemy2.functions import ST_X, ST_Y
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select, text
 
 from app.models.image import Image
 from app.models.listing import Listing
+from app.models.plot import Plot, PlotStatus
 from app.config import settings
+from app.services.browser_pool import browser_pool
+from app.services.image_pool import image_pool
+from app.services.map_tiles import map_tile_cache
+from app.utils.image_ops import placeholder_for_file
+from app.utils.image_files import remove_image_files, thumbnail_url
+from app.utils.static_map import plan_viewport, render_static_map, viewport_tiles
 from app.utils.time import utcnow
 
+logger = logging.getLogger(__name__)
+
+# URL сгенерированных карт (uploads/generated/map_{listing_id}_{uuid}.png)
+GENERATED_MAP_URL_PREFIX = "/uploads/generated/map_"
+
+# Ключ pg_advisory_lock перерисовки карты (второй аргумент — ID объявления)
+MAP_LOCK_KEY = 0x1A6E_0C02
+
+MAP_WIDTH = 1200
+MAP_HEIGHT = 630
+
+MIME_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+}
+
+
+def map_fingerprint(plots: list[dict]) -> str:
+    """Отпечаток того, что нарисовано на карте: геометрия и статусы участков."""
+    raw = json.dumps(plots, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
 
 class ScreenshotService:
     """Сервис генерации скриншотов карты."""
-    
+
     def __init__(self, db: AsyncSession):
         self.db = db
         self.output_dir = Path(settings.upload_dir) / "generated"
         self.output_dir.mkdir(parents=True, exist_ok=True)
-    
+
+    async def _load_map_plots(self, listing_ids: list[int]) -> dict[int, list[dict]]:
+        """Геометрия участков для карты (как на публичной странице: в продаже и в резерве)."""
+        result = await self.db.execute(
+            select(
+                Plot.id,
+                Plot.listing_id,
+                Plot.status,
+                ST_Y(Plot.centroid).label("lat"),
+                ST_X(Plot.centroid).label("lon"),
+                func.ST_AsGeoJSON(Plot.polygon).label("polygon"),
+            )
+            .where(
+                Plot.listing_id.in_(listing_ids),
+                Plot.status.in_([PlotStatus.active, PlotStatus.reserved]),
+            )
+            .order_by(Plot.id)
+        )
+        plots: dict[int, list[dict]] = {}
+        for row in result.all():
+            polygon = None
+            if row.polygon:
+                # Внешнее кольцо, [lon, lat] -> [lat, lon]
+                ring = json.loads(row.polygon)["coordinates"][0]
+                polygon = [[lat, lon] for lon, lat in ring]
+            plots.setdefault(row.listing_id, []).append({
+                "id": row.id,
+                "status": PlotStatus(row.status).value,
+                "polygon": polygon,
+                "lat": row.lat,
+                "lon": row.lon,
+            })
+        return plots
+
+    async def _render_static(self, listing_id: int, plots: list[dict]) -> tuple[str, str, dict] | None:
+        """
+        Нарисовать карту в пуле процессов (без обращения к БД).
+
+        Returns:
+            (имя файла, MIME-тип, плейсхолдер) или None при ошибке
+        """
+        viewport = plan_viewport(plots, MAP_WIDTH, MAP_HEIGHT)
+        if viewport is None:
+            logger.warning("Карта объявления %s: у участков нет координат", listing_id)
+            return None
+
+        missing = await map_tile_cache.ensure(viewport_tiles(viewport))
+        if missing:
+            logger.warning("Карта объявления %s: нет %s тайлов подложки", listing_id, missing)
+
+        fmt = settings.map_image_format if settings.map_image_format in MIME_TYPES else "png"
+        filename = f"map_{listing_id}_{uuid.uuid4().hex[:8]}.{fmt}"
+        filepath = self.output_dir / filename
+
+        try:
+            rendered = await image_pool.run(
+                render_static_map,
+                plots,
+                settings.map_tile_cache_dir,
+                str(filepath),
+                MAP_WIDTH,
+                MAP_HEIGHT,
+                fmt,
+            )
+        except Exception as e:
+            logger.error("Карта объявления %s: ошибка рендера: %r", listing_id, e)
+            return None
+        if rendered is None:
+            return None
+
+        placeholder = {"lqip": rendered["lqip"], "dominant_color": rendered["dominant_color"]}
+        return filename, MIME_TYPES[fmt], placeholder
+
+    async def _render_browser(self, listing_id: int, slug: str, frontend_url: str) -> tuple[str, str, dict] | None:
+        """
+        Снять карту объявления в PNG через Playwright (без обращения к БД).
+
+        Returns:
+            (имя файла, MIME-тип, плейсхолдер) или None при ошибке
+        """
+        # URL страницы для скриншота
+        screenshot_url = f"{frontend_url}/listing-screenshot/{slug}"
+
+        # Генерируем имя файла
+        filename = f"map_{listing_id}_{uuid.uuid4().hex[:8]}.png"
+        filepath = self.output_dir / filename
+
+        try:
+            await browser_pool.screenshot(screenshot_url, str(filepath), width=MAP_WIDTH, height=MAP_HEIGHT)
+        except Exception as e:
+            logger.error("Скриншот карты объявления %s: %r", listing_id, e)
+            if filepath.exists():
+                os.remove(filepath)
+            return None
+
+        try:
+            placeholder = await image_pool.run(placeholder_for_file, str(filepath))
+        except Exception as e:
+            # Без плейсхолдера картинка всё равно показывается
+            logger.warning("Скриншот карты: не удалось построить плейсхолдер: %s", e)
+            placeholder = {}
+
+        return filename, MIME_TYPES["png"], placeholder
+
+    async def _render_map(
+        self,
+        listing_id: int,
+        slug: str,
+        frontend_url: str,
+        plots: list[dict],
+    ) -> tuple[str, str, dict] | None:
+        if settings.map_renderer == "browser":
+            return await self._render_browser(listing_id, slug, frontend_url)
+        return await self._render_static(listing_id, plots)
+
+    def _make_image(
+        self,
+        listing_id: int,
+        title: str,
+        filename: str,
+        mime_type: str,
+        placeholder: dict,
+        fingerprint: str,
+    ) -> Image:
+        # Формируем URL относительно uploads
+        relative_url = f"/uploads/generated/{filename}"
+
+        return Image(
+            entity_type="listing",
+            entity_id=listing_id,
+            url=relative_url,
+            thumbnail_url=thumbnail_url(relative_url),
+            original_filename=filename,
+            mime_type=mime_type,
+            width=MAP_WIDTH,
+            height=MAP_HEIGHT,
+            **placeholder,
+            source_fingerprint=fingerprint,
+            alt=f"Карта участков объявления {title}",
+            is_main=False,  # Не делаем главным автоматически
+            sort_order=999,  # В конец
+            created_at=utcnow(),
+        )
+
     async def generate_map_screenshot(
         self,
         listing_id: int,
@@ -33,11 +216,11 @@ class ScreenshotService:
     ) -> Image | None:
         """
         Генерирует скриншот карты для объявления.
-        
+
         Args:
             listing_id: ID объявления
             frontend_url: URL фронтенда для рендеринга
-            
+
         Returns:
             Image: созданная запись изображения или None при ошибке
         """
@@ -46,73 +229,27 @@ class ScreenshotService:
             select(Listing).where(Listing.id == listing_id)
         )
         listing = result.scalar_one_or_none()
-        
+
         if not listing:
             return None
-        
-        # URL страницы для скриншота
-        screenshot_url = f"{frontend_url}/listing-screenshot/{listing.slug}"
-        
-        # Генерируем имя файла
-        filename = f"map_{listing_id}_{uuid.uuid4().hex[:8]}.png"
-        filepath = self.output_dir / filename
-        
-        try:
-            # Импортируем playwright только при использовании
-            from playwright.async_api import async_playwright
-            
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page(viewport={"width": 1200, "height": 630})
-                
-                # Открываем страницу
-                await page.goto(screenshot_url, wait_until="networkidle")
-                
-                # Ждём сигнала готовности карты
-                try:
-                    await page.wait_for_function(
-                        "window.__MAP_READY__ === true",
-                        timeout=15000  # 15 секунд максимум
-                    )
-                except Exception:
-                    # Если сигнал не пришёл, ждём дополнительно
-                    await asyncio.sleep(3)
-                
-                # Делаем скриншот контейнера
-                container = page.locator("#screenshot-container")
-                await container.screenshot(path=str(filepath))
-                
-                await browser.close()
-        
-        except Exception as e:
-            print(f"Screenshot generation error: {e}")
+
+        plots = (await self._load_map_plots([listing.id])).get(listing.id, [])
+
+        rendered = await self._render_map(listing.id, listing.slug, frontend_url, plots)
+        if rendered is None:
             return None
-        
+        filename, mime_type, placeholder = rendered
+
         # Создаём запись изображения в БД
-        # Формируем URL относительно uploads
-        relative_url = f"/uploads/generated/{filename}"
-        
-        image = Image(
-            entity_type="listing",
-            entity_id=listing_id,
-            url=relative_url,
-            thumbnail_url=relative_url,  # Для скриншотов одинаковый
-            original_filename=filename,
-            mime_type="image/png",
-            width=1200,
-            height=630,
-            alt=f"Карта участков объявления {listing.title}",
-            is_main=False,  # Не делаем главным автоматически
-            sort_order=999,  # В конец
-            created_at=utcnow(),
+        image = self._make_image(
+            listing.id, listing.title, filename, mime_type, placeholder, map_fingerprint(plots)
         )
-        
         self.db.add(image)
         await self.db.commit()
         await self.db.refresh(image)
-        
+
         return image
-    
+
     async def bulk_generate_screenshots(
         self,
         listing_ids: list[int],
@@ -121,12 +258,16 @@ class ScreenshotService:
     ) -> dict:
         """
         Массовая генерация скриншотов для нескольких объявлений.
-        
+
+        Карты рендерятся параллельно (в пуле процессов или, в режиме browser,
+        не больше settings.screenshot_pages страниц одновременно), записи Image
+        сохраняются одним commit.
+
         Args:
             listing_ids: список ID объявлений
             frontend_url: URL фронтенда
             only_without_images: генерировать только для объявлений без изображений
-            
+
         Returns:
             dict: статистика выполнения
         """
@@ -137,28 +278,163 @@ class ScreenshotService:
             "failed": 0,
             "generated_ids": [],
         }
-        
+
+        result = await self.db.execute(
+            select(Listing.id, Listing.slug, Listing.title).where(Listing.id.in_(listing_ids))
+        )
+        listings = {row.id: row for row in result.all()}
+
+        # Объявления, у которых уже есть изображения
+        with_images: set[int] = set()
+        if only_without_images:
+            result = await self.db.execute(
+                select(Image.entity_id).where(
+                    Image.entity_type == "listing",
+                    Image.entity_id.in_(listing_ids)
+                ).distinct()
+            )
+            with_images = set(result.scalars().all())
+
+        todo = []
         for listing_id in listing_ids:
-            # Проверяем, есть ли уже изображения
-            if only_without_images:
-                result = await self.db.execute(
-                    select(Image).where(
-                        Image.entity_type == "listing",
-                        Image.entity_id == listing_id
-                    ).limit(1)
-                )
-                existing = result.scalar_one_or_none()
-                if existing:
-                    stats["skipped"] += 1
-                    continue
-            
-            # Генерируем скриншот
-            image = await self.generate_map_screenshot(listing_id, frontend_url)
-            
-            if image:
-                stats["success"] += 1
-                stats["generated_ids"].append(image.id)
+            if listing_id in with_images:
+                stats["skipped"] += 1
+            elif listing_id not in listings:
+                stats["failed"] += 1
             else:
+                todo.append(listings[listing_id])
+
+        plots_by_listing: dict[int, list[dict]] = {}
+        if todo:
+            plots_by_listing = await self._load_map_plots([row.id for row in todo])
+
+        # Одновременно не больше задач, чем процессов в пуле: остальные ждут
+        # здесь, а не в очереди пула, и не получают ImagePoolBusy
+        slots = asyncio.Semaphore(image_pool.workers)
+
+        async def render(row) -> tuple[str, str, dict] | None:
+            async with slots:
+                return await self._render_map(row.id, row.slug, frontend_url, plots_by_listing.get(row.id, []))
+
+        # БД во время рендера не используется: сессия одна на все задачи
+        rendered = await asyncio.gather(*(render(row) for row in todo))
+
+        images = []
+        for row, item in zip(todo, rendered):
+            if item is None:
                 stats["failed"] += 1
-        
+                continue
+            filename, mime_type, placeholder = item
+            fingerprint = map_fingerprint(plots_by_listing.get(row.id, []))
+            image = self._make_image(row.id, row.title, filename, mime_type, placeholder, fingerprint)
+            self.db.add(image)
+            images.append(image)
+
+        if images:
+            await self.db.commit()
+
+        stats["success"] = len(images)
+        stats["generated_ids"] = [image.id for image in images]
         return stats
+
+    async def stale_maps(self, listing_ids: list[int] | None = None) -> list[int]:
+        """
+        Объявления, у которых сгенерированная карта не совпадает с текущими участками.
+
+        listing_ids=None — проверить все объявления со сгенерированными картами.
+        """
+        query = select(Image.entity_id, Image.source_fingerprint).where(
+            Image.entity_type == "listing",
+            Image.url.like(f"{GENERATED_MAP_URL_PREFIX}%"),
+        )
+        if listing_ids is not None:
+            query = query.where(Image.entity_id.in_(listing_ids))
+        result = await self.db.execute(query)
+
+        fingerprints: dict[int, set[str | None]] = {}
+        for entity_id, fingerprint in result.all():
+            fingerprints.setdefault(entity_id, set()).add(fingerprint)
+        if not fingerprints:
+            return []
+
+        plots_by_listing = await self._load_map_plots(list(fingerprints))
+        return sorted(
+            listing_id
+            for listing_id, stored in fingerprints.items()
+            if stored != {map_fingerprint(plots_by_listing.get(listing_id, []))}
+        )
+
+    async def refresh_map(
+        self,
+        listing_id: int,
+        frontend_url: str = "http://localhost:3000",
+    ) -> str:
+        """
+        Перерисовать карту объявления, если участки изменились с момента генерации.
+
+        Новая карта занимает место старой (главная, порядок, alt), старые записи
+        удаляются, их файлы — после commit. Параллельные вызовы для одного
+        объявления (в том числе из других воркеров) не дублируют работу.
+
+        Returns:
+            "regenerated", "unchanged", "no_map", "locked" или "failed"
+        """
+        locked = await self.db.scalar(
+            text("SELECT pg_try_advisory_xact_lock(:key, :listing_id)"),
+            {"key": MAP_LOCK_KEY, "listing_id": listing_id},
+        )
+        if not locked:
+            await self.db.rollback()
+            return "locked"
+
+        try:
+            result = await self.db.execute(
+                select(Image)
+                .where(
+                    Image.entity_type == "listing",
+                    Image.entity_id == listing_id,
+                    Image.url.like(f"{GENERATED_MAP_URL_PREFIX}%"),
+                )
+                .order_by(Image.id)
+            )
+            old_images = result.scalars().all()
+            if not old_images:
+                return "no_map"
+
+            plots = (await self._load_map_plots([listing_id])).get(listing_id, [])
+            fingerprint = map_fingerprint(plots)
+            if all(image.source_fingerprint == fingerprint for image in old_images):
+                return "unchanged"
+
+            result = await self.db.execute(
+                select(Listing.slug, Listing.title).where(Listing.id == listing_id)
+            )
+            listing = result.first()
+            if listing is None:
+                # Объявление удалено — записи уберёт сборщик мусора
+                return "no_map"
+
+            rendered = await self._render_map(listing_id, listing.slug, frontend_url, plots)
+            if rendered is None:
+                return "failed"
+            filename, mime_type, placeholder = rendered
+
+            latest = old_images[-1]
+            image = self._make_image(listing_id, listing.title, filename, mime_type, placeholder, fingerprint)
+            image.is_main = any(old.is_main for old in old_images)
+            image.sort_order = latest.sort_order
+            image.alt = latest.alt or image.alt
+            image.title = latest.title
+            self.db.add(image)
+            for old in old_images:
+                await self.db.delete(old)
+            await self.db.commit()
+        finally:
+            # Снять advisory lock, если вышли без commit
+            if self.db.in_transaction():
+                await self.db.rollback()
+
+        for old in old_images:
+            remove_image_files(old)
+        logger.info("Карта объявления %s перерисована: участки изменились", listing_id)
+        return "regenerated"
@@ -0,0 +1,397 @@
+"""
+Локальный индекс населённых пунктов для автокомплита в админке.
+
+Почти все запросы к /api/admin/geo/suggest — это населённые пункты, которые уже
+есть в таблице locations (с fias_id) или в старой таблице settlements. Индекс
+держит их названия в памяти воркера и ищет по префиксу (с учётом ё/е, типа пункта
+«пос.», «г.» и латинского слага) и, если префикс ничего не дал, по триграммам —
+чтобы прощать опечатки. Без похода в DaData отвечаем, только если запрос совпал с
+известным названием (SearchResult.confident); иначе это может быть новый пункт,
+и к локальным подсказкам добавляются подсказки DaData.
+
+Ответ собирается в формате DaDataSuggestion с теми же полями data, которые читает
+выбор локации в админке, поэтому фронтенду всё равно, откуда пришла подсказка.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from app.dadata_client import DaDataSuggestion
+from app.models.location import Location, LocationType, Settlement
+
+logger = logging.getLogger(__name__)
+
+# Страховка на случай, если локацию изменили в другом воркере: своё изменение
+# сбрасывает индекс сразу, чужое подхватится не позже чем через это время
+INDEX_TTL_SECONDS = 300
+
+# Минимальная доля общих триграмм, чтобы считать название похожим на запрос
+TRIGRAM_THRESHOLD = 0.45
+# Доля, при которой опечатка почти наверняка в известном названии
+CONFIDENT_TRIGRAM_THRESHOLD = 0.8
+
+REGION_WITH_TYPE = "Калининградская обл"
+
+# Полные названия типов — DaData отдаёт их в *_type_full, админка пишет их в локацию
+SETTLEMENT_TYPE_FULL = {
+    "г": "город",
+    "пгт": "поселок городского типа",
+    "п": "поселок",
+    "пос": "поселок",
+    "с": "село",
+    "д": "деревня",
+    "х": "хутор",
+    "ст": "станция",
+    "снт": "садовое товарищество",
+}
+
+# Типы в начале запроса («пос. Поддубное», «поселок Поддубное») отбрасываем,
+# если с ними ничего не нашлось: в локации тип мог быть записан иначе
+_TYPE_PREFIXES = sorted(
+    {key for key in SETTLEMENT_TYPE_FULL} | {value.replace("ё", "е") for value in SETTLEMENT_TYPE_FULL.values()},
+    key=len,
+    reverse=True,
+)
+
+_TRANSLIT = str.maketrans(
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+    "abvgdeejzijklmnoprstufhzcss_y_eua",
+)
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр, ё → е, всё кроме букв и цифр — в одиночные пробелы."""
+    text = text.lower().replace("ё", "е")
+    text = re.sub(r"[^0-9a-zа-я]+", " ", text)
+    return text.strip()
+
+
+def transliterate(text: str) -> str:
+    """Та же транслитерация, что и при генерации слагов локаций (без дефисов)."""
+    text = normalize(text).translate(_TRANSLIT)
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    """Триграммы слова с пробелами по краям (как pg_trgm)."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class IndexEntry:
+    """Одна подсказка: сам ответ и ключи, по которым её можно найти."""
+    suggestion: DaDataSuggestion
+    name: str
+    sort_order: int
+    terms: list[str] = field(default_factory=list)
+
+
+def _type_full(settlement_type: str | None) -> str | None:
+    if not settlement_type:
+        return None
+    short = settlement_type.strip(". ").lower()
+    return SETTLEMENT_TYPE_FULL.get(short, settlement_type)
+
+
+def _with_type(name: str, settlement_type: str | None) -> str:
+    if not settlement_type:
+        return name
+    return f"{settlement_type.rstrip('.')} {name}"
+
+
+def _location_to_suggestion(location: Location) -> DaDataSuggestion:
+    """
+    Локация в виде ответа DaData.
+
+    Город под регионом — это городской округ (поля city_*), всё остальное —
+    населённый пункт внутри района или округа (поля settlement_* и area_*).
+    """
+    parent = location.parent
+    data: dict = {
+        "region": "Калининградская",
+        "region_type": "обл",
+        "region_with_type": REGION_WITH_TYPE,
+        "fias_id": location.fias_id,
+        "local_source": "locations",
+        "location_id": location.id,
+    }
+
+    is_city_okrug = (
+        location.type == LocationType.CITY
+        and (parent is None or parent.type == LocationType.REGION)
+    )
+    if is_city_okrug:
+        data.update({
+            "city": location.name,
+            "city_type": location.settlement_type,
+            "city_type_full": _type_full(location.settlement_type),
+            "city_with_type": _with_type(location.name, location.settlement_type),
+            "city_fias_id": location.fias_id,
+            "fias_level": "4",
+        })
+        parent_label = None
+    else:
+        data.update({
+            "settlement": location.name,
+            "settlement_type": location.settlement_type,
+            "settlement_type_full": _type_full(location.settlement_type),
+            "settlement_with_type": _with_type(location.name, location.settlement_type),
+            "settlement_fias_id": location.fias_id,
+            "fias_level": "6",
+        })
+        parent_label = parent.name if parent else None
+        if parent and parent.type != LocationType.REGION:
+            data.update({
+                "area": parent.name,
+                "area_with_type": parent.name,
+                "area_fias_id": parent.fias_id,
+            })
+
+    parts = [REGION_WITH_TYPE]
+    if parent_label:
+        parts.append(parent_label)
+    parts.append(_with_type(location.name, location.settlement_type))
+    value = ", ".join(parts[1:]) if len(parts) > 1 else parts[0]
+
+    return DaDataSuggestion(
+        value=value,
+        unrestricted_value=", ".join(parts),
+        data=data,
+    )
+
+
+def _settlement_to_suggestion(settlement: Settlement) -> DaDataSuggestion:
+    """Населённый пункт из старой таблицы settlements в виде ответа DaData."""
+    district = settlement.district
+    data: dict = {
+        "region": "Калининградская",
+        "region_type": "обл",
+        "region_with_type": REGION_WITH_TYPE,
+        "fias_id": settlement.fias_id,
+        "fias_level": "6",
+        "settlement": settlement.name,
+        "settlement_type": settlement.type,
+        "settlement_type_full": _type_full(settlement.type),
+        "settlement_with_type": _with_type(settlement.name, settlement.type),
+        "settlement_fias_id": settlement.fias_id,
+        "local_source": "settlements",
+    }
+    parts = [REGION_WITH_TYPE]
+    if district:
+        data.update({
+            "area": district.name,
+            "area_with_type": district.name,
+            "area_fias_id": district.fias_id,
+        })
+        parts.append(district.name)
+    parts.append(_with_type(settlement.name, settlement.type))
+
+    return DaDataSuggestion(
+        value=", ".join(parts[1:]),
+        unrestricted_value=", ".join(parts),
+        data=data,
+    )
+
+
+def _terms(name: str, slug: str | None, settlement_type: str | None) -> list[str]:
+    """Все формы названия, по началу которых ищется подсказка."""
+    norm_name = normalize(name)
+    terms = {norm_name, transliterate(name)}
+    # Каждое слово отдельно: «Красный Бор» находится и по «бор»
+    terms.update(norm_name.split())
+    if slug:
+        terms.add(slug.replace("-", " ").lower())
+    if settlement_type:
+        short = normalize(settlement_type)
+        terms.add(f"{short} {norm_name}")
+        full = _type_full(settlement_type)
+        if full:
+            terms.add(f"{normalize(full)} {norm_name}")
+    return [t for t in terms if t]
+
+
+@dataclass
+class SearchResult:
+    suggestions: list[DaDataSuggestion]
+    # Запрос совпал с известным названием (или очень на него похож) —
+    # новый населённый пункт в DaData искать незачем
+    confident: bool = False
+
+
+class SettlementIndex:
+    """Префиксный и триграммный индекс по известным населённым пунктам."""
+
+    def __init__(self, ttl: float = INDEX_TTL_SECONDS):
+        self._ttl = ttl
+        self._entries: list[IndexEntry] = []
+        self._prefixes: dict[str, set[int]] = {}
+        self._trigrams: dict[str, set[int]] = {}
+        self._entry_trigrams: list[set[str]] = []
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self._ttl
+
+    def invalidate(self) -> None:
+        """Сбросить индекс: перестроится при следующем запросе."""
+        self._loaded_at = None
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """Построить индекс, если его ещё нет или он устарел."""
+        if self.is_fresh:
+            return
+        async with self._lock:
+            if self.is_fresh:
+                return
+            await self._load(db)
+
+    async def _load(self, db: AsyncSession) -> None:
+        result = await db.execute(
+            select(Location)
+            .options(joinedload(Location.parent))
+            .where(
+                Location.fias_id.isnot(None),
+                Location.type.in_([LocationType.CITY, LocationType.SETTLEMENT]),
+            )
+        )
+        locations = result.unique().scalars().all()
+
+        result = await db.execute(
+            select(Settlement)
+            .options(joinedload(Settlement.district))
+            .where(Settlement.fias_id.isnot(None))
+        )
+        legacy = result.unique().scalars().all()
+
+        entries: list[IndexEntry] = []
+        seen_fias: set[str] = set()
+
+        for loc in locations:
+            seen_fias.add(loc.fias_id)
+            entries.append(IndexEntry(
+                suggestion=_location_to_suggestion(loc),
+                name=loc.name,
+                sort_order=loc.sort_order or 0,
+                terms=_terms(loc.name, loc.slug, loc.settlement_type),
+            ))
+
+        # Старые населённые пункты — только те, что ещё не перенесены в locations
+        for s in legacy:
+            if s.fias_id in seen_fias:
+                continue
+            seen_fias.add(s.fias_id)
+            entries.append(IndexEntry(
+                suggestion=_settlement_to_suggestion(s),
+                name=s.name,
+                sort_order=s.sort_order or 0,
+                terms=_terms(s.name, s.slug, s.type),
+            ))
+
+        self._build(entries)
+        self._loaded_at = time.monotonic()
+        logger.info("Индекс населённых пунктов построен: %s записей", len(entries))
+
+    def _build(self, entries: list[IndexEntry]) -> None:
+        prefixes: dict[str, set[int]] = {}
+        trigram_map: dict[str, set[int]] = {}
+        entry_trigrams: list[set[str]] = []
+
+        for idx, entry in enumerate(entries):
+            for term in entry.terms:
+                for end in range(1, len(term) + 1):
+                    prefixes.setdefault(term[:end], set()).add(idx)
+
+            grams: set[str] = set()
+            for word in normalize(entry.name).split():
+                grams |= trigrams(word)
+            entry_trigrams.append(grams)
+            for gram in grams:
+                trigram_map.setdefault(gram, set()).add(idx)
+
+        self._entries = entries
+        self._prefixes = prefixes
+        self._trigrams = trigram_map
+        self._entry_trigrams = entry_trigrams
+
+    def search(self, query: str, count: int = 10) -> SearchResult:
+        """Найти подсказки: сначала по префиксу, при промахе — по триграммам."""
+        norm = normalize(query)
+        if not norm or not self._entries:
+            return SearchResult([])
+
+        candidates = self._prefixes.get(norm)
+        if not candidates:
+            for prefix in _TYPE_PREFIXES:
+                if norm.startswith(prefix + " "):
+                    norm = norm[len(prefix) + 1:]
+                    candidates = self._prefixes.get(norm)
+                    break
+        if not candidates and re.search(r"[a-z]", norm):
+            candidates = self._prefixes.get(transliterate(norm))
+
+        if candidates:
+            def rank(idx: int) -> tuple:
+                entry = self._entries[idx]
+                name = normalize(entry.name)
+                return (name != norm, not name.startswith(norm), entry.sort_order, len(name), name)
+
+            ranked = sorted(candidates, key=rank)
+            confident = normalize(self._entries[ranked[0]].name) == norm
+        else:
+            ranked, best_score = self._fuzzy(norm)
+            confident = best_score >= CONFIDENT_TRIGRAM_THRESHOLD
+
+        return SearchResult([self._entries[idx].suggestion for idx in ranked[:count]], confident)
+
+    def _fuzzy(self, norm: str) -> tuple[list[int], float]:
+        """
+        Поиск с опечатками: доля общих триграмм с самым похожим словом запроса.
+
+        Возвращает найденные записи и долю у лучшей из них.
+        """
+        words = [w for w in norm.split() if len(w) >= 3]
+        if not words:
+            return [], 0.0
+
+        scores: dict[int, float] = {}
+        for word in words:
+            query_grams = trigrams(word)
+            hits: dict[int, int] = {}
+            for gram in query_grams:
+                for idx in self._trigrams.get(gram, ()):
+                    hits[idx] = hits.get(idx, 0) + 1
+            for idx, common in hits.items():
+                union = len(query_grams | self._entry_trigrams[idx])
+                score = common / union if union else 0.0
+                if score > scores.get(idx, 0.0):
+                    scores[idx] = score
+
+        matched = [idx for idx, score in scores.items() if score >= TRIGRAM_THRESHOLD]
+        matched.sort(key=lambda idx: (-scores[idx], self._entries[idx].sort_order))
+        return matched, scores[matched[0]] if matched else 0.0
+
+
+_settlement_index: SettlementIndex | None = None
+
+
+def get_settlement_index() -> SettlementIndex:
+    global _settlement_index
+    if _settlement_index is None:
+        _settlement_index = SettlementIndex()
+    return _settlement_index
+
+
+def invalidate_settlement_index() -> None:
+    """Сбросить индекс после изменения локаций (вызывать после commit)."""
+    if _settlement_index is not None:
+        _settlement_index.invalidate()
@@ -0,0 +1,224 @@
+"""
+Кеш настроек сайта (таблица settings) в памяти воркера.
+
+Раньше каждая публичная страница, каждая заявка, каждый запрос к NSPD и каждая
+подсказка DaData читали settings из БД, причём часть — синхронной сессией прямо
+в event loop. Теперь все читают отсюда.
+
+Согласованность между воркерами uvicorn держится на PostgreSQL LISTEN/NOTIFY:
+admin_settings.update_setting в той же транзакции делает NOTIFY с ключом
+настройки, и каждый воркер, слушающий канал, перечитывает этот ключ. NOTIFY
+доставляется только после commit, так что устаревшего значения никто не увидит.
+Если соединение-слушатель потеряно, снимок считается свежим не дольше
+FALLBACK_TTL_SECONDS и перечитывается целиком, а после переподключения —
+обязательно (пока слушателя не было, уведомления могли потеряться).
+
+На том же соединении можно слушать и другие каналы (listen): например, кеш
+пользователей админки сбрасывается по NOTIFY admin_users_changed.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Callable
+
+import asyncpg
+from sqlalchemy import select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.setting import Setting
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CHANNEL = "settings_changed"
+
+# Сколько доверять снимку, пока слушатель не подключён
+FALLBACK_TTL_SECONDS = 30
+
+# Проверка, что соединение-слушатель ещё живо
+LISTENER_PING_SECONDS = 30
+LISTENER_MAX_BACKOFF_SECONDS = 60
+
+
+def listener_dsn() -> str:
+    """DSN для asyncpg без указания драйвера SQLAlchemy."""
+    url = make_url(settings.database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+class SiteSettingsCache:
+    """Снимок таблицы settings, обновляемый по уведомлениям из PostgreSQL."""
+
+    def __init__(self):
+        self._values: dict[str, str | None] = {}
+        self._loaded_at: float | None = None
+        self._etag: str = ""
+        self._lock = asyncio.Lock()
+        self._listening = False
+        self._listener_task: asyncio.Task | None = None
+        self._refresh_tasks: set[asyncio.Task] = set()
+        self._channels: dict[str, Callable[[str | None], None]] = {}
+
+    # === Чтение ===
+
+    @property
+    def etag(self) -> str:
+        """Хеш содержимого снимка: одинаков во всех воркерах при одинаковых данных."""
+        return self._etag
+
+    def _is_fresh(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        if self._listening:
+            return True
+        return time.monotonic() - self._loaded_at < FALLBACK_TTL_SECONDS
+
+    async def ensure_loaded(self) -> None:
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            await self._reload_all()
+
+    async def get(self, key: str, default: str | None = None) -> str | None:
+        """Значение настройки; пустая строка считается отсутствием значения."""
+        await self.ensure_loaded()
+        return self._values.get(key) or default
+
+    async def get_many(self, keys: list[str]) -> dict[str, str | None]:
+        """Значения нескольких настроек; отсутствующие ключи в ответ не попадают."""
+        await self.ensure_loaded()
+        return {key: self._values[key] for key in keys if key in self._values}
+
+    # === Обновление ===
+
+    async def _reload_all(self) -> None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Setting.key, Setting.value))
+            values = {row.key: row.value for row in result.all()}
+        self._values = values
+        self._loaded_at = time.monotonic()
+        self._update_etag()
+
+    async def _reload_key(self, key: str) -> None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Setting.value).where(Setting.key == key))
+            row = result.first()
+        if row is None:
+            self._values.pop(key, None)
+        else:
+            self._values[key] = row.value
+        self._update_etag()
+
+    def _update_etag(self) -> None:
+        digest = hashlib.sha1()
+        for key in sorted(self._values):
+            digest.update(key.encode())
+            digest.update(b"\0")
+            digest.update((self._values[key] or "").encode())
+            digest.update(b"\0")
+        self._etag = digest.hexdigest()[:16]
+
+    def apply_local(self, key: str, value: str | None) -> None:
+        """Сразу применить своё изменение, не дожидаясь уведомления."""
+        if self._loaded_at is None:
+            return
+        self._values[key] = value
+        self._update_etag()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        # Колбэк asyncpg синхронный — перечитывание запускаем отдельной задачей
+        coro = self._reload_key(payload) if payload else self._reload_all()
+        task = asyncio.get_running_loop().create_task(self._safe_refresh(coro))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _safe_refresh(self, coro) -> None:
+        try:
+            await coro
+        except Exception as e:
+            # Не смогли перечитать — пусть следующее чтение загрузит всё заново
+            logger.warning("Настройки: не удалось обновить снимок: %s", e)
+            self._loaded_at = None
+
+    # === Слушатель ===
+
+    def listen(self, channel: str, callback: Callable[[str | None], None]) -> None:
+        """
+        Слушать ещё один канал на соединении-слушателе (регистрировать до start).
+
+        callback(payload) вызывается синхронно в event loop; callback(None) —
+        после переподключения, когда уведомления могли потеряться.
+        """
+        self._channels[channel] = callback
+
+    async def start(self) -> None:
+        """Запустить слушатель уведомлений (вызывается при старте приложения)."""
+        if self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        self._listening = False
+
+    async def _listen_forever(self) -> None:
+        delay = 1
+        while True:
+            try:
+                conn = await asyncpg.connect(listener_dsn())
+                try:
+                    await conn.add_listener(SETTINGS_CHANNEL, self._on_notify)
+                    for channel, callback in self._channels.items():
+                        await conn.add_listener(
+                            channel,
+                            lambda _conn, _pid, _channel, payload, callback=callback: callback(payload),
+                        )
+                        callback(None)
+                    self._listening = True
+                    # Пока слушателя не было, изменения могли пройти мимо
+                    async with self._lock:
+                        await self._reload_all()
+                    delay = 1
+                    while not conn.is_closed():
+                        await asyncio.sleep(LISTENER_PING_SECONDS)
+                        await conn.execute("SELECT 1")
+                finally:
+                    self._listening = False
+                    await conn.close(timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    "Настройки: слушатель %s недоступен (%s), повтор через %s с",
+                    SETTINGS_CHANNEL,
+                    e,
+                    delay,
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTENER_MAX_BACKOFF_SECONDS)
+
+
+async def notify_settings_changed(db: AsyncSession, key: str) -> None:
+    """
+    Сообщить всем воркерам об изменении настройки.
+
+    Вызывать до commit: NOTIFY уходит вместе с транзакцией и не уйдёт при откате.
+    """
+    await db.execute(
+        text("SELECT pg_notify(:channel, :key)"),
+        {"channel": SETTINGS_CHANNEL, "key": key},
+    )
+
+
+site_settings = SiteSettingsCache()
@@ -9,13 +9,12 @@
 
 import asyncio
 import logging
+from dataclasses import dataclass
 from urllib.parse import quote
 
 import httpx
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.setting import Setting
+from app.services.site_settings import site_settings
 
 logger = logging.getLogger(__name__)
 
@@ -33,18 +32,22 @@ ALLOWED_PROXY_SCHEMES = ("http", "https", "socks5", "socks5h")
 
 REQUEST_TIMEOUT = 15.0
 
-# Уведомление отправляется в фоне, повторить его некому — поэтому пробуем несколько раз:
-# дешёвые прокси иногда рвут соединение, и одна осечка молча теряет заявку
+# Проверка связи из админки: дешёвые прокси иногда рвут соединение, одна осечка — не повод
+# сообщать об ошибке. Заявки повторяет диспетчер outbox с нарастающими паузами.
 MAX_ATTEMPTS = 3
 RETRY_DELAYS = (1.0, 3.0)
 
+# Лимит длины сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
 
-async def load_telegram_settings(db: AsyncSession) -> dict[str, str]:
-    """Прочитать настройки Telegram из БД."""
-    result = await db.execute(
-        select(Setting).where(Setting.key.in_(TELEGRAM_SETTING_KEYS))
-    )
-    return {s.key: (s.value or "").strip() for s in result.scalars().all()}
+# Общие HTTP-клиенты по адресу прокси (None — напрямую)
+_clients: dict[str | None, httpx.AsyncClient] = {}
+
+
+async def load_telegram_settings() -> dict[str, str]:
+    """Прочитать настройки Telegram из кеша настроек."""
+    values = await site_settings.get_many(TELEGRAM_SETTING_KEYS)
+    return {key: (value or "").strip() for key, value in values.items()}
 
 
 def build_proxy_url(settings: dict[str, str]) -> str | None:
@@ -112,50 +115,124 @@ def format_lead_message(lead_data: dict) -> str:
     )
 
 
-async def send_message(text: str, settings: dict[str, str]) -> tuple[bool, str | None]:
+def _client_for(proxy_url: str | None) -> httpx.AsyncClient:
+    """
+    Общий клиент для этого прокси: соединение (и TLS-сессия через прокси)
+    переиспользуется между отправками, а не устанавливается каждый раз заново.
+    """
+    client = _clients.get(proxy_url)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            proxy=proxy_url,
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=4, keepalive_expiry=60),
+        )
+        _clients[proxy_url] = client
+    return client
+
+
+async def close_clients() -> None:
+    """Закрыть общие клиенты (вызывается при остановке приложения)."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+async def _drop_stale_clients(proxy_url: str | None) -> None:
+    """Прокси в настройках сменили — клиенты со старым прокси больше не нужны."""
+    for key in [key for key in _clients if key != proxy_url]:
+        await _clients.pop(key).aclose()
+
+
+@dataclass
+class SendResult:
+    """Итог одной попытки отправки."""
+    ok: bool
+    error: str | None = None
+    status_code: int | None = None  # None — до Telegram не достучались
+    retry_after: float | None = None  # Telegram просит подождать (HTTP 429)
+
+
+async def post_message(text: str, settings: dict[str, str]) -> SendResult:
     """
-    Отправить сообщение ботом.
+    Одна попытка отправить сообщение ботом, без повторов.
 
-    Возвращает (успех, текст ошибки). Исключения наружу не выпускает: отправка
-    уведомления не должна ронять обработку заявки.
+    Исключения наружу не выпускает. Если Telegram не разобрал разметку
+    (в имени или комментарии клиента попался «_» или «*»), сообщение
+    сразу же уходит повторно простым текстом — лучше без форматирования,
+    чем совсем без заявки.
     """
     bot_token = settings.get("tg_bot_token", "")
     chat_id = settings.get("tg_chat_id", "")
 
     if not bot_token or not chat_id:
-        logger.warning("Telegram: не заданы токен бота или chat_id, уведомление не отправлено")
-        return False, "Не заданы токен бота или Chat ID"
+        return SendResult(ok=False, error="Не заданы токен бота или Chat ID")
 
     proxy_url = build_proxy_url(settings)
-    proxy_label = mask_proxy_url(proxy_url) or "без прокси"
+    await _drop_stale_clients(proxy_url)
+    client = _client_for(proxy_url)
     url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
     payload = {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}
 
+    try:
+        response = await client.post(url, json=payload)
+        if response.status_code == 400 and "can't parse entities" in response.text:
+            payload.pop("parse_mode")
+            response = await client.post(url, json=payload)
+    except Exception as e:
+        # Частые причины: api.telegram.org заблокирован и прокси не задан, либо прокси оборвал соединение
+        return SendResult(ok=False, error=f"{type(e).__name__}: {e}")
+
+    if response.status_code == 200:
+        return SendResult(ok=True, status_code=200)
+
+    retry_after = None
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.json()["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            retry_after = None
+    return SendResult(
+        ok=False,
+        error=f"HTTP {response.status_code}: {response.text[:300]}",
+        status_code=response.status_code,
+        retry_after=retry_after,
+    )
+
+
+async def send_message(text: str, settings: dict[str, str]) -> tuple[bool, str | None]:
+    """
+    Отправить сообщение ботом сразу, с несколькими быстрыми повторами
+    (проверка связи из админки). Уведомления о заявках идут через
+    app.services.outbox.
+
+    Возвращает (успех, текст ошибки). Исключения наружу не выпускает.
+    """
+    if not settings.get("tg_bot_token") or not settings.get("tg_chat_id"):
+        logger.warning("Telegram: не заданы токен бота или chat_id, уведомление не отправлено")
+        return False, "Не заданы токен бота или Chat ID"
+
+    proxy_label = mask_proxy_url(build_proxy_url(settings)) or "без прокси"
     last_error = "Неизвестная ошибка"
 
     for attempt in range(1, MAX_ATTEMPTS + 1):
-        try:
-            async with httpx.AsyncClient(proxy=proxy_url, timeout=REQUEST_TIMEOUT) as client:
-                response = await client.post(url, json=payload)
-        except Exception as e:
-            # Частые причины: api.telegram.org заблокирован и прокси не задан, либо прокси оборвал соединение
-            last_error = f"{type(e).__name__}: {e}"
-        else:
-            if response.status_code == 200:
-                logger.info(
-                    "Telegram: уведомление отправлено в чат %s (прокси: %s, попытка %s)",
-                    chat_id,
-                    proxy_label,
-                    attempt,
-                )
-                return True, None
-
-            last_error = f"HTTP {response.status_code}: {response.text[:300]}"
-
-            # Ответ самого Telegram (неверный токен, бота убрали из чата) повторять бессмысленно
-            if response.status_code < 500:
-                logger.error("Telegram: API вернул %s: %s", response.status_code, response.text)
-                return False, last_error
+        result = await post_message(text, settings)
+        if result.ok:
+            logger.info(
+                "Telegram: сообщение отправлено в чат %s (прокси: %s, попытка %s)",
+                settings.get("tg_chat_id"),
+                proxy_label,
+                attempt,
+            )
+            return True, None
+
+        last_error = result.error or last_error
+
+        # Ответ самого Telegram (неверный токен, бота убрали из чата) повторять бессмысленно
+        if result.status_code is not None and result.status_code < 500:
+            logger.error("Telegram: API вернул %s", last_error)
+            return False, last_error
 
         if attempt < MAX_ATTEMPTS:
             logger.warning(
@@ -168,7 +245,7 @@ async def send_message(text: str, settings: dict[str, str]) -> tuple[bool, str |
             await asyncio.sleep(RETRY_DELAYS[attempt - 1])
 
     logger.error(
-        "Telegram: уведомление не отправлено после %s попыток (прокси: %s): %s",
+        "Telegram: сообщение не отправлено после %s попыток (прокси: %s): %s",
         MAX_ATTEMPTS,
         proxy_label,
         last_error,
@@ -0,0 +1,102 @@
+"""
+Кеш готовых ответов в памяти воркера.
+
+Хранит уже сериализованные (JSON-совместимые) данные: ORM-объекты нельзя
+переживать дольше сессии, в которой они загружены. Для каждого значения
+считается etag — хеш содержимого, одинаковый во всех воркерах при одинаковых
+данных, поэтому его можно отдавать клиенту в заголовке ETag.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+from starlette.requests import Request
+
+
+def content_etag(value: Any) -> str:
+    """Хеш JSON-представления значения."""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с одним из значений If-None-Match запроса."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+@dataclass
+class CachedValue:
+    value: Any
+    etag: str
+    expires_at: float
+
+
+class AsyncTTLCache:
+    """
+    Кеш с временем жизни и ограничением по числу ключей (вытесняется самый старый).
+
+    Загрузка одного ключа выполняется одним запросом, даже если его одновременно
+    ждут десятки клиентов: остальные дожидаются результата первого.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, CachedValue] = OrderedDict()
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+
+    def peek(self, key: Hashable) -> CachedValue | None:
+        """Свежее значение без загрузки (или None)."""
+        entry = self._data.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> CachedValue:
+        entry = self.peek(key)
+        if entry is not None:
+            return entry
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self.peek(key)
+            if entry is not None:
+                return entry
+            try:
+                value = await loader()
+            finally:
+                self._locks.pop(key, None)
+            return self.set(key, value)
+
+    def set(self, key: Hashable, value: Any) -> CachedValue:
+        entry = CachedValue(
+            value=value,
+            etag=content_etag(value),
+            expires_at=time.monotonic() + self.ttl,
+        )
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return entry
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Сбросить один ключ или весь кеш."""
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
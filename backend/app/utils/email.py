@@ -2,28 +2,49 @@ import smtplib
 from email.message import EmailMessage
 from app.config import settings
 
-def send_email(subject: str, recipients: list[str], text_content: str, html_content: str | None = None):
-    """Отправка письма через SMTP."""
-    if not settings.smtp_host:
-        print("⚠️ SMTP не настроен, письмо не будет отправлено.")
-        print(f"Тема: {subject}")
-        print(f"Текст: {text_content}")
-        return
 
+def build_message(subject: str, recipients: list[str], text_content: str, html_content: str | None = None) -> EmailMessage:
+    """Письмо с текстовой и (необязательно) HTML-версией."""
     msg = EmailMessage()
     msg['Subject'] = subject
     msg['From'] = settings.emails_from
     msg['To'] = ", ".join(recipients)
     msg.set_content(text_content)
-    
+
     if html_content:
         msg.add_alternative(html_content, subtype='html')
+    return msg
+
+
+def open_smtp() -> smtplib.SMTP:
+    """Соединение с SMTP-сервером из настроек (STARTTLS и вход — если задан пароль)."""
+    server = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=settings.smtp_timeout)
+    try:
+        if settings.smtp_password:
+            server.starttls()
+            server.login(settings.smtp_user, settings.smtp_password)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def send_email(subject: str, recipients: list[str], text_content: str, html_content: str | None = None):
+    """
+    Отправка письма через SMTP, блокирующая — для скриптов.
+
+    Обработчики запросов ставят письма в очередь app.services.email_queue.
+    """
+    if not settings.smtp_host:
+        print("⚠️ SMTP не настроен, письмо не будет отправлено.")
+        print(f"Тема: {subject}")
+        print(f"Текст: {text_content}")
+        return
+
+    msg = build_message(subject, recipients, text_content, html_content)
 
     try:
-        with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as server:
-            if settings.smtp_password:
-                server.starttls()
-                server.login(settings.smtp_user, settings.smtp_password)
+        with open_smtp() as server:
             server.send_message(msg)
     except Exception as e:
         print(f"❌ Ошибка при отправке письма: {e}")
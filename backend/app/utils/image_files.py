@@ -0,0 +1,93 @@
+"""
+Файлы изображений на диске.
+
+Image.url, thumbnail_url и ImageVariant.url хранятся как URL вида
+/uploads/<путь>, а файлы лежат в settings.upload_dir/<путь>.
+"""
+
+import logging
+import os
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_URL_PREFIX = "/uploads/"
+RESIZE_URL_PREFIX = "/img/"
+
+# Миниатюры для карточек и админки отдаёт /img
+THUMBNAIL_SIZE = (300, 300)
+
+
+def shard_dir(key: str) -> str:
+    """
+    Подкаталог ab/cd для файла по hex-ключу (хешу содержимого или имени).
+
+    В одном каталоге не копятся десятки тысяч файлов: поиск по каталогу,
+    бэкапы и StaticFiles работают быстрее.
+    """
+    return f"{key[:2]}/{key[2:4]}"
+
+
+def upload_path(url: str | None) -> str | None:
+    """Путь к файлу для URL из /uploads/ (None для чужих URL и попыток выйти из каталога)."""
+    if not url or not url.startswith(UPLOADS_URL_PREFIX):
+        return None
+    relative = url[len(UPLOADS_URL_PREFIX):]
+    root = os.path.abspath(settings.upload_dir)
+    path = os.path.abspath(os.path.join(root, relative))
+    if not path.startswith(root + os.sep):
+        return None
+    return path
+
+
+def resized_url(url: str, width: int, height: int, fit: str = "cover") -> str:
+    """URL копии оригинала из /uploads/ через /img (чужие URL возвращаются как есть)."""
+    if not url.startswith(UPLOADS_URL_PREFIX):
+        return url
+    return f"{RESIZE_URL_PREFIX}{width}x{height}/{fit}/{url[len(UPLOADS_URL_PREFIX):]}"
+
+
+def thumbnail_url(url: str) -> str:
+    """URL миниатюры 300x300 (умная обрезка)."""
+    return resized_url(url, *THUMBNAIL_SIZE)
+
+
+def image_file_urls(image) -> list[str]:
+    """Все URL файлов изображения: оригинал, миниатюра, уменьшенные копии."""
+    urls = [image.url, image.thumbnail_url]
+    urls.extend(variant.url for variant in image.variants)
+    return [url for url in dict.fromkeys(urls) if url]
+
+
+def remove_image_files(image) -> None:
+    """Удалить с диска все файлы изображения; ошибки только логируются."""
+    for url in image_file_urls(image):
+        path = upload_path(url)
+        if path is None:
+            continue
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.warning("Не удалось удалить файл %s: %s", path, e)
+
+
+async def remove_unshared_image_files(db: AsyncSession, image) -> None:
+    """
+    Удалить файлы изображения, если на тот же оригинал не ссылается другая запись.
+
+    Повторные загрузки одного файла дают несколько записей Image с общим url.
+    """
+    from app.models.image import Image
+
+    shared = await db.scalar(
+        select(func.count())
+        .select_from(Image)
+        .where(Image.url == image.url, Image.id != image.id)
+    )
+    if not shared:
+        remove_image_files(image)
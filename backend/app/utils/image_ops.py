@@ -0,0 +1,183 @@
+"""
+Операции Pillow над файлами изображений.
+
+Функции выполняются в процессах пула app.services.image_pool, поэтому
+принимают и возвращают только простые значения (пути, числа, словари) и не
+трогают ни БД, ни настройки приложения.
+"""
+
+import base64
+import io
+import os
+
+from PIL import Image as PILImage, ImageOps, features
+
+# Параметры кодировщиков: качество подобрано на фотографиях участков
+ENCODER_OPTIONS = {
+    "webp": {"quality": 80, "method": 4},
+    "avif": {"quality": 60, "speed": 6},
+    "jpeg": {"quality": 85, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+
+# Плейсхолдер: крошечная копия, которую фронтенд растягивает с размытием
+LQIP_SIZE = 16
+LQIP_QUALITY = 40
+
+# Режимы ресайза /img: cover — заполнить рамку с обрезкой, contain — вписать без обрезки
+RESIZE_FITS = ("cover", "contain")
+
+
+def supported_formats(formats: list[str]) -> list[str]:
+    """Форматы из списка, которые умеет кодировать установленный Pillow."""
+    return [fmt for fmt in formats if fmt in ENCODER_OPTIONS and features.check(fmt)]
+
+
+def _variant_widths(original_width: int, widths: list[int]) -> list[int]:
+    """Ширины лестницы, не превышающие оригинал (без увеличения)."""
+    result = sorted(w for w in set(widths) if w < original_width)
+    if not result or original_width <= max(widths):
+        # Оригинал уже меньше верхней ступени — добавляем его собственную ширину
+        result.append(original_width)
+    return result
+
+
+def make_variants(
+    img: PILImage.Image,
+    dest_dir: str,
+    stem: str,
+    widths: list[int],
+    formats: list[str],
+) -> list[dict]:
+    """
+    Сохраняет уменьшенные копии {stem}_{ширина}.{формат} для srcset.
+
+    Возвращает описания файлов: name, format, width, height, size.
+    """
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+    variants = []
+    for width in _variant_widths(img.width, widths):
+        height = max(1, round(img.height * width / img.width))
+        resized = img if width == img.width else img.resize(
+            (width, height), PILImage.Resampling.LANCZOS
+        )
+        for fmt in supported_formats(formats):
+            name = f"{stem}_{width}.{fmt}"
+            path = os.path.join(dest_dir, name)
+            resized.save(path, format=fmt.upper(), **ENCODER_OPTIONS[fmt])
+            variants.append({
+                "name": name,
+                "format": fmt,
+                "width": width,
+                "height": height,
+                "size": os.path.getsize(path),
+            })
+    return variants
+
+
+def make_placeholder(img: PILImage.Image) -> dict:
+    """
+    LQIP (data URI крошечной WebP-копии) и доминирующий цвет (#rrggbb).
+
+    Оба значения хранятся в записи Image, чтобы списки отдавали превью
+    без дополнительных запросов.
+    """
+    rgb = img.convert("RGB")
+
+    tiny = rgb.copy()
+    tiny.thumbnail((LQIP_SIZE, LQIP_SIZE), PILImage.Resampling.BOX)
+    buffer = io.BytesIO()
+    tiny.save(buffer, format="WEBP", quality=LQIP_QUALITY)
+    lqip = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    # Доминирующий цвет — самый частый из 5 цветов медианного разбиения
+    sample = rgb.copy()
+    sample.thumbnail((64, 64), PILImage.Resampling.BOX)
+    quantized = sample.quantize(colors=5, method=PILImage.Quantize.MEDIANCUT)
+    palette = quantized.getpalette()
+    _count, index = max(quantized.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+
+    return {
+        "lqip": lqip,
+        "dominant_color": f"#{r:02x}{g:02x}{b:02x}",
+    }
+
+
+def placeholder_for_file(src_path: str) -> dict:
+    """make_placeholder для файла (для скриншотов и досчёта старых записей)."""
+    with PILImage.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        return make_placeholder(img)
+
+
+def process_upload(
+    src_path: str,
+    widths: list[int],
+    formats: list[str],
+) -> dict:
+    """
+    Обработка загруженного файла за одно декодирование: поворот по EXIF,
+    лестница уменьшенных копий рядом с оригиналом и плейсхолдер.
+
+    Миниатюра отдельно не сохраняется — её отдаёт /img (см. resize_to_file).
+    """
+    dest_dir = os.path.dirname(src_path)
+    stem = os.path.splitext(os.path.basename(src_path))[0]
+
+    with PILImage.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.load()
+
+        variants = make_variants(img, dest_dir, stem, widths, formats)
+
+        return {
+            "width": img.width,
+            "height": img.height,
+            "variants": variants,
+            **make_placeholder(img),
+        }
+
+
+def resize_to_file(
+    src_path: str,
+    dest_path: str,
+    width: int,
+    height: int,
+    fit: str,
+    fmt: str,
+) -> int:
+    """
+    Ресайз оригинала в рамку width x height (0 — по пропорциям) и запись в dest_path.
+
+    Файл пишется во временный и атомарно переименовывается, чтобы параллельный
+    запрос никогда не отдал недописанную картинку. Возвращает размер файла.
+    """
+    with PILImage.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+
+        if fit == "cover" and width and height:
+            result = ImageOps.fit(img, (width, height), PILImage.Resampling.LANCZOS)
+        else:
+            # Вписываем без увеличения; недостающая сторона — по пропорциям
+            box_w = width or img.width
+            box_h = height or img.height
+            result = img.copy()
+            result.thumbnail((box_w, box_h), PILImage.Resampling.LANCZOS)
+
+    if fmt == "jpeg" and result.mode != "RGB":
+        result = result.convert("RGB")
+    elif result.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+        result = result.convert("RGBA" if "A" in result.getbands() else "RGB")
+
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+    try:
+        result.save(tmp_path, format=fmt.upper(), **ENCODER_OPTIONS.get(fmt, {}))
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(dest_path)
@@ -0,0 +1,19 @@
+"""Нормализация телефонных номеров."""
+
+
+def normalize_phone(phone: str | None) -> str | None:
+    """
+    Телефон в виде одних цифр с кодом страны: «+7 (4012) 12-34-56»,
+    «8 4012 123456» и «4012123456» дают «74012123456».
+
+    Российские номера приводятся к коду 7 (ведущая 8 в 11-значном номере,
+    10 цифр без кода). Остальные — просто цифры. None — если цифр меньше 10.
+    """
+    digits = "".join(ch for ch in phone or "" if ch.isdigit())
+    if len(digits) < 10:
+        return None
+    if len(digits) == 10:
+        return "7" + digits
+    if len(digits) == 11 and digits[0] == "8":
+        return "7" + digits[1:]
+    return digits
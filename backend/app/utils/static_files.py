@@ -0,0 +1,105 @@
+"""
+Отдача файлов из uploads и дискового кеша /img.
+
+Без nginx файл читает и отдаёт сам воркер (FileResponse умеет Range).
+В production включается X-Accel-Redirect (UPLOADS_ACCEL_PREFIX,
+IMG_CACHE_ACCEL_PREFIX): backend проверяет путь и ставит заголовки,
+а тело, Range и условные запросы обслуживает nginx из internal location —
+байты картинок через event loop не проходят.
+
+ETag считается по stat так же, как в nginx ("mtime-size" в hex), поэтому
+валидатор одинаков в обоих режимах, и повторный запрос с If-None-Match
+получает 304 прямо здесь, без открытия файла.
+"""
+
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from urllib.parse import quote
+
+from fastapi.staticfiles import StaticFiles
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+from app.config import settings
+from app.utils.cache import etag_matches
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=2592000"
+
+# Имя с хешем или uuid: такой файл никогда не перезаписывается. Отдельная
+# шестнадцатеричная группа от 8 символов, хотя бы с одной буквой, — иначе
+# под правило попадали бы даты и номера (photo_20240101.jpg)
+UNIQUE_NAME_RE = re.compile(r"(?<![0-9a-z])(?=[0-9]*[a-f])[0-9a-f]{8,}(?![0-9a-z])", re.IGNORECASE)
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """ETag в формате nginx: одинаков при отдаче через backend и через X-Accel-Redirect."""
+    return f'"{int(stat_result.st_mtime):x}-{stat_result.st_size:x}"'
+
+
+def upload_cache_control(path: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if UNIQUE_NAME_RE.search(stem):
+        return IMMUTABLE_CACHE_CONTROL
+    return DEFAULT_CACHE_CONTROL
+
+
+def serve_file(
+    request: Request,
+    path: str,
+    stat_result: os.stat_result,
+    *,
+    root: str,
+    accel_prefix: str,
+    cache_control: str,
+    media_type: str | None = None,
+) -> Response:
+    """
+    Ответ с файлом: 304, X-Accel-Redirect (если задан accel_prefix) или FileResponse.
+
+    path должен лежать внутри root — его проверяет вызывающий.
+    """
+    etag = file_etag(stat_result)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if media_type is None:
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if accel_prefix:
+        relative = os.path.relpath(os.path.realpath(path), os.path.realpath(root))
+        relative = relative.replace(os.sep, "/")
+        # nginx передаёт клиенту Content-Type и Cache-Control, ETag ставит свой — такой же
+        headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + quote(relative)
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    return FileResponse(path, stat_result=stat_result, media_type=media_type, headers=headers)
+
+
+class CachedStaticFiles(StaticFiles):
+    """Статика uploads с кешированием и X-Accel-Redirect."""
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope,
+        status_code: int = 200,
+    ) -> Response:
+        path = os.fspath(full_path)
+        return serve_file(
+            Request(scope),
+            path,
+            stat_result,
+            root=os.fspath(self.directory),
+            accel_prefix=settings.uploads_accel_prefix,
+            cache_control=upload_cache_control(path),
+        )
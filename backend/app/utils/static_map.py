@@ -0,0 +1,248 @@
+"""
+Статическая карта объявления без браузера: тайлы подложки + полигоны и маркеры.
+
+Заменяет скриншот страницы /listing-screenshot/{slug} в Chromium. Рендер
+выполняется в процессе пула app.services.image_pool и читает тайлы только из
+локального кеша ({tile_dir}/{z}/{x}/{y}.png); недостающие тайлы заранее
+скачивает app.services.map_tiles, а если их нет — под ними остаётся фон.
+
+Геометрия — словари {"status", "polygon": [[lat, lon], ...] | None, "lat", "lon"},
+как отдаёт ListingDetail.plots. Цвета статусов — как в ListingMap на фронтенде.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+
+from PIL import Image as PILImage, ImageDraw, ImageFont
+
+from app.utils.image_ops import make_placeholder
+
+TILE_SIZE = 256
+MIN_ZOOM = 3
+MAX_ZOOM = 18
+# Одиночная точка без полигона
+POINT_ZOOM = 16
+# Поля вокруг участков, доля от размера картинки
+PADDING = 0.12
+
+STATUS_COLORS = {
+    "active": (16, 185, 129),    # Зелёный — в продаже
+    "reserved": (245, 158, 11),  # Оранжевый — забронирован
+    "sold": (239, 68, 68),       # Красный — продан
+}
+FILL_ALPHA = 90  # ~0.35, как fillOpacity на сайте
+OUTLINE_WIDTH = 2
+MARKER_RADIUS = 9
+
+BACKGROUND = (232, 232, 228)
+ATTRIBUTION = "© OpenStreetMap"
+
+# Полигоны рисуются с двойным разрешением и уменьшаются — сглаженные края
+SUPERSAMPLE = 2
+
+# Плоская графика: быстрые настройки сжатия почти не уступают по размеру
+MAP_ENCODER_OPTIONS = {
+    "png": {"compress_level": 6},
+    "webp": {"quality": 85, "method": 2},
+}
+
+
+@dataclass
+class Viewport:
+    zoom: int
+    left: float  # глобальные пиксели Web Mercator на этом зуме
+    top: float
+    width: int
+    height: int
+
+
+def project(lat: float, lon: float, zoom: int) -> tuple[float, float]:
+    """Широта/долгота → глобальные пиксели Web Mercator."""
+    scale = TILE_SIZE * (2 ** zoom)
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = (lon + 180.0) / 360.0 * scale
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def _plot_points(plots: list[dict]) -> list[tuple[float, float]]:
+    points = []
+    for plot in plots:
+        if plot.get("polygon"):
+            points.extend((lat, lon) for lat, lon in plot["polygon"])
+        elif plot.get("lat") is not None and plot.get("lon") is not None:
+            points.append((plot["lat"], plot["lon"]))
+    return points
+
+
+def plan_viewport(plots: list[dict], width: int, height: int) -> Viewport | None:
+    """Наибольший зум, при котором все участки помещаются с полями; None — нечего рисовать."""
+    points = _plot_points(plots)
+    if not points:
+        return None
+
+    inner_w = width * (1 - 2 * PADDING)
+    inner_h = height * (1 - 2 * PADDING)
+
+    zoom = POINT_ZOOM if len(points) == 1 else MAX_ZOOM
+    while True:
+        projected = [project(lat, lon, zoom) for lat, lon in points]
+        xs = [p[0] for p in projected]
+        ys = [p[1] for p in projected]
+        fits = max(xs) - min(xs) <= inner_w and max(ys) - min(ys) <= inner_h
+        if fits or zoom <= MIN_ZOOM:
+            break
+        zoom -= 1
+
+    center_x = (min(xs) + max(xs)) / 2
+    center_y = (min(ys) + max(ys)) / 2
+    return Viewport(
+        zoom=zoom,
+        left=center_x - width / 2,
+        top=center_y - height / 2,
+        width=width,
+        height=height,
+    )
+
+
+def _tile_grid(viewport: Viewport) -> list[tuple[int, int]]:
+    """Номера тайлов окна карты (x без учёта перехода через 180-й меридиан)."""
+    limit = 2 ** viewport.zoom
+    x0 = math.floor(viewport.left / TILE_SIZE)
+    y0 = math.floor(viewport.top / TILE_SIZE)
+    x1 = math.floor((viewport.left + viewport.width - 1) / TILE_SIZE)
+    y1 = math.floor((viewport.top + viewport.height - 1) / TILE_SIZE)
+    return [
+        (x, y)
+        for y in range(y0, y1 + 1)
+        if 0 <= y < limit
+        for x in range(x0, x1 + 1)
+    ]
+
+
+def viewport_tiles(viewport: Viewport) -> list[tuple[int, int, int]]:
+    """Тайлы (z, x, y), покрывающие окно карты."""
+    limit = 2 ** viewport.zoom
+    return [(viewport.zoom, x % limit, y) for x, y in _tile_grid(viewport)]
+
+
+def tile_path(tile_dir: str, z: int, x: int, y: int) -> str:
+    return os.path.join(tile_dir, str(z), str(x), f"{y}.png")
+
+
+def _draw_basemap(canvas: PILImage.Image, viewport: Viewport, tile_dir: str) -> None:
+    limit = 2 ** viewport.zoom
+    for tx, ty in _tile_grid(viewport):
+        path = tile_path(tile_dir, viewport.zoom, tx % limit, ty)
+        try:
+            with PILImage.open(path) as tile:
+                tile = tile.convert("RGB")
+        except (OSError, ValueError):
+            continue  # тайла нет в кеше — остаётся фон
+        offset = (
+            round(tx * TILE_SIZE - viewport.left),
+            round(ty * TILE_SIZE - viewport.top),
+        )
+        canvas.paste(tile, offset)
+
+
+def _draw_plots(canvas: PILImage.Image, viewport: Viewport, plots: list[dict]) -> None:
+    """Полигоны и маркеры поверх подложки (canvas в режиме RGBA)."""
+    scale = SUPERSAMPLE
+    shapes = []
+    for plot in plots:
+        color = STATUS_COLORS.get(plot.get("status"), STATUS_COLORS["active"])
+        if plot.get("polygon"):
+            points = [project(lat, lon, viewport.zoom) for lat, lon in plot["polygon"]]
+            if len(points) >= 3:
+                shapes.append(("polygon", color, points))
+        elif plot.get("lat") is not None and plot.get("lon") is not None:
+            shapes.append(("marker", color, [project(plot["lat"], plot["lon"], viewport.zoom)]))
+    if not shapes:
+        return
+
+    # Рисуем только в рамке вокруг фигур: сглаживание — самая дорогая часть рендера
+    margin = MARKER_RADIUS + 4
+    xs = [x for _, _, points in shapes for x, _ in points]
+    ys = [y for _, _, points in shapes for _, y in points]
+    left = max(int(min(xs) - viewport.left) - margin, 0)
+    top = max(int(min(ys) - viewport.top) - margin, 0)
+    right = min(int(max(xs) - viewport.left) + margin + 1, viewport.width)
+    bottom = min(int(max(ys) - viewport.top) + margin + 1, viewport.height)
+    if right <= left or bottom <= top:
+        return
+
+    overlay = PILImage.new("RGBA", ((right - left) * scale, (bottom - top) * scale), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    origin_x = viewport.left + left
+    origin_y = viewport.top + top
+
+    def to_overlay(points):
+        return [((x - origin_x) * scale, (y - origin_y) * scale) for x, y in points]
+
+    # Сначала полигоны, маркеры поверх
+    for kind, color, points in shapes:
+        if kind != "polygon":
+            continue
+        points = to_overlay(points)
+        draw.polygon(points, fill=(*color, FILL_ALPHA))
+        draw.line(points + [points[0]], fill=(*color, 255), width=OUTLINE_WIDTH * scale, joint="curve")
+
+    for kind, color, points in shapes:
+        if kind != "marker":
+            continue
+        (x, y), = to_overlay(points)
+        r = MARKER_RADIUS * scale
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=(*color, 255), outline=(255, 255, 255, 255), width=3 * scale)
+
+    overlay = overlay.resize((right - left, bottom - top), PILImage.Resampling.BOX)
+    canvas.alpha_composite(overlay, (left, top))
+
+
+def _draw_attribution(canvas: PILImage.Image) -> None:
+    draw = ImageDraw.Draw(canvas)
+    font = ImageFont.load_default(size=14)
+    left, top, right, bottom = draw.textbbox((0, 0), ATTRIBUTION, font=font)
+    w, h = right - left, bottom - top
+    x, y = canvas.width - w - 10, canvas.height - h - 8
+    draw.rectangle((x - 6, y - 4, x + w + 6, y + h + 6), fill=(255, 255, 255, 200))
+    draw.text((x - left, y - top), ATTRIBUTION, font=font, fill=(60, 60, 60, 255))
+
+
+def render_static_map(
+    plots: list[dict],
+    tile_dir: str,
+    dest_path: str,
+    width: int = 1200,
+    height: int = 630,
+    fmt: str = "png",
+) -> dict | None:
+    """
+    Нарисовать карту участков и сохранить в dest_path.
+
+    Возвращает width, height, size и плейсхолдер (lqip, dominant_color)
+    или None, если у участков нет координат.
+    """
+    viewport = plan_viewport(plots, width, height)
+    if viewport is None:
+        return None
+
+    canvas = PILImage.new("RGBA", (width, height), (*BACKGROUND, 255))
+    _draw_basemap(canvas, viewport, tile_dir)
+    _draw_plots(canvas, viewport, plots)
+    _draw_attribution(canvas)
+    canvas = canvas.convert("RGB")
+
+    # Атомарная запись: файл появляется уже целиком
+    tmp_path = f"{dest_path}.tmp"
+    canvas.save(tmp_path, format=fmt.upper(), **MAP_ENCODER_OPTIONS.get(fmt, {}))
+    os.replace(tmp_path, dest_path)
+
+    return {
+        "width": width,
+        "height": height,
+        "size": os.path.getsize(dest_path),
+        **make_placeholder(canvas),
+    }
@@ -0,0 +1,114 @@
+"""
+Досчёт плейсхолдеров (lqip, dominant_color) для уже загруженных изображений.
+
+Новые загрузки и скриншоты получают плейсхолдер сразу (app.utils.image_ops.
+make_placeholder), скрипт заполняет старые записи. Работает пачками по
+--batch-size записей: картинки декодируются параллельно в пуле процессов
+app.services.image_pool, результат пачки пишется одним UPDATE.
+
+Скрипт можно прервать и запустить снова: обрабатываются только записи
+с пустым lqip. Записи с отсутствующими файлами пропускаются.
+
+Использование:
+    python backfill_image_placeholders.py
+    python backfill_image_placeholders.py --batch-size 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from sqlalchemy import bindparam, select, update
+
+sys.path.append(os.getcwd())
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.image import Image
+from app.services.image_pool import image_pool
+from app.utils.image_files import upload_path
+from app.utils.image_ops import placeholder_for_file
+
+
+async def placeholder_or_none(url: str, slots: asyncio.Semaphore) -> dict | None:
+    path = upload_path(url)
+    if not path or not os.path.exists(path):
+        print(f"  нет файла: {url}")
+        return None
+    try:
+        # Не больше задач, чем процессов: иначе очередь пула отвечала бы ImagePoolBusy
+        async with slots:
+            return await image_pool.run(placeholder_for_file, path)
+    except Exception as e:
+        print(f"  ошибка {url}: {e}")
+        return None
+
+
+async def backfill(batch_size: int) -> None:
+    images_table = Image.__table__
+    slots = asyncio.Semaphore(image_pool.workers)
+    last_id = 0
+    totals = {"images": 0, "updated": 0, "skipped": 0}
+
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Image.id, Image.url)
+                .where(Image.id > last_id, Image.lqip.is_(None))
+                .order_by(Image.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            placeholders = await asyncio.gather(
+                *(placeholder_or_none(row.url, slots) for row in rows)
+            )
+            params = [
+                {"image_id": row.id, **placeholder}
+                for row, placeholder in zip(rows, placeholders)
+                if placeholder is not None
+            ]
+            if params:
+                await db.execute(
+                    update(images_table)
+                    .where(images_table.c.id == bindparam("image_id"))
+                    .values(
+                        lqip=bindparam("lqip"),
+                        dominant_color=bindparam("dominant_color"),
+                    ),
+                    params,
+                )
+                await db.commit()
+
+        totals["images"] += len(rows)
+        totals["updated"] += len(params)
+        totals["skipped"] += len(rows) - len(params)
+        print(f"id <= {last_id}: записей {len(rows)}, обновлено {len(params)}")
+
+    print("Готово: записей {images}, обновлено {updated}, пропущено {skipped}".format(**totals))
+
+
+async def run(batch_size: int) -> None:
+    try:
+        await backfill(batch_size)
+    finally:
+        image_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Досчёт lqip и dominant_color для изображений")
+    parser.add_argument("--batch-size", type=int, default=200, help="Записей Image в одной транзакции")
+    args = parser.parse_args()
+
+    print(f"--- BACKFILLING IMAGE PLACEHOLDERS ({settings.upload_dir}) ---")
+    asyncio.run(run(args.batch_size))
+
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    main()
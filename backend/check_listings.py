@@ -1,7 +1,7 @@
-from app.database import SessionLocal
+from app.database import sync_session
 from app.models.listing import Listing
 
-db = SessionLocal()
+db = sync_session()
 try:
     listings = db.query(Listing).all()
     print(f"Total listings: {len(listings)}")
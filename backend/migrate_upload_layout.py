@@ -0,0 +1,286 @@
+"""
+Перенос загруженных файлов из плоского uploads/ в подкаталоги uploads/ab/cd/.
+
+Новые загрузки уже сохраняются по шардам (app.utils.image_files.shard_dir),
+скрипт переносит старые. Работает пачками по --batch-size записей Image:
+1. для каждого файла пачки создаётся жёсткая ссылка по новому пути
+   (копия, если ссылки не поддерживаются) — старый URL продолжает работать;
+2. одной транзакцией на пачку переписываются images.url / thumbnail_url,
+   image_variants.url и ссылки в текстах: значения settings (с уведомлением
+   settings_changed) и HTML описаний объявлений, новостей и локаций — там
+   картинки редактора вставлены как /uploads/имя или /img/WxH/fit/имя;
+3. старые пути остаются: страницы из кеша ISR/CDN и внешние ссылки ещё
+   указывают на них. Жёсткие ссылки места не занимают, и сборщик мусора их
+   не трогает. Удалить старые пути — --remove-old, когда кеши страниц
+   обновятся.
+
+Скрипт можно прервать и запустить снова: уже перенесённые записи не
+подходят под выборку «плоских» URL, а повторное создание ссылки пропускается.
+Сайт при этом не останавливается.
+
+Использование:
+    python migrate_upload_layout.py --dry-run
+    python migrate_upload_layout.py --batch-size 500
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import sys
+
+from sqlalchemy import and_, bindparam, inspect, or_, select, text, update
+
+sys.path.append(os.getcwd())
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.image import Image, ImageVariant
+from app.models.setting import Setting
+from app.services.image_gc import CONTENT_COLUMNS
+from app.services.site_settings import SETTINGS_CHANNEL
+from app.utils.image_files import (
+    RESIZE_URL_PREFIX,
+    UPLOADS_URL_PREFIX,
+    shard_dir,
+    thumbnail_url,
+    upload_path,
+)
+
+
+def is_flat(url: str | None) -> bool:
+    """URL файла прямо в uploads/, без подкаталога."""
+    return bool(url) and url.startswith(UPLOADS_URL_PREFIX) and "/" not in url[len(UPLOADS_URL_PREFIX):]
+
+
+def sharded_url(url: str, key_name: str) -> str:
+    """Новый URL: подкаталог по хешу имени оригинала (копии и миниатюра — рядом с ним)."""
+    key = hashlib.sha1(key_name.encode()).hexdigest()
+    name = url[len(UPLOADS_URL_PREFIX):]
+    return f"{UPLOADS_URL_PREFIX}{shard_dir(key)}/{name}"
+
+
+def link_file(old_path: str, new_path: str) -> str:
+    """Сделать файл доступным по новому пути; вернуть linked / copied / exists / missing."""
+    if os.path.exists(new_path):
+        return "exists"
+    if not os.path.exists(old_path):
+        return "missing"
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    try:
+        os.link(old_path, new_path)
+    except OSError:
+        shutil.copy2(old_path, new_path)
+        return "copied"
+    return "linked"
+
+
+async def rewrite_content(db, moves: dict[str, str], dry_run: bool) -> int:
+    """
+    Переписать ссылки на перенесённые файлы в текстах (HTML, значения настроек).
+
+    Ссылки бывают абсолютными (http://.../uploads/имя) и на копии через /img,
+    поэтому заменяется имя файла после /uploads/ или /img/WxH/fit/.
+    Возвращает число изменённых строк.
+    """
+    new_names = {
+        old[len(UPLOADS_URL_PREFIX):]: new[len(UPLOADS_URL_PREFIX):] for old, new in moves.items()
+    }
+    pattern = re.compile(
+        r"(/uploads/|/img/\d+x\d+/\w+/)("
+        + "|".join(re.escape(name) for name in sorted(new_names, key=len, reverse=True))
+        + r")(?![\w.\-])"
+    )
+
+    def rewrite(value: str) -> str:
+        return pattern.sub(lambda m: m.group(1) + new_names[m.group(2)], value)
+
+    changed_rows = 0
+    for column in CONTENT_COLUMNS:
+        model = column.class_
+        key_column = inspect(model).primary_key[0]
+        value_column = column.property.columns[0]
+        # Только строки, где встречается имя из этой пачки, — без блокировки
+        result = await db.execute(
+            select(key_column, value_column).where(
+                or_(*(value_column.contains(name, autoescape=True) for name in new_names))
+            )
+        )
+        changed_keys = [key for key, value in result.all() if rewrite(value) != value]
+        if dry_run or not changed_keys:
+            changed_rows += len(changed_keys)
+            continue
+
+        # Блокируем только меняющиеся строки и перечитываем: правка из админки
+        # не должна проскочить между чтением и записью
+        result = await db.execute(
+            select(key_column, value_column)
+            .where(key_column.in_(changed_keys))
+            .order_by(key_column)
+            .with_for_update()
+        )
+        changes = []
+        for key, value in result.all():
+            new_value = rewrite(value) if value else value
+            if new_value != value:
+                changes.append({"b_key": key, "b_value": new_value})
+        changed_rows += len(changes)
+        if not changes:
+            continue
+
+        table = model.__table__
+        await db.execute(
+            update(table)
+            .where(table.c[key_column.name] == bindparam("b_key"))
+            .values({value_column.name: bindparam("b_value")}),
+            changes,
+        )
+        if model is Setting:
+            # Воркеры перечитают изменённые настройки из кеша
+            for change in changes:
+                await db.execute(
+                    text("SELECT pg_notify(:channel, :key)"),
+                    {"channel": SETTINGS_CHANNEL, "key": change["b_key"]},
+                )
+    return changed_rows
+
+
+async def migrate(batch_size: int, dry_run: bool, remove_old: bool) -> None:
+    flat_condition = and_(
+        Image.url.like(f"{UPLOADS_URL_PREFIX}%"),
+        Image.url.not_like(f"{UPLOADS_URL_PREFIX}%/%"),
+    )
+    images_table = Image.__table__
+    variants_table = ImageVariant.__table__
+
+    last_id = 0
+    totals = {"images": 0, "files": 0, "content": 0, "linked": 0, "copied": 0, "exists": 0, "missing": 0}
+
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Image.id, Image.url, Image.thumbnail_url)
+                .where(Image.id > last_id, flat_condition)
+                .order_by(Image.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            variants_result = await db.execute(
+                select(ImageVariant.image_id, ImageVariant.url)
+                .where(ImageVariant.image_id.in_([row.id for row in rows]))
+            )
+            variants_by_image: dict[int, list[str]] = {}
+            for image_id, url in variants_result.all():
+                variants_by_image.setdefault(image_id, []).append(url)
+
+            # old_url -> new_url для всех файлов пачки
+            moves: dict[str, str] = {}
+            # Миниатюры через /img ссылаются на путь оригинала
+            resized_moves: dict[str, str] = {}
+            for row in rows:
+                key_name = row.url[len(UPLOADS_URL_PREFIX):]
+                for url in [row.url, row.thumbnail_url, *variants_by_image.get(row.id, [])]:
+                    if is_flat(url) and url not in moves:
+                        moves[url] = sharded_url(url, key_name)
+                if row.thumbnail_url and row.thumbnail_url.startswith(RESIZE_URL_PREFIX):
+                    if row.thumbnail_url == thumbnail_url(row.url):
+                        resized_moves[row.thumbnail_url] = thumbnail_url(moves[row.url])
+
+            totals["images"] += len(rows)
+            totals["files"] += len(moves)
+
+            if dry_run:
+                content_rows = await rewrite_content(db, moves, dry_run=True)
+                totals["content"] += content_rows
+                print(
+                    f"[dry-run] id <= {last_id}: записей {len(rows)}, файлов {len(moves)}, "
+                    f"текстов со ссылками {content_rows}"
+                )
+                await db.rollback()
+                continue
+
+            for old_url, new_url in moves.items():
+                status = await asyncio.to_thread(
+                    link_file, upload_path(old_url), upload_path(new_url)
+                )
+                totals[status] += 1
+                if status == "missing":
+                    print(f"  нет файла: {old_url}")
+
+            params = [{"old_url": old, "new_url": new} for old, new in moves.items()]
+            await db.execute(
+                update(images_table)
+                .where(images_table.c.url == bindparam("old_url"))
+                .values(url=bindparam("new_url")),
+                params,
+            )
+            thumb_params = params + [
+                {"old_url": old, "new_url": new} for old, new in resized_moves.items()
+            ]
+            await db.execute(
+                update(images_table)
+                .where(images_table.c.thumbnail_url == bindparam("old_url"))
+                .values(thumbnail_url=bindparam("new_url")),
+                thumb_params,
+            )
+            await db.execute(
+                update(variants_table)
+                .where(variants_table.c.url == bindparam("old_url"))
+                .values(url=bindparam("new_url")),
+                params,
+            )
+            # Настройки (og_image и т.п.) и HTML описаний с картинками редактора
+            content_rows = await rewrite_content(db, moves, dry_run=False)
+            totals["content"] += content_rows
+            await db.commit()
+
+        if remove_old:
+            for old_url in moves:
+                old_path = upload_path(old_url)
+                if old_path and os.path.exists(old_path):
+                    os.remove(old_path)
+
+        print(f"id <= {last_id}: записей {len(rows)}, файлов {len(moves)}, текстов {content_rows}")
+
+    print(
+        "Готово: записей {images}, файлов {files}, текстов {content} "
+        "(ссылок создано {linked}, скопировано {copied}, уже были {exists}, не найдено {missing})".format(**totals)
+    )
+    if dry_run or remove_old:
+        return
+    print(
+        "Старые пути сохранены для страниц из кеша. Удалить их: --remove-old, "
+        "когда кеши страниц обновятся (сборщик мусора их не удаляет)."
+    )
+    if totals["copied"]:
+        print(
+            f"Внимание: {totals['copied']} файлов скопировано, а не связано жёсткой ссылкой — "
+            "такие старые пути сборщик мусора удалит через IMAGE_GC_GRACE_HOURS."
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос uploads/ в подкаталоги ab/cd/")
+    parser.add_argument("--batch-size", type=int, default=200, help="Записей Image в одной транзакции")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать, что будет перенесено")
+    parser.add_argument(
+        "--remove-old",
+        action="store_true",
+        help="Удалить файлы по старым путям (по умолчанию остаются для страниц из кеша)",
+    )
+    args = parser.parse_args()
+
+    print(f"--- MIGRATING UPLOADS LAYOUT ({settings.upload_dir}) ---")
+    asyncio.run(migrate(args.batch_size, args.dry_run, args.remove_old))
+
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    main()
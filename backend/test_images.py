@@ -1,9 +1,9 @@
 """Тестовый скрипт для проверки связи images в Listing."""
-from app.database import SessionLocal
+from app.database import sync_session
 from app.models.listing import Listing
 from app.models.image import Image
 
-db = SessionLocal()
+db = sync_session()
 
 # Получаем листинг
 listing = db.query(Listing).filter(Listing.id == 10).first()
@@ -17,6 +17,9 @@ const nextConfig: NextConfig = {
       {
         pathname: "/uploads/**",
       },
+      {
+        pathname: "/img/**",
+      },
       {
         pathname: "/**",
       },
@@ -56,6 +59,11 @@ const nextConfig: NextConfig = {
           source: "/uploads/:path*",
           destination: `${BACKEND_URL}/uploads/:path*`,
         },
+        // Уменьшенные копии изображений (ресайз на лету)
+        {
+          source: "/img/:path*",
+          destination: `${BACKEND_URL}/img/:path*`,
+        },
       ],
     };
   },
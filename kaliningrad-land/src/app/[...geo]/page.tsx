@@ -13,7 +13,7 @@ import { notFound } from "next/navigation";
 import { CatalogContent } from "@/app/catalog/CatalogContent";
 import { Breadcrumbs } from "@/components/seo/Breadcrumbs";
 import { getSiteSettings } from "@/lib/server-config";
-import { SSR_API_URL, SITE_URL, getImageUrl } from "@/lib/config";
+import { SSR_API_URL, SITE_URL, getImageUrl, getResizedImageUrl } from "@/lib/config";
 import type { ListingsResponse } from "@/app/catalog/page";
 import type { ListingData } from "@/types/listing";
 import { buildHierarchyBreadcrumbs, formatSettlementName, type HierarchyLocation } from "@/lib/geoUrl";
@@ -393,8 +393,11 @@ export async function generateMetadata({ params, searchParams }: GeoPageProps):
             // Картинка для превью при отправке ссылки в мессенджеры и соцсети
             const ogImagePath =
                 listing.images?.[0]?.url || listing.main_image?.url || listing.image?.url || null;
+            // Мессенджеры ждут 1200x630 и не всегда понимают WebP — отдаём JPEG через /img
             const ogImageUrl = ogImagePath
-                ? (ogImagePath.startsWith("http") ? ogImagePath : `${SITE_URL}${ogImagePath}`)
+                ? (ogImagePath.startsWith("http")
+                    ? ogImagePath
+                    : `${SITE_URL}${getResizedImageUrl(ogImagePath, 1200, 630, "cover", "jpeg")}`)
                 : null;
 
             return {
@@ -43,6 +43,13 @@ export function ListingCard({ listing, variant = "default", h1Template, placehol
     // Используем placeholder из настроек или статический fallback
     const placeholder = placeholderImage || DEFAULT_PLACEHOLDER;
     const resolvedImageUrl = getImageUrl(imageUrl, placeholder);
+    // Пока картинка грузится — размытая крошечная копия на доминирующем цвете
+    const blurProps = imgData?.lqip
+        ? { placeholder: "blur" as const, blurDataURL: imgData.lqip }
+        : {};
+    const backgroundStyle = imgData?.dominant_color
+        ? { backgroundColor: imgData.dominant_color }
+        : undefined;
 
     const locationText = (() => {
         if (listing.location) {
@@ -73,9 +80,10 @@ export function ListingCard({ listing, variant = "default", h1Template, placehol
         return (
             <Card className="overflow-hidden group hover:shadow-lg transition-shadow pt-0 gap-3">
                 {/* Изображение */}
-                <div className="relative h-48 overflow-hidden bg-muted">
+                <div className="relative h-48 overflow-hidden bg-muted" style={backgroundStyle}>
                     <Image
                         src={resolvedImageUrl}
+                        {...blurProps}
                         alt={getListingDisplayTitle(listing, h1Template)}
                         fill
                         className="object-cover group-hover:scale-105 transition-transform duration-300"
@@ -134,9 +142,10 @@ export function ListingCard({ listing, variant = "default", h1Template, placehol
     return (
         <Card className="overflow-hidden group hover:shadow-lg transition-shadow pt-0 gap-3">
             {/* Изображение */}
-            <div className="relative h-48 overflow-hidden bg-muted">
+            <div className="relative h-48 overflow-hidden bg-muted" style={backgroundStyle}>
                 <Image
                     src={resolvedImageUrl}
+                    {...blurProps}
                     alt={getListingDisplayTitle(listing, h1Template)}
                     fill
                     className="object-cover group-hover:scale-105 transition-transform duration-300"
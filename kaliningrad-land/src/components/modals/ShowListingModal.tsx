@@ -76,6 +76,12 @@ export function ShowListingModal({
                 }),
             });
 
+            if (response.status === 429) {
+                // Сработало ограничение частоты заявок на сервере
+                alert("Вы уже отправили несколько заявок — мы скоро свяжемся с вами. Если срочно, позвоните нам.");
+                return;
+            }
+
             if (!response.ok) {
                 throw new Error("Ошибка при отправке заявки");
             }
@@ -196,11 +196,27 @@ export function getImageUrl(url: string | null | undefined, fallback: string = "
 }
 
 /**
- * Проверяет, является ли URL загруженным изображением (из /uploads/).
+ * URL копии загруженного изображения нужного размера (ресайз на лету через /img).
+ * Для внешних и статических картинок возвращает исходный URL.
+ */
+export function getResizedImageUrl(
+    url: string,
+    width: number,
+    height: number,
+    fit: "cover" | "contain" = "cover",
+    format?: "jpeg" | "png" | "webp" | "avif"
+): string {
+    if (!url.startsWith("/uploads/")) return url;
+    const resized = `/img/${width}x${height}/${fit}/${url.slice("/uploads/".length)}`;
+    return format ? `${resized}?format=${format}` : resized;
+}
+
+/**
+ * Проверяет, является ли URL загруженным изображением (из /uploads/ или /img/).
  * Такие изображения не могут быть оптимизированы через Next.js Image Optimization
  * в Docker-окружении, т.к. /_next/image не может получить их изнутри контейнера.
  * Статические изображения из /public/ оптимизируются нормально.
  */
 export function isUploadedImage(url: string): boolean {
-    return url.includes("/uploads/");
+    return url.includes("/uploads/") || url.includes("/img/");
 }
@@ -6,6 +6,8 @@ export interface ImageData {
     id?: number;
     url: string;
     thumbnail_url: string | null;
+    lqip?: string | null;           // data URI крошечной копии для размытого превью
+    dominant_color?: string | null; // "#a1b2c3" — фон до загрузки
 }
 
 export interface Settlement {